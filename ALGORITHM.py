@@ -1,5 +1,45 @@
 import collections
 import heapq
+import time
+from array import array
+from environment import WALL, STEP_COST
+from bitboard import BitGrid
+from hierarchy import HierarchicalMap, CLUSTER_SIZE
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; distance_field() and the bitboard searches fall back to plain BFS
+    np = None
+
+# Markers used in the per-search parent arrays
+UNVISITED = -2
+ROOT = -1
+INFINITY = 2**31 - 1
+# Buckets of the UCS queue: more than the largest step cost (STEP_COST of a cell)
+BUCKETS = 256
+# distance_field() shifts whole frontiers with NumPy once they have this many cells
+FIELD_VECTOR_MIN = 64
+
+# --- Search Events ---
+# Algorithms report progress as deltas instead of copying their whole frontier:
+#   callback(PUSHED, i)   cell index `i` entered the frontier
+#   callback(POPPED, i)   cell index `i` left the frontier
+#   callback(SETTLED, i)  cell index `i` was expanded (now part of the explored set)
+#   callback(FOUND, path) search succeeded; `path` is the list of (r, c) returned
+# Cell indices convert back with grid.coord(i). Pass callback=None to skip all reporting.
+PUSHED, POPPED, SETTLED, FOUND = range(4)
+EVENT_NAMES = ('pushed', 'popped', 'settled', 'found')
+
+class SparseTable(dict):
+    """A per-cell search table holding only the cells written; every other cell reads as `fill`."""
+    __slots__ = ('fill',)
+
+    def __init__(self, fill):
+        super().__init__()
+        self.fill = fill
+
+    def __missing__(self, i):
+        return self.fill
 
 class SearchAlgorithms:
     def __init__(self, grid_size):
@@ -16,154 +56,590 @@ class SearchAlgorithms:
             (0, -1),  # Left
             (-1, -1)  # Top-Left
         ]
+        # --- PRECOMPUTED NEIGHBOR TABLE ---
+        # On the padded flat grid (see GridEnvironment.cells) every cell reaches its
+        # neighbour in direction k by adding the same offset, so one table of six
+        # offsets serves all cells and replaces the per-expansion bounds checks.
+        stride = grid_size + 2
+        self.offsets = tuple(dr * stride + dc for dr, dc in self.directions)
+        # Number of nodes popped from the frontier by the most recent search
+        self.nodes_expanded = 0
 
     def get_neighbors(self, node, grid):
         """
         Returns a list of valid neighbors for a given node.
         Used by ALL algorithms, so the direction restriction applies globally.
         """
-        neighbors = []
-        r, c = node
-        for dr, dc in self.directions:
-            nr, nc = r + dr, c + dc
-            # Check bounds
-            if 0 <= nr < self.grid_size and 0 <= nc < self.grid_size:
-                # Check for walls (-1)
-                if grid[nr][nc] != -1: 
-                    neighbors.append((nr, nc))
-        return neighbors
+        cells = grid.cells
+        i = grid.index(*node)
+        return [grid.coord(i + off) for off in self.offsets if cells[i + off] != WALL]
+
+    def new_table(self, grid, fill):
+        # One slot per cell of the padded buffer; much smaller than a dict of tuples.
+        # A memory-mapped grid (any buffer but a bytearray) can be larger than memory,
+        # so its tables only hold the cells the search reaches.
+        if not isinstance(grid.cells, bytearray): return SparseTable(fill)
+        return array('i', [fill]) * len(grid.cells)
+
+    def unreachable(self, start, target, grid):
+        # O(1) check on the grid's connectivity index, if a caller built one and it
+        # is still current: a target outside the start's component is rejected
+        # without flooding that component. Without one the search just runs; it is
+        # never built here, since that costs a flood of the whole grid.
+        cells = grid.cells
+        if cells[grid.index(*start)] != WALL and cells[grid.index(*target)] != WALL \
+                and grid.known_connected(start, target, self.offsets) is not False: return False
+        self.nodes_expanded = 0
+        return True
 
     # --- 1. BFS (Breadth-First Search) ---
-    def bfs(self, start, target, grid, callback):
-        queue = collections.deque([start])
-        visited = {start: None}
+    def bfs(self, start, target, grid, callback=None):
+        if self.unreachable(start, target, grid): return None
+        cells, offsets = grid.cells, self.offsets
+        s, t = grid.index(*start), grid.index(*target)
+        queue = collections.deque([s])
+        parent = self.new_table(grid, UNVISITED)
+        parent[s] = ROOT
+        self.nodes_expanded = 0
+        if callback: callback(PUSHED, s)
         while queue:
             current = queue.popleft()
-            if current == target: return self.reconstruct_path(visited, target)
-            
+            self.nodes_expanded += 1
+            if callback:
+                callback(POPPED, current)
+                callback(SETTLED, current)
+            if current == t: return self.report(self.reconstruct_path(grid, parent, t), callback)
+
             # BFS uses a Queue (FIFO), so we add neighbors in standard order.
-            for neighbor in self.get_neighbors(current, grid):
-                if neighbor not in visited:
-                    visited[neighbor] = current
+            for off in offsets:
+                neighbor = current + off
+                if cells[neighbor] != WALL and parent[neighbor] == UNVISITED:
+                    parent[neighbor] = current
                     queue.append(neighbor)
-                    callback(neighbor, list(queue), visited.keys())
+                    if callback: callback(PUSHED, neighbor)
         return None
 
     # --- 2. DFS (Depth-First Search) - ITERATIVE ---
-    def dfs(self, start, target, grid, callback):
-        stack = [start]
-        visited = {start: None}
+    def dfs(self, start, target, grid, callback=None):
+        if self.unreachable(start, target, grid): return None
+        cells, offsets = grid.cells, self.offsets[::-1]
+        s, t = grid.index(*start), grid.index(*target)
+        stack = [s]
+        parent = self.new_table(grid, UNVISITED)
+        parent[s] = ROOT
+        self.nodes_expanded = 0
+        if callback: callback(PUSHED, s)
         while stack:
             current = stack.pop()
-            if current == target: return self.reconstruct_path(visited, target)
-            
-            # DFS uses a Stack (LIFO). 
+            self.nodes_expanded += 1
+            if callback:
+                callback(POPPED, current)
+                callback(SETTLED, current)
+            if current == t: return self.report(self.reconstruct_path(grid, parent, t), callback)
+
+            # DFS uses a Stack (LIFO).
             # To visit 'Up' first, we must push it LAST.
-            # So we iterate through neighbors in REVERSE order.
-            neighbors = self.get_neighbors(current, grid)
-            for neighbor in reversed(neighbors):
-                if neighbor not in visited:
-                    visited[neighbor] = current
+            # So we iterate through the offsets in REVERSE order.
+            for off in offsets:
+                neighbor = current + off
+                if cells[neighbor] != WALL and parent[neighbor] == UNVISITED:
+                    parent[neighbor] = current
                     stack.append(neighbor)
-                    callback(neighbor, list(stack), visited.keys())
+                    if callback: callback(PUSHED, neighbor)
         return None
 
     # --- 3. UCS (Uniform-Cost Search) ---
-    def ucs(self, start, target, grid, callback):
-        pq = [(0, start)]
-        visited = {start: (0, None)}
-        while pq:
-            cost, current = heapq.heappop(pq)
-            if current == target: return self.reconstruct_path_dict(visited, target)
-            
-            # UCS checks all neighbors.
-            for neighbor in self.get_neighbors(current, grid):
-                new_cost = cost + 1
-                if neighbor not in visited or new_cost < visited[neighbor][0]:
-                    visited[neighbor] = (new_cost, current)
-                    heapq.heappush(pq, (new_cost, neighbor))
-                    callback(neighbor, [n for c, n in pq], visited.keys())
+    def ucs(self, start, target, grid, callback=None):
+        """
+        Cheapest path by terrain cost (STEP_COST of every cell entered). Step costs
+        are small integers, so the frontier is a Dial bucket queue instead of a
+        heap: one bucket per cost, BUCKETS of them reused round-robin since no
+        entry is ever more than the largest step cost ahead of the cheapest one.
+        Pushes and pops are O(1) and the search runs in O(cells + path cost).
+        A cell re-pushed with a lower cost leaves its old entry behind; that entry
+        is skipped when popped (lazy deletion), so no cell is expanded twice.
+        """
+        if self.unreachable(start, target, grid): return None
+        cells, offsets = grid.cells, self.offsets
+        s, t = grid.index(*start), grid.index(*target)
+        buckets = [[] for _ in range(BUCKETS)]
+        buckets[0].append(s)
+        pending = 1
+        parent = self.new_table(grid, UNVISITED)
+        best = self.new_table(grid, INFINITY)
+        parent[s], best[s] = ROOT, 0
+        self.nodes_expanded = 0
+        if callback: callback(PUSHED, s)
+        cost = 0
+        while pending:
+            bucket = buckets[cost % BUCKETS]
+            # Every step costs at least 1, so expanding this bucket never adds to it
+            while bucket:
+                current = bucket.pop()
+                pending -= 1
+                if best[current] < cost:
+                    # Stale entry: this node was re-pushed with a cheaper cost
+                    if callback: callback(POPPED, current)
+                    continue
+                self.nodes_expanded += 1
+                if callback:
+                    callback(POPPED, current)
+                    callback(SETTLED, current)
+                if current == t: return self.report(self.reconstruct_path(grid, parent, t), callback)
+
+                # UCS checks all neighbors.
+                for off in offsets:
+                    neighbor = current + off
+                    value = cells[neighbor]
+                    if value == WALL: continue
+                    new_cost = cost + STEP_COST[value]
+                    if new_cost < best[neighbor]:
+                        best[neighbor], parent[neighbor] = new_cost, current
+                        buckets[new_cost % BUCKETS].append(neighbor)
+                        pending += 1
+                        if callback: callback(PUSHED, neighbor)
+            cost += 1
         return None
 
     # --- 4. DLS (Depth-Limited Search) - ITERATIVE ---
-    def dls(self, start, target, grid, limit, callback):
-        stack = [(start, 0)]
-        parent_map = {start: None}
-        visited_depths = {start: 0}
+    def dls(self, start, target, grid, limit, callback=None):
+        if self.unreachable(start, target, grid): return None
+        cells, offsets = grid.cells, self.offsets[::-1]
+        s, t = grid.index(*start), grid.index(*target)
+        stack = [(s, 0)]
+        parent = self.new_table(grid, UNVISITED)
+        depths = self.new_table(grid, INFINITY)
+        parent[s], depths[s] = ROOT, 0
+        self.nodes_expanded = 0
+        if callback: callback(PUSHED, s)
 
         while stack:
             current, depth = stack.pop()
-            if current == target: return self.reconstruct_path(parent_map, target)
-            
+            self.nodes_expanded += 1
+            if callback:
+                callback(POPPED, current)
+                callback(SETTLED, current)
+            if current == t: return self.report(self.reconstruct_path(grid, parent, t), callback)
+
             if depth < limit:
-                neighbors = self.get_neighbors(current, grid)
-                # DLS is stack-based, so we REVERSE neighbors here too.
-                for neighbor in reversed(neighbors):
-                    if neighbor not in visited_depths or (depth + 1) < visited_depths[neighbor]:
-                        visited_depths[neighbor] = depth + 1
-                        parent_map[neighbor] = current
-                        stack.append((neighbor, depth + 1))
-                        callback(neighbor, [n[0] for n in stack], visited_depths.keys())
+                # DLS is stack-based, so we REVERSE the offsets here too.
+                next_depth = depth + 1
+                for off in offsets:
+                    neighbor = current + off
+                    if cells[neighbor] != WALL and next_depth < depths[neighbor]:
+                        depths[neighbor] = next_depth
+                        parent[neighbor] = current
+                        stack.append((neighbor, next_depth))
+                        if callback: callback(PUSHED, neighbor)
         return None
 
     # --- 5. IDDFS (Iterative Deepening DFS) ---
-    def iddfs(self, start, target, grid, max_depth, callback):
-        # Calls DLS repeatedly, so it inherits the restriction and stack logic.
-        for depth in range(max_depth):
-            result = self.dls(start, target, grid, depth, callback)
-            if result: return result
-        return None
+    def iddfs(self, start, target, grid, max_depth=None, callback=None):
+        """
+        Returns the path dls() finds with the smallest limit that succeeds, without
+        most of the work of re-running dls() for every limit:
+          * a node whose depth + heuristic exceeds the limit cannot reach the target
+            in time, so it is cut off, and the limit jumps to the smallest value that
+            lets a cut-off node through (further while iterations stay cheap);
+          * the depths reached by a completed iteration are exact distances, so they
+            carry over as a transposition table and later iterations never expand a
+            node deeper than its known distance;
+          * an iteration that cuts nothing off proves the target unreachable.
+        max_depth=None bounds the limit by the number of free cells.
+        """
+        if self.unreachable(start, target, grid): return None
+        if max_depth is None: max_depth = grid.open_count()
+        s, t = grid.index(*start), grid.index(*target)
+        h = self.index_heuristic(grid, t)
+        known = self.new_table(grid, INFINITY)
+        limit, step, work, expanded, result = h(s), 1, 0, 0, None
+        # While `exact`, no smaller limit can succeed, so a hit is the dls() path
+        exact = True
+        while limit < max_depth:
+            result, known, cutoff = self.bounded_dfs(grid, s, t, limit, known, h, exact, callback)
+            expanded += self.nodes_expanded
+            if result: break
+            if known[t] != INFINITY:
+                # The limit overshot: the target's depth is now known exactly, and
+                # one pass with exactly that limit finds the path dls() would.
+                limit, exact = known[t], True
+                continue
+            if cutoff is None or cutoff >= max_depth: break
+            step = step * 2 if self.nodes_expanded < 2 * work else 1
+            work = self.nodes_expanded
+            limit = min(max(cutoff, limit + step), max_depth - 1)
+            exact = limit == cutoff
+        self.nodes_expanded = expanded
+        return result
+
+    def bounded_dfs(self, grid, s, t, limit, known, h, stop_at_target=True, callback=None):
+        """
+        One IDDFS iteration: dls() with depth + heuristic bounded by `limit` and depths
+        bounded by `known`. Returns (path, depths reached, smallest cut-off or None).
+        """
+        cells, offsets = grid.cells, self.offsets[::-1]
+        stack = [(s, 0)]
+        parent = self.new_table(grid, UNVISITED)
+        depths = self.new_table(grid, INFINITY)
+        parent[s], depths[s] = ROOT, 0
+        cutoff = None
+        self.nodes_expanded = 0
+        if callback: callback(PUSHED, s)
+
+        while stack:
+            current, depth = stack.pop()
+            self.nodes_expanded += 1
+            if callback:
+                callback(POPPED, current)
+                callback(SETTLED, current)
+            if current == t:
+                if stop_at_target: return self.report(self.reconstruct_path(grid, parent, t), callback), depths, None
+                continue
+
+            # Same order and depth rule as dls(), plus the two cut-offs
+            next_depth = depth + 1
+            for off in offsets:
+                neighbor = current + off
+                if cells[neighbor] != WALL and next_depth < depths[neighbor] and next_depth <= known[neighbor]:
+                    f = next_depth + h(neighbor)
+                    if f > limit:
+                        if cutoff is None or f < cutoff: cutoff = f
+                        continue
+                    depths[neighbor] = next_depth
+                    parent[neighbor] = current
+                    stack.append((neighbor, next_depth))
+                    if callback: callback(PUSHED, neighbor)
+        return None, depths, cutoff
 
     # --- 6. Bidirectional Search ---
-    def bidirectional_search(self, start, target, grid, callback):
-        f_queue = collections.deque([start])
-        b_queue = collections.deque([target])
-        f_visited = {start: None}
-        b_visited = {target: None}
+    def bidirectional_search(self, start, target, grid, callback=None):
+        if self.unreachable(start, target, grid): return None
+        cells, offsets = grid.cells, self.offsets
+        s, t = grid.index(*start), grid.index(*target)
+        f_queue = collections.deque([s])
+        b_queue = collections.deque([t])
+        f_parent = self.new_table(grid, UNVISITED)
+        b_parent = self.new_table(grid, UNVISITED)
+        f_parent[s] = ROOT
+        b_parent[t] = ROOT
+        self.nodes_expanded = 0
+        if callback:
+            callback(PUSHED, s)
+            callback(PUSHED, t)
 
         while f_queue and b_queue:
             # Forward step
             if f_queue:
                 f_curr = f_queue.popleft()
-                for n in self.get_neighbors(f_curr, grid):
-                    if n not in f_visited:
-                        f_visited[n] = f_curr
+                self.nodes_expanded += 1
+                if callback:
+                    callback(POPPED, f_curr)
+                    callback(SETTLED, f_curr)
+                for off in offsets:
+                    n = f_curr + off
+                    if cells[n] != WALL and f_parent[n] == UNVISITED:
+                        f_parent[n] = f_curr
                         f_queue.append(n)
-                        callback(n, list(f_queue), f_visited.keys())
-                        if n in b_visited: return self.join_paths(f_visited, b_visited, n)
-            
+                        if callback: callback(PUSHED, n)
+                        if b_parent[n] != UNVISITED: return self.report(self.join_paths(grid, f_parent, b_parent, n), callback)
+
             # Backward step
             if b_queue:
                 b_curr = b_queue.popleft()
-                for n in self.get_neighbors(b_curr, grid):
-                    if n not in b_visited:
-                        b_visited[n] = b_curr
+                self.nodes_expanded += 1
+                if callback:
+                    callback(POPPED, b_curr)
+                    callback(SETTLED, b_curr)
+                for off in offsets:
+                    n = b_curr + off
+                    if cells[n] != WALL and b_parent[n] == UNVISITED:
+                        b_parent[n] = b_curr
                         b_queue.append(n)
-                        callback(n, list(b_queue), b_visited.keys())
-                        if n in f_visited: return self.join_paths(f_visited, b_visited, n)
+                        if callback: callback(PUSHED, n)
+                        if f_parent[n] != UNVISITED: return self.report(self.join_paths(grid, f_parent, b_parent, n), callback)
         return None
 
+    # --- 7. A* Search (and Weighted / Anytime A*) ---
+    def heuristic(self, a, b):
+        """
+        Exact move count between two cells on an open grid, for THIS move set.
+        The only diagonals are Bottom-Right (1, 1) and Top-Left (-1, -1), so when the
+        row and column offsets have the same sign one diagonal step fixes both;
+        otherwise every step fixes only one of them. Never overestimates with walls
+        or terrain, since every step costs at least 1.
+        """
+        dr, dc = b[0] - a[0], b[1] - a[1]
+        if dr * dc > 0: return max(abs(dr), abs(dc))
+        return abs(dr) + abs(dc)
+
+    def index_heuristic(self, grid, t):
+        # heuristic() from a cell index to the fixed target index `t`
+        stride = grid.stride
+        tr, tc = divmod(t, stride)
+        def h(i):
+            r, c = divmod(i, stride)
+            dr, dc = tr - r, tc - c
+            if dr * dc > 0: return max(abs(dr), abs(dc))
+            return abs(dr) + abs(dc)
+        return h
+
+    def astar(self, start, target, grid, callback=None):
+        path, cost = self.search_astar(start, target, grid, 1.0, callback)
+        return path
+
+    def weighted_astar(self, start, target, grid, weight=2.0, callback=None):
+        # f = g + weight * h: far fewer expansions, path at most `weight` times optimal
+        path, cost = self.search_astar(start, target, grid, weight, callback)
+        return path
+
+    def anytime_astar(self, start, target, grid, weights=(3.0, 2.0, 1.5, 1.0), callback=None, time_limit=None):
+        # Runs weighted A* with decreasing weights. Each round only looks for paths
+        # cheaper than the best one so far, and stops early once `time_limit`
+        # seconds have passed (checked between rounds) or no better path exists.
+        deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        best_path, bound, expanded = None, INFINITY, 0
+        for weight in weights:
+            if deadline is not None and best_path and time.perf_counter() > deadline: break
+            path, cost = self.search_astar(start, target, grid, weight, callback, bound)
+            expanded += self.nodes_expanded
+            if not path: break
+            best_path, bound = path, cost
+        self.nodes_expanded = expanded
+        return best_path
+
+    def search_astar(self, start, target, grid, weight, callback=None, bound=INFINITY):
+        """
+        Returns (path, cost), the cost counting terrain (see ucs()). Nodes whose
+        optimistic cost g + h reaches `bound` are pruned.
+        """
+        if self.unreachable(start, target, grid): return None, INFINITY
+        cells, offsets = grid.cells, self.offsets
+        s, t = grid.index(*start), grid.index(*target)
+        h = self.index_heuristic(grid, t)
+        h_s = h(s)
+        pq = [(weight * h_s, h_s, 0, s)]
+        parent = self.new_table(grid, UNVISITED)
+        best = self.new_table(grid, INFINITY)
+        parent[s], best[s] = ROOT, 0
+        self.nodes_expanded = 0
+        if callback: callback(PUSHED, s)
+        while pq:
+            f, h_cur, cost, current = heapq.heappop(pq)
+            if cost > best[current]:
+                # Stale entry: this node was re-pushed with a cheaper cost
+                if callback: callback(POPPED, current)
+                continue
+            self.nodes_expanded += 1
+            if callback:
+                callback(POPPED, current)
+                callback(SETTLED, current)
+            if current == t: return self.report(self.reconstruct_path(grid, parent, t), callback), cost
+
+            for off in offsets:
+                neighbor = current + off
+                value = cells[neighbor]
+                if value == WALL: continue
+                new_cost = cost + STEP_COST[value]
+                if new_cost < best[neighbor]:
+                    h_n = h(neighbor)
+                    if new_cost + h_n >= bound: continue
+                    best[neighbor], parent[neighbor] = new_cost, current
+                    heapq.heappush(pq, (new_cost + weight * h_n, h_n, new_cost, neighbor))
+                    if callback: callback(PUSHED, neighbor)
+        return None, INFINITY
+
+    # --- 10. Distance Field (many-to-one) ---
+    def distance_field(self, target, grid):
+        """
+        Distances from every cell to `target`, plus the first move of a shortest path
+        toward it, computed in one pass. Use it instead of one bfs() per start when
+        many starts share a target; DistanceField.path_from() is O(path length).
+        """
+        t = grid.index(*target)
+        # back[k]: index of the move that undoes direction k (the move set is symmetric)
+        back = [self.offsets.index(-off) for off in self.offsets]
+        if np is not None:
+            dist, step = self.field_numpy(t, grid, back)
+        else:
+            dist, step = self.field_python(t, grid, back)
+        field = DistanceField(grid, target, dist, step, self.offsets)
+        self.nodes_expanded = field.reached
+        return field
+
+    def field_numpy(self, t, grid, back):
+        # Level-synchronous BFS: the whole frontier is shifted by each of the six
+        # offsets at once, and cells not reached yet form the next level.
+        n = len(grid.cells)
+        dist = np.full(n, -1, dtype=np.int32)
+        step = np.full(n, -1, dtype=np.int8)
+        # Cells still open to the search; the wall border keeps every shift in range
+        unreached = np.frombuffer(grid.cells, dtype=np.uint8) != WALL
+        if not unreached[t]: return dist, step
+        dist[t], unreached[t] = 0, False
+        # Narrow frontiers (corridors, mazes) are cheaper to expand one cell at a
+        # time than to pay NumPy's per-call overhead six times per level.
+        dist_v, step_v, open_v = memoryview(dist), memoryview(step), memoryview(unreached)
+        frontier = [t]
+        level = 0
+        while frontier:
+            level += 1
+            found = []
+            if len(frontier) < FIELD_VECTOR_MIN:
+                for k, off in enumerate(self.offsets):
+                    for cell in frontier:
+                        cell += off
+                        if open_v[cell]:
+                            open_v[cell] = False
+                            dist_v[cell], step_v[cell] = level, back[k]
+                            found.append(cell)
+                frontier = found
+                continue
+            frontier = np.asarray(frontier, dtype=np.intp)
+            for k, off in enumerate(self.offsets):
+                cells = frontier + off
+                cells = cells[unreached[cells]]
+                if not cells.size: continue
+                # Each shifted frontier has no duplicates, and clearing `unreached`
+                # before the next direction keeps one parent per cell.
+                unreached[cells] = False
+                dist[cells] = level
+                step[cells] = back[k]
+                found.append(cells)
+            frontier = np.concatenate(found).tolist() if found else []
+        return dist, step
+
+    def field_python(self, t, grid, back):
+        cells, offsets = grid.cells, self.offsets
+        dist = array('i', [-1]) * len(cells)
+        step = array('b', [-1]) * len(cells)
+        if cells[t] == WALL: return dist, step
+        dist[t] = 0
+        queue = collections.deque([t])
+        while queue:
+            current = queue.popleft()
+            d = dist[current] + 1
+            for k, off in enumerate(offsets):
+                neighbor = current + off
+                if cells[neighbor] != WALL and dist[neighbor] < 0:
+                    dist[neighbor], step[neighbor] = d, back[k]
+                    queue.append(neighbor)
+        return dist, step
+
+    # --- 11. Bitboard Backend (BFS / Bidirectional on packed bitsets) ---
+    def bitgrid(self, grid):
+        # The packed open-cell mask is rebuilt only when the grid changed
+        bits = getattr(self, '_bitgrid', None)
+        if bits is None or bits.grid is not grid or bits.stale:
+            bits = self._bitgrid = BitGrid(grid, self.offsets)
+        bits.expanded = 0
+        return bits
+
+    def bfs_bitboard(self, start, target, grid, callback=None):
+        """
+        bfs() on bitsets (see bitboard.py): whole frontiers advance with shifts and
+        ANDs, using bits instead of an int table per cell. Returns a shortest path,
+        though not necessarily the one bfs() picks among equally short ones.
+        The frontier advances a level at a time, so nodes_expanded counts every cell
+        closer than the target, plus the target: the part of the target's own level
+        that bfs() pops before it depends on queue order, and is not counted. Runs
+        bfs() when NumPy is not installed.
+        """
+        if np is None: return self.bfs(start, target, grid, callback)
+        bits = self.bitgrid(grid)
+        route = bits.bfs(grid.index(*start), grid.index(*target))
+        self.nodes_expanded = bits.expanded
+        if route is None: return None
+        return self.report([grid.coord(i) for i in route], callback)
+
+    def bidirectional_bitboard(self, start, target, grid, callback=None):
+        """
+        bidirectional_search() on bitsets; the waves meet where their frontiers AND
+        to non-zero. nodes_expanded counts the cells of the levels both waves
+        expanded. Runs bidirectional_search() when NumPy is not installed.
+        """
+        if np is None: return self.bidirectional_search(start, target, grid, callback)
+        bits = self.bitgrid(grid)
+        route = bits.route(grid.index(*start), grid.index(*target))
+        self.nodes_expanded = bits.expanded
+        if route is None: return None
+        return self.report([grid.coord(i) for i in route], callback)
+
+    # --- 12. HPA* (Hierarchical Pathfinding) ---
+    def hierarchy(self, grid, cluster_size=CLUSTER_SIZE):
+        # Kept between queries; it follows single-cell edits of the grid on its own
+        hpa = getattr(self, '_hierarchy', None)
+        if hpa is None or hpa.grid is not grid or hpa.size != cluster_size:
+            hpa = self._hierarchy = HierarchicalMap(grid, self, cluster_size)
+        return hpa
+
+    def hpa_star(self, start, target, grid, cluster_size=CLUSTER_SIZE, callback=None):
+        """
+        A* on the cluster graph of hierarchy.py, refined into cells. Near-shortest
+        paths; nodes_expanded counts abstract nodes, not cells.
+        """
+        hpa = self.hierarchy(grid, cluster_size)
+        path = hpa.find_path(start, target)
+        self.nodes_expanded = hpa.nodes_expanded
+        if path is None: return None
+        return self.report(path, callback)
+
     # --- Helper Functions ---
-    def join_paths(self, f_visited, b_visited, meeting_node):
-        path_f = self.reconstruct_path(f_visited, meeting_node)
+    def join_paths(self, grid, f_parent, b_parent, meeting_node):
+        path_f = self.reconstruct_path(grid, f_parent, meeting_node)
         path_b = []
-        if meeting_node in b_visited:
-            curr = b_visited[meeting_node]
-            while curr is not None:
-                path_b.append(curr)
-                curr = b_visited[curr]
+        curr = b_parent[meeting_node]
+        while curr != ROOT:
+            path_b.append(grid.coord(curr))
+            curr = b_parent[curr]
         return path_f + path_b
 
-    def reconstruct_path(self, visited, current):
+    def reconstruct_path(self, grid, parent, current):
         path = []
-        while current is not None:
-            path.append(current)
-            current = visited[current]
+        while current != ROOT:
+            path.append(grid.coord(current))
+            current = parent[current]
         return path[::-1]
 
-    def reconstruct_path_dict(self, visited, current):
-        path = []
-        while current is not None:
-            path.append(current)
-            current = visited[current][1]
-        return path[::-1]
\ No newline at end of file
+    def report(self, path, callback):
+        if callback: callback(FOUND, path)
+        return path
+
+class DistanceField:
+    """
+    Result of SearchAlgorithms.distance_field(): for every cell, its distance to the
+    target (-1 if unreachable) and the move toward it, as flat tables over the padded
+    grid (NumPy arrays when available). Valid while grid.version is unchanged.
+    """
+    def __init__(self, grid, target, dist, step, offsets):
+        self.grid = grid
+        self.target = tuple(target)
+        self.version = grid.version
+        self.dist = dist
+        self.step = step
+        self.offsets = offsets
+        if np is not None and isinstance(dist, np.ndarray):
+            self.reached = int(np.count_nonzero(dist >= 0))
+            self.max_distance = int(dist.max())
+        else:
+            self.reached = sum(1 for d in dist if d >= 0)
+            self.max_distance = max(dist)
+
+    @property
+    def stale(self):
+        return self.version != self.grid.version
+
+    def distance(self, cell):
+        """Moves from `cell` to the target, or None if it cannot reach it."""
+        d = int(self.dist[self.grid.index(*cell)])
+        return d if d >= 0 else None
+
+    def path_from(self, start):
+        """Shortest path from `start` to the target by following the stored moves, or None."""
+        grid, dist, step, offsets = self.grid, self.dist, self.step, self.offsets
+        i = grid.index(*start)
+        if dist[i] < 0: return None
+        path = [grid.coord(i)]
+        while dist[i]:
+            i += offsets[step[i]]
+            path.append(grid.coord(i))
+        return path
@@ -0,0 +1,200 @@
+"""
+Multi-agent routing.
+
+Many agents move on one grid at the same time. Routes are found by prioritized
+planning (cooperative A*): agents plan one after another in space-time, i.e. on
+(cell, time step) states with "wait" as a seventh move, and every route is
+entered in a reservation table that the agents planned later must avoid, both
+for cells (two agents on one cell) and for moves (two agents swapping cells).
+
+The heuristic of each search is the exact distance to the agent's target from
+a DistanceField (see ALGORITHM.py), so without conflicts an agent walks its
+shortest path with almost no extra expansions. Agents heading to the same
+target share one field, so hundreds of agents with a few targets cost a few
+field passes plus one short search each.
+
+Routes are lists of (r, c), one per time step. An agent either parks on its
+target once it arrives (the cell stays reserved) or, when agents share targets,
+leaves the map there.
+"""
+import heapq
+import time
+from array import array
+from ALGORITHM import SearchAlgorithms
+from environment import WALL
+
+NEVER = 2**31 - 1   # parked_at value of cells no agent parks on
+WAIT_SLACK = 64     # time steps an agent may lose to waits and detours
+# An agent gives up after this many expansions per time step of its allowed
+# arrival time, so an agent that is walled in by parked ones fails quickly
+EXPANSIONS_PER_STEP = 16
+
+class ReservationTable:
+    """Cells and moves claimed by the routes planned so far, keyed on time step."""
+    def __init__(self, n):
+        self.n = n
+        self.cells = set()                         # t * n + cell
+        self.moves = set()                         # (t * n + cell) * 8 + move index
+        self.last_use = array('i', [-1]) * n       # last time step any route is on a cell
+        self.parked_at = array('i', [NEVER]) * n   # time step from which an agent stays on a cell
+        # From this time step on nothing but parked agents is reserved
+        self.horizon = 0
+
+    def is_free(self, cell, t):
+        return t < self.parked_at[cell] and t * self.n + cell not in self.cells
+
+    def arrivals(self, cell, earliest=0):
+        """next[x]: the first time step >= max(x, earliest) when `cell` is free, for x up to the horizon."""
+        end = max(self.horizon, earliest) + 1
+        nxt = [0] * (end + 1)
+        nxt[end] = end
+        for x in range(end - 1, -1, -1):
+            nxt[x] = x if x >= earliest and self.is_free(cell, x) else nxt[x + 1]
+        return nxt
+
+    def reserve(self, route, moves, park):
+        # `route` as cell indices, `moves[k]` the move index taken from route[k]
+        n = self.n
+        for t, cell in enumerate(route):
+            self.cells.add(t * n + cell)
+            if t > self.last_use[cell]: self.last_use[cell] = t
+        for t, k in enumerate(moves):
+            self.moves.add((t * n + route[t]) * 8 + k)
+        if park: self.parked_at[route[-1]] = len(route) - 1
+        self.horizon = max(self.horizon, len(route))
+
+class MultiAgentPlanner:
+    def __init__(self, grid, algo=None, park=True, slack=WAIT_SLACK):
+        self.grid = grid
+        self.algo = algo or SearchAlgorithms(grid.size)
+        self.park = park
+        self.slack = slack
+        # Moves 0-5 are SearchAlgorithms.offsets, move 6 waits
+        self.moves = tuple(self.algo.offsets) + (0,)
+        self.back = [self.moves.index(-off) for off in self.moves]
+        self.fields = {}   # target -> (DistanceField, its distances as a list)
+        self.reset()
+
+    def reset(self):
+        """Forgets all reservations (the distance fields are kept while the grid is unchanged)."""
+        self.reservations = ReservationTable(len(self.grid.cells))
+        self.planned = 0
+        self.failed = 0
+        self.nodes_expanded = 0
+        self.fields_built = 0
+        self.elapsed = 0.0
+
+    @property
+    def plans_per_second(self):
+        return self.planned / self.elapsed if self.elapsed else 0.0
+
+    def distances(self, target):
+        # One field per target, shared by every agent heading there
+        entry = self.fields.get(target)
+        if entry is None or entry[0].stale:
+            field = self.algo.distance_field(target, self.grid)
+            # Plain list: indexing NumPy scalars one at a time is slow
+            dist = field.dist.tolist() if hasattr(field.dist, 'tolist') else list(field.dist)
+            entry = self.fields[target] = (field, dist)
+            self.fields_built += 1
+        return entry[1]
+
+    def plan(self, start, target):
+        """Plans and reserves a route for one more agent; returns it, or None if it found none."""
+        t0 = time.perf_counter()
+        grid = self.grid
+        dist = self.distances(tuple(target))
+        s, g = grid.index(*start), grid.index(*target)
+        found = self.search(s, g, dist) if dist[s] >= 0 else None
+        self.elapsed += time.perf_counter() - t0
+        if found is None:
+            self.failed += 1
+            return None
+        route, moves = found
+        self.reservations.reserve(route, moves, self.park)
+        self.planned += 1
+        return [grid.coord(i) for i in route]
+
+    def plan_all(self, tasks):
+        """Plans (start, target) tasks in priority order; returns their routes (None where none was found)."""
+        return [self.plan(start, target) for start, target in tasks]
+
+    def search(self, s, g, dist):
+        # Space-time A*. A state's cost is its time step, so the first time a state
+        # is reached is also the cheapest and it never needs to be pushed again.
+        # Past the reservation horizon only parked agents matter, which do not
+        # change with time, so all later time steps of a cell share one state.
+        cells, moves, back = self.grid.cells, self.moves, self.back
+        res, park = self.reservations, self.park
+        n, horizon = res.n, res.horizon
+        if not res.is_free(s, 0): return None
+        # The heuristic is the distance plus the wait for the target to be free:
+        # reaching it by time step x means arriving at nxt[x] at the earliest (a
+        # parking agent only once the last route through it has passed). Ties go
+        # to the smaller distance, so agents wait next to a busy target, not at home.
+        nxt = res.arrivals(g, res.last_use[g] + 1 if park else 0)
+        end = len(nxt) - 1
+        def arrival(x): return nxt[x] if x < end else x
+        limit = arrival(dist[s]) + self.slack
+        budget = EXPANSIONS_PER_STEP * limit
+        parent = {s: -1}
+        move_of = {}
+        pq = [(arrival(dist[s]), dist[s], 0, s)]
+        expanded = 0
+        while pq and expanded < budget:
+            _, _, negative_t, cell = heapq.heappop(pq)
+            t = -negative_t
+            expanded += 1
+            if cell == g and arrival(t) == t:
+                self.nodes_expanded += expanded
+                return self.unwind(min(t, horizon) * n + cell, parent, move_of, n)
+            if t >= limit: continue
+            nt = t + 1
+            base = min(nt, horizon) * n
+            here = min(t, horizon) * n + cell
+            for k, off in enumerate(moves):
+                if not off and t >= horizon: continue
+                nb = cell + off
+                if cells[nb] == WALL: continue
+                d = dist[nb]
+                if d < 0 or nt + d > limit: continue
+                key = base + nb
+                if key in parent or not res.is_free(nb, nt): continue
+                # No swapping cells with an agent coming the other way
+                if off and (t * n + nb) * 8 + back[k] in res.moves: continue
+                parent[key] = here
+                move_of[key] = k
+                heapq.heappush(pq, (arrival(nt + d), d, -nt, nb))
+        self.nodes_expanded += expanded
+        return None
+
+    def unwind(self, key, parent, move_of, n):
+        route, moves = [], []
+        while key != -1:
+            route.append(key % n)
+            if key in move_of: moves.append(move_of[key])
+            key = parent[key]
+        return route[::-1], moves[::-1]
+
+def position(route, t, park=True):
+    """Where an agent following `route` is at time step t (None once it has left the map)."""
+    if t < len(route): return route[t]
+    return route[-1] if park else None
+
+def collisions(routes, park=True):
+    """Number of vertex and swap conflicts between the routes (0 for a valid plan)."""
+    routes = [route for route in routes if route]
+    horizon = max((len(route) for route in routes), default=0)
+    count = 0
+    for t in range(horizon):
+        now = [position(route, t, park) for route in routes]
+        taken = [cell for cell in now if cell is not None]
+        count += len(taken) - len(set(taken))
+        if t + 1 < horizon:
+            moves = set()
+            for route, cell in zip(routes, now):
+                after = position(route, t + 1, park)
+                if cell is None or after is None or after == cell: continue
+                if (after, cell) in moves: count += 1
+                moves.add((cell, after))
+    return count
@@ -0,0 +1,253 @@
+"""
+Performance regression suite for the search algorithms.
+
+Runs every algorithm over a fixed matrix of cases, each map type of headless.py
+at sizes from 20x20 to 2000x2000, with fixed seeds, so every run of the suite
+searches exactly the same maps between exactly the same start/target pairs.
+Per case it records the best wall time of --repeat runs, the nodes expanded and
+the tracemalloc peak of one more run (tracing slows the search, so it is never
+timed). The results are compared with a baseline file written by an earlier
+run; a case that expanded more nodes or used more memory than its baseline by
+more than --threshold, or returned a different path, fails the suite (exit
+status 1), which is what a CI job checks.
+
+Expansions, paths and memory peaks are the same on every machine, so those are
+what the committed baseline holds and what is checked by default. Timings only
+compare against a baseline recorded on the same machine and vary from run to
+run, so they are checked only with --check-time, which also makes
+--save-baseline record them.
+
+    python benchmark.py --quick                          # compare against the committed baseline
+    python benchmark.py --save-baseline                  # record the baseline
+    python benchmark.py --save-baseline --check-time     # ... with this machine's timings
+    python benchmark.py --check-time --time-threshold 0.5
+    python benchmark.py --sizes 500 --maps maze --format json > maze.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import time
+from ALGORITHM import SearchAlgorithms
+from instrument import traced_peak
+import headless
+
+BASELINE_FILE = 'benchmark_baseline.json'
+FORMAT_VERSION = 1
+SIZES = (20, 100, 500, 2000)
+QUICK_SIZES = (20, 100)
+SEED = 0
+DENSITY = 0.3
+PAIRS = 2          # start/target pairs per case
+REPEAT = 3         # timed runs per case; the fastest one counts
+# Fast cases are run again until this many seconds were spent timing them (at
+# most MAX_REPEAT runs), since the best of three short runs is mostly noise
+MIN_TIMING = 0.5
+MAX_REPEAT = 100
+THRESHOLD = 0.25   # allowed relative increase of expansions and memory (and time, see --check-time)
+# Changes below these are noise, whatever the relative change
+MIN_TIME_MS = 1.0
+MIN_BYTES = 16 * 1024
+
+def case_key(algorithm, kind, size):
+    return f"{kind}-{size}/{algorithm}"
+
+def build_case(kind, size):
+    # The trap layout is built around the start node, as in headless.py
+    start = (min(2, size - 1),) * 2 if kind == 'trap' else None
+    env = headless.build_map(kind, size, SEED, DENSITY, start)
+    pairs = headless.make_pairs(env, PAIRS, SEED, start)
+    return env, pairs
+
+def run_case(name, env, pairs, opts, repeat=REPEAT):
+    """Measures algorithm `name` on the pairs of one map; returns its result dict."""
+    solve = headless.ALGORITHMS[name]
+    def run():
+        # A new SearchAlgorithms per run, so caches such as HPA*'s clusters start cold every time
+        algo = SearchAlgorithms(env.size)
+        expanded, paths = 0, []
+        for s, t in pairs:
+            paths.append(solve(algo, s, t, env, opts, None))
+            expanded += algo.nodes_expanded
+        return expanded, paths
+    best, spent, runs = None, 0.0, 0
+    while runs < repeat or (spent < MIN_TIMING and runs < MAX_REPEAT):
+        # Timed like timeit: a collection in the middle of one run would only add noise
+        gc.collect()
+        gc.disable()
+        try:
+            t0 = time.perf_counter()
+            expanded, paths = run()
+            elapsed = time.perf_counter() - t0
+        finally:
+            gc.enable()
+        best = elapsed if best is None else min(best, elapsed)
+        spent += elapsed
+        runs += 1
+    _, peak = traced_peak(run)
+    return {
+        'algorithm': name,
+        'time_ms': round(best * 1000, 3),
+        'expanded': expanded,
+        'peak_bytes': peak,
+        'found': sum(1 for path in paths if path),
+        'path_len': sum(len(path) for path in paths if path),
+    }
+
+def run_suite(opts, report=None):
+    """Runs every selected case; `report(key, result)` is called as each one finishes."""
+    results = {}
+    for size in opts.sizes:
+        for kind in opts.maps:
+            env, pairs = build_case(kind, size)
+            for name in opts.algos:
+                key = case_key(name, kind, size)
+                result = results[key] = run_case(name, env, pairs, opts, opts.repeat)
+                result.update(map=kind, size=size)
+                if report: report(key, result)
+    return results
+
+# --- Baseline ---
+def load_baseline(path):
+    with open(path) as f:
+        baseline = json.load(f)
+    if baseline.get('version') != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported baseline version {baseline.get('version')}")
+    return baseline
+
+def save_baseline(path, results, times=False):
+    """
+    Writes `results` to the baseline at `path`. Timings are kept only with
+    `times`, as they only mean something on the machine that recorded them.
+    """
+    # Cases not run this time (e.g. other --algos) keep their old baseline
+    cases = load_baseline(path)['cases'] if os.path.exists(path) else {}
+    for key, result in results.items():
+        cases[key] = result if times else {field: value for field, value in result.items() if field != 'time_ms'}
+    baseline = {
+        'version': FORMAT_VERSION,
+        'python': platform.python_version(),
+        'seed': SEED,
+        'pairs': PAIRS,
+        'cases': dict(sorted(cases.items())),
+    }
+    if any('time_ms' in case for case in cases.values()): baseline['machine'] = platform.platform()
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2)
+        f.write('\n')
+
+def compare(result, base, threshold, time_threshold=None):
+    """
+    Regressions of `result` against its baseline `base`, as short descriptions.
+    Time is compared only when `time_threshold` is given and `base` has a time.
+    """
+    problems = []
+    if (result['found'], result['path_len']) != (base['found'], base['path_len']):
+        problems.append(f"paths changed ({base['path_len']} -> {result['path_len']} cells)")
+    checks = [('expanded', 'expanded', 0, threshold), ('peak_bytes', 'memory', MIN_BYTES, threshold)]
+    if time_threshold is not None and 'time_ms' in base:
+        checks.insert(0, ('time_ms', 'slower', MIN_TIME_MS, time_threshold))
+    for field, label, floor, allowed in checks:
+        new, old = result[field], base[field]
+        if new > old * (1 + allowed) and new - old > floor:
+            problems.append(f"{label} +{(new / old - 1) * 100 if old else float('inf'):.0f}%")
+    return problems
+
+def check(results, baseline, threshold, time_threshold=None):
+    """(key -> regressions) for every case that regressed, and the keys missing from the baseline."""
+    cases = baseline['cases']
+    regressions = {}
+    for key, result in results.items():
+        if key in cases:
+            problems = compare(result, cases[key], threshold, time_threshold)
+            if problems: regressions[key] = problems
+    return regressions, [key for key in results if key not in cases]
+
+# --- Output ---
+def print_header(out=sys.stdout):
+    print(f"{'CASE':<32}{'TIME(ms)':>12}{'BASE(ms)':>12}{'EXPANDED':>12}{'PEAK(KB)':>12}  STATUS", file=out)
+
+def print_row(key, result, base, threshold, time_threshold=None, out=sys.stdout):
+    if base is None: status, base_ms = 'new', '-'
+    else:
+        status = ', '.join(compare(result, base, threshold, time_threshold)) or 'ok'
+        base_ms = f"{base['time_ms']:.1f}" if 'time_ms' in base else '-'
+    print(f"{key:<32}{result['time_ms']:>12.1f}{base_ms:>12}{result['expanded']:>12}"
+          f"{result['peak_bytes'] / 1024:>12.0f}  {status}", file=out, flush=True)
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Run the search benchmark matrix and compare it with a baseline.")
+    p.add_argument('--baseline', default=BASELINE_FILE, help="baseline file to compare with or to write")
+    p.add_argument('--save-baseline', action='store_true', help="record these results as the baseline "
+                   "(cases not run keep their old values) instead of comparing")
+    p.add_argument('--threshold', type=float, default=THRESHOLD, help="allowed relative increase of "
+                   "expansions and memory over the baseline (0.25 = 25%%)")
+    p.add_argument('--check-time', action='store_true', help="also fail cases that got slower than the "
+                   "baseline's timings, which must come from this machine; with --save-baseline, record them")
+    p.add_argument('--time-threshold', type=float, help="allowed relative increase of time with --check-time "
+                   "(default: --threshold)")
+    p.add_argument('--algos', default=','.join(headless.ALGORITHMS),
+                   help="comma separated subset of: " + ', '.join(headless.ALGORITHMS))
+    p.add_argument('--maps', default=','.join(headless.MAP_TYPES), help="comma separated subset of: " + ', '.join(headless.MAP_TYPES))
+    p.add_argument('--sizes', help="comma separated grid sizes (default: " + ', '.join(map(str, SIZES)) + ")")
+    p.add_argument('--quick', action='store_true', help="only the small sizes (" + ', '.join(map(str, QUICK_SIZES)) + ")")
+    p.add_argument('--repeat', type=int, default=REPEAT, help="timed runs per case, more for fast cases; the fastest counts")
+    p.add_argument('--format', choices=['table', 'json'], default='table')
+    opts = p.parse_args(argv)
+    opts.algos = [a.strip() for a in opts.algos.split(',') if a.strip()]
+    for name in opts.algos:
+        if name not in headless.ALGORITHMS: p.error(f"unknown algorithm '{name}'")
+    opts.maps = [m.strip() for m in opts.maps.split(',') if m.strip()]
+    for kind in opts.maps:
+        if kind not in headless.MAP_TYPES: p.error(f"unknown map type '{kind}'")
+    if opts.sizes: opts.sizes = [int(s) for s in opts.sizes.split(',')]
+    else: opts.sizes = list(QUICK_SIZES if opts.quick else SIZES)
+    if opts.repeat < 1: p.error("--repeat must be at least 1")
+    if opts.time_threshold is not None and not opts.check_time: p.error("--time-threshold needs --check-time")
+    if opts.check_time and opts.time_threshold is None: opts.time_threshold = opts.threshold
+    # The algorithm parameters (dls limit, wastar weight, ...) are headless.py's defaults
+    params = headless.parse_args([])
+    for name in ('dls_limit', 'iddfs_depth', 'weight', 'time_limit', 'cluster_size'):
+        setattr(opts, name, getattr(params, name))
+    return opts
+
+def main(argv=None):
+    opts = parse_args(argv)
+    baseline = None
+    if not opts.save_baseline:
+        if not os.path.exists(opts.baseline):
+            print(f"No baseline at {opts.baseline}; record one with --save-baseline", file=sys.stderr)
+            return 2
+        baseline = load_baseline(opts.baseline)
+        if opts.check_time and baseline.get('machine') != platform.platform():
+            recorded = f"recorded on {baseline['machine']}" if 'machine' in baseline else "recorded without timings"
+            print(f"Note: the baseline was {recorded}; timings may not compare", file=sys.stderr)
+    report = None
+    if opts.format == 'table':
+        print_header()
+        cases = baseline['cases'] if baseline else {}
+        report = lambda key, result: print_row(key, result, cases.get(key), opts.threshold, opts.time_threshold)
+    results = run_suite(opts, report)
+    if opts.save_baseline:
+        save_baseline(opts.baseline, results, opts.check_time)
+        if opts.format == 'json':
+            json.dump({'results': results}, sys.stdout, indent=2)
+            print()
+        else:
+            print(f"\nSaved {len(results)} cases to {opts.baseline}")
+        return 0
+    regressions, new = check(results, baseline, opts.threshold, opts.time_threshold)
+    if opts.format == 'json':
+        json.dump({'threshold': opts.threshold, 'time_threshold': opts.time_threshold, 'results': results,
+                   'regressions': regressions, 'new': new}, sys.stdout, indent=2)
+        print()
+    else:
+        timing = f", time {opts.time_threshold:.0%}" if opts.check_time else ", time not checked"
+        print(f"\n{len(results)} cases, {len(regressions)} regressed, {len(new)} not in the baseline "
+              f"(threshold {opts.threshold:.0%}{timing})")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+"""
+Bit-parallel BFS backend for large grids.
+
+The grid is cut into 64-cell words, `words` of them per row of the padded grid
+(see GridEnvironment.cells): word `key` = r * words + c // 64 holds columns
+c // 64 * 64 up to 63 more of row r, one bit per cell. A BFS level is kept as
+two NumPy arrays, the keys of the words it touches and their bits, so only
+active words are ever stored or visited. Moving a level one step in a
+direction shifts every word's bits by the column offset (the bits that cross a
+word boundary go to the neighbouring key) and adds the row offset to the keys;
+the moved words are ORed together in a scratch array indexed by key, masked
+with the open cells and with the cells seen so far, and what is left is the
+next level. Each of those is one vectorized NumPy operation over the level's
+words, so a level costs time in proportion to the words its frontier touches,
+however large the grid is. Levels of only a few words, as in mazes, take the
+same steps in plain Python, where they cost less than the NumPy calls would.
+
+Instead of a parent table, a wave keeps the depth of every cell it has seen
+modulo 3, in two bit-planes: two bits per cell. On an undirected grid the
+neighbours of a cell at depth d are at depth d - 1, d or d + 1, which differ
+modulo 3, so a path is read back by stepping to the neighbour one depth closer
+each time.
+
+The bitboard needs NumPy; SearchAlgorithms runs the regular searches without it.
+"""
+from environment import WALL
+
+try:
+    import numpy as np
+except ImportError:  # Without NumPy there is no bitboard backend (see SearchAlgorithms.bfs_bitboard)
+    np = None
+
+# Levels of at most this many words are stepped in plain Python (see Wave.step_small)
+SMALL_LEVEL = 32
+WORD_MASK = 2**64 - 1
+EDGE_BITS = 1 | 1 << 63
+
+if np is not None:
+    if hasattr(np, 'bitwise_count'):
+        def popcount(bits):
+            return int(np.bitwise_count(bits).sum())
+    else:
+        _BYTE_COUNTS = np.array([bin(b).count('1') for b in range(256)], dtype=np.uint8)
+        def popcount(bits):
+            return int(_BYTE_COUNTS[bits.view(np.uint8)].sum(dtype=np.int64))
+
+def pack_open_words(cells, stride, words):
+    """The open (non-wall) cells of a grid buffer as a flat uint64 array, `words` words per row."""
+    rows = np.frombuffer(cells, dtype=np.uint8).reshape(stride, stride) != WALL
+    packed = np.packbits(rows, axis=1, bitorder='little')
+    # One more row for the spare word (see BitGrid.size)
+    padded = np.zeros((stride + 1, words * 8), dtype=np.uint8)
+    padded[:stride, :packed.shape[1]] = packed
+    return padded.view('<u8').astype(np.uint64, copy=False).reshape(-1)[:stride * words + 1]
+
+def shifted(bits, shift):
+    # Bits moved `shift` columns up (negative: down) within their words
+    if shift > 0: return bits << np.uint64(shift)
+    if shift < 0: return bits >> np.uint64(-shift)
+    return bits
+
+class Wave:
+    """One BFS from a source cell, advanced a level at a time."""
+    def __init__(self, grid, source):
+        self.grid = grid
+        self.source = source
+        key, bit = grid.word(source)
+        self.level = (np.array([key], dtype=np.intp), np.array([1 << bit], dtype=np.uint64))
+        # Depth modulo 3 of every cell seen, as low + 2 * high - 1 (0 in both: not seen)
+        self.low = np.zeros(grid.size, dtype=np.uint64)
+        self.high = np.zeros(grid.size, dtype=np.uint64)
+        self.low[key] = 1 << bit
+        # The same planes as Python ints, for single words (see step_small())
+        self.low_words, self.high_words = memoryview(self.low), memoryview(self.high)
+        self.depth = 0
+        self.count = 1       # cells in the current level
+        self.expanded = 0    # cells of the levels already stepped from
+
+    def phase(self, cell):
+        # Depth of a seen cell modulo 3, or -1
+        key, bit = self.grid.word(cell)
+        return (self.low_words[key] >> bit & 1) + 2 * (self.high_words[key] >> bit & 1) - 1
+
+    def step(self):
+        """Advances one level; returns False once the wave has run out of cells."""
+        keys, bits = self.level
+        if len(keys) <= SMALL_LEVEL: return self.step_small(keys.tolist(), bits.tolist())
+        grid = self.grid
+        scratch, low, high = grid.scratch, self.low, self.high
+        moved = []
+        for key_offset, shifts in grid.moves:
+            word = shifted(bits, shifts[0])
+            for shift in shifts[1:]:
+                word = word | shifted(bits, shift)
+            target = keys + key_offset
+            # Keys are unique within one move, so the buffered |= is exact
+            scratch[target] |= word
+            moved.append(target)
+        candidates = np.concatenate(moved)
+        reached = scratch[candidates]
+        scratch[candidates] = 0
+        # One entry per key: each key's slot keeps the last position it was written
+        # at, and only that position is kept
+        order = np.arange(len(candidates), dtype=np.intp)
+        grid.slots[candidates] = order
+        unique = grid.slots[candidates] == order
+        candidates, reached = candidates[unique], reached[unique]
+        reached &= grid.open_words[candidates] & ~(low[candidates] | high[candidates])
+        active = np.flatnonzero(reached)
+        keys, bits = candidates[active], reached[active]
+        self.depth += 1
+        phase = self.depth % 3
+        if phase != 1: low[keys] |= bits
+        if phase != 0: high[keys] |= bits
+        self.expanded += self.count
+        self.count = popcount(bits)
+        self.level = (keys, bits)
+        return len(keys) > 0
+
+    def step_small(self, keys, bits):
+        # step() one word at a time
+        grid = self.grid
+        reached = {}
+        get = reached.get
+        for key, word in zip(keys, bits):
+            for key_offset, lefts, rights in grid.word_moves:
+                moved = 0
+                for shift in lefts: moved |= word << shift
+                moved &= WORD_MASK
+                for shift in rights: moved |= word >> shift
+                if moved:
+                    key_moved = key + key_offset
+                    reached[key_moved] = get(key_moved, 0) | moved
+            # Only the first and last column of a word carry over to the next word
+            if word & EDGE_BITS:
+                for key_offset, shift in grid.carry_moves:
+                    moved = (word << shift & WORD_MASK) if shift > 0 else word >> -shift
+                    if moved:
+                        key_moved = key + key_offset
+                        reached[key_moved] = get(key_moved, 0) | moved
+        open_words, low, high = grid.open_view, self.low_words, self.high_words
+        self.depth += 1
+        phase = self.depth % 3
+        keys, bits, count = [], [], 0
+        for key, word in reached.items():
+            word &= open_words[key] & ~(low[key] | high[key])
+            if word:
+                if phase != 1: low[key] |= word
+                if phase != 0: high[key] |= word
+                keys.append(key)
+                bits.append(word)
+                count += bin(word).count('1')
+        self.expanded += self.count
+        self.count = count
+        self.level = (np.array(keys, dtype=np.intp), np.array(bits, dtype=np.uint64))
+        return len(keys) > 0
+
+    def path_to(self, cell):
+        """Walks back from `cell` (in the current level) to the source, one depth at a time."""
+        offsets, phase = self.grid.offsets, self.phase
+        path = [cell]
+        for depth in range(self.depth, 0, -1):
+            closer = (depth - 1) % 3
+            for off in offsets:
+                if phase(cell + off) == closer:
+                    cell += off
+                    break
+            path.append(cell)
+        return path[::-1]
+
+class BitGrid:
+    """Open-cell words of a GridEnvironment, plus the searches that run on them."""
+    def __init__(self, grid, offsets):
+        self.grid = grid
+        self.version = grid.version
+        self.offsets = offsets
+        self.stride = grid.stride
+        self.words = (grid.stride + 63) // 64
+        # Plus a spare, never open word: the bits carried past the last word of the
+        # grid, or before the first one (key -1), land there and are dropped
+        self.size = grid.stride * self.words + 1
+        self.moves = self.split_moves(offsets)
+        self.open_words = pack_open_words(grid.cells, grid.stride, self.words)
+        self.open_view = memoryview(self.open_words)
+        # Per-key work arrays of Wave.step(); the scratch words are all zero between steps
+        self.scratch = np.zeros(self.size, dtype=np.uint64)
+        self.slots = np.zeros(self.size, dtype=np.intp)
+        # Cells expanded by the searches since the last reset
+        self.expanded = 0
+
+    def split_moves(self, offsets):
+        """
+        The moves as (key offset, column shifts): a move dr rows and dc columns over
+        moves a word's bits dc columns within the word dr rows over, and the bits
+        that cross the word's edge into the word next to that one. Shifts that land
+        on the same key are grouped, so their words are ORed before being stored.
+        """
+        by_key, within, carries = {}, {}, []
+        for off in offsets:
+            dr = (off + self.stride // 2) // self.stride
+            dc = off - dr * self.stride
+            key = dr * self.words
+            by_key.setdefault(key, []).append(dc)
+            within.setdefault(key, []).append(dc)
+            if dc > 0: carries.append((key + 1, dc - 64))
+            elif dc < 0: carries.append((key - 1, dc + 64))
+        for key, shift in carries: by_key.setdefault(key, []).append(shift)
+        # The same moves for Wave.step_small(): (key offset, left shifts, right
+        # shifts) within words, and the (key offset, shift) of the carries apart
+        self.word_moves = tuple((key, tuple(s for s in shifts if s > 0), tuple(-s for s in shifts if s <= 0))
+                                for key, shifts in sorted(within.items()))
+        self.carry_moves = tuple(carries)
+        return tuple((key, tuple(shifts)) for key, shifts in sorted(by_key.items()))
+
+    @property
+    def stale(self):
+        return self.version != self.grid.version
+
+    def word(self, cell):
+        # (key, bit) of a cell index
+        r, c = divmod(cell, self.stride)
+        return r * self.words + (c >> 6), c & 63
+
+    def cell(self, key, bit):
+        r, w = divmod(key, self.words)
+        return r * self.stride + (w << 6) + bit
+
+    def is_open(self, cell):
+        key, bit = self.word(cell)
+        return int(self.open_words[key]) >> bit & 1
+
+    def common(self, level_a, level_b):
+        """The lowest cell index in both levels, or None."""
+        (keys_a, bits_a), (keys_b, bits_b) = level_a, level_b
+        if len(keys_a) <= SMALL_LEVEL and len(keys_b) <= SMALL_LEVEL:
+            words_b = dict(zip(keys_b.tolist(), bits_b.tolist()))
+            both = [(key, word & words_b.get(key, 0)) for key, word in zip(keys_a.tolist(), bits_a.tolist())]
+            both = [(key, word) for key, word in both if word]
+            if not both: return None
+            key, bits = min(both)
+            return self.cell(key, (bits & -bits).bit_length() - 1)
+        scratch = self.scratch
+        scratch[keys_b] = bits_b
+        both = scratch[keys_a] & bits_a
+        scratch[keys_b] = 0
+        hits = np.flatnonzero(both)
+        if not len(hits): return None
+        i = hits[np.argmin(keys_a[hits])]
+        bits = int(both[i])
+        return self.cell(int(keys_a[i]), (bits & -bits).bit_length() - 1)
+
+    # --- Searches on cell indices ---
+    def bfs(self, a, b):
+        """
+        Forward BFS from `a`: a shortest path to `b` as cell indices, or None. It
+        expands every level closer than `b`, and counts those cells plus `b`.
+        """
+        if not (self.is_open(a) and self.is_open(b)): return None
+        wave = Wave(self, a)
+        while wave.phase(b) < 0:
+            if not wave.step():
+                self.expanded += wave.expanded
+                return None
+        self.expanded += wave.expanded + 1
+        return wave.path_to(b)
+
+    def route(self, a, b):
+        """
+        Bidirectional BFS: a shortest path from `a` to `b` as cell indices, or None.
+        The waves advance in turn and meet where their current levels AND to
+        non-zero, at a cell wave_a.depth + wave_b.depth moves from the two ends.
+        """
+        if not (self.is_open(a) and self.is_open(b)): return None
+        waves = [Wave(self, a), Wave(self, b)]
+        k = 0
+        try:
+            while True:
+                m = self.common(waves[0].level, waves[1].level)
+                if m is not None: return waves[0].path_to(m) + waves[1].path_to(m)[::-1][1:]
+                if not waves[k].step(): return None
+                k = 1 - k
+        finally:
+            self.expanded += waves[0].expanded + waves[1].expanded
@@ -0,0 +1,60 @@
+"""
+LRU cache of search results, keyed on the grid state.
+
+A key is (algorithm, start, target, params, grid.version). GridEnvironment gets a
+new version on every change to its cells, so entries never go stale: results for
+an old layout simply stop being requested and age out of the LRU.
+"""
+import collections
+
+class PathCache:
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, algorithm, start, target, grid, params=()):
+        return (algorithm, tuple(start), tuple(target), tuple(params), grid.version)
+
+    def fetch(self, key):
+        """Returns (path, nodes_expanded) or None on a miss. `path` is None for "no path"."""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        path, expanded = entry
+        # Stored as a tuple; hand out a fresh list so callers may modify it
+        return (list(path) if path is not None else None), expanded
+
+    def store(self, key, path, expanded=0):
+        self.entries[key] = (tuple(path) if path else None, expanded)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def solve(self, key, search):
+        """Returns (path, nodes_expanded, hit); `search()` -> (path, expanded) runs on a miss."""
+        entry = self.fetch(key)
+        if entry is not None: return entry + (True,)
+        path, expanded = search()
+        self.store(key, path, expanded)
+        return path, expanded, False
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.entries),
+            'capacity': self.capacity,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
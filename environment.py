@@ -1,69 +1,498 @@
+import collections
+import collections.abc
+import itertools
 import random
+import weakref
+from array import array
+
+# --- Cell values stored in the flat grid buffer ---
+FREE = 0
+WALL = 255
+# Values in between are free cells with terrain. Entering a cell costs
+# STEP_COST[value] (value + 1) in the weighted searches, UCS and the A* family;
+# the other searches count steps and treat terrain like FREE.
+GRASS, MUD, WATER = 1, 4, 9
+TERRAINS = (('Plain', FREE), ('Grass', GRASS), ('Mud', MUD), ('Water', WATER))
+STEP_COST = bytes(range(1, WALL + 1)) + bytes(1)
+
+# Grid versions come from one process-wide counter, so (version) alone identifies
+# a grid state even across different GridEnvironment objects.
+_versions = itertools.count(1)
+
+# Bytes per slice when scanning a memory-mapped grid, so it is never copied whole
+SCAN_CHUNK = 1 << 24
+
+class StaticObstacles(collections.abc.MutableSet):
+    """
+    The walls of a GridEnvironment that are not dynamic obstacles, as a set of
+    (r, c). It reads and writes the grid itself: `in` is one buffer lookup,
+    add() / discard() / clear() set or clear walls, and only iterating and len()
+    scan the grid.
+    """
+    def __init__(self, env):
+        self.env = env
+
+    def __contains__(self, cell):
+        env = self.env
+        try:
+            r, c = cell
+        except (TypeError, ValueError):
+            return False
+        return env.in_bounds(r, c) and env.is_wall(r, c) and (r, c) not in env.dynamic_obstacles
+
+    def __iter__(self):
+        env = self.env
+        cells, dynamic = env.cells, env.dynamic_obstacles
+        for i in range(env.stride, len(cells) - env.stride):
+            if cells[i] == WALL:
+                r, c = env.coord(i)
+                if 0 <= c < env.size and (r, c) not in dynamic:
+                    yield (r, c)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def add(self, cell):
+        r, c = cell
+        if not self.env.in_bounds(r, c): raise ValueError(f"{cell} is outside the grid")
+        self.env.set_wall(r, c)
+        self.env.dynamic_obstacles.discard((r, c))
+
+    def discard(self, cell):
+        if cell in self: self.env.set_wall(*cell, False)
+
+    def clear(self):
+        for r, c in list(self):
+            self.env.set_wall(r, c, False)
 
 class GridEnvironment:
-    def __init__(self, size=20):
+    def __init__(self, size=20, cells=None):
         self.size = size
-        self.grid = [[0 for _ in range(size)] for _ in range(size)]
-        # REMOVED: specific logic for dynamic spawn probability essentially ignored by main.py
-        self.obstacle_chance = 0.0 
-        self.static_obstacles = set()
+        # The grid is one flat bytearray (1 byte per cell) instead of a list of lists.
+        # It is padded with a 1-cell WALL border, so the neighbour of cell `i` is always
+        # just `i + offset` and the search loops never need bounds checks.
+        # `cells` may be any writable buffer of that layout, e.g. a memoryview of a
+        # memory-mapped map file (see mapfile.py).
+        self.stride = size + 2
+        if cells is None: cells = self.blank_cells()
+        elif len(cells) != self.stride * self.stride:
+            raise ValueError(f"Expected {self.stride * self.stride} cells for size {size}, got {len(cells)}")
+        self.cells = cells
+        # Seed of the generator that produced the layout (None if it was not generated);
+        # the map may have been edited since
+        self.seed = None
+        # ConnectivityIndex of the free cells, built only when a caller asks for it
+        # (connectivity(), connected()); single-cell edits keep it current
+        self.components = None
+        # Objects told about single-cell edits (see watch())
+        self.watchers = weakref.WeakSet()
+        # Chance per agent step that spawn_dynamic_obstacle() adds a wall (0 = off)
+        self.obstacle_chance = 0.0
         self.dynamic_obstacles = set()
+        self.touch()
+
+    def __getstate__(self):
+        # A memory-mapped grid is pickled (e.g. for race.py) as a plain copy
+        state = self.__dict__.copy()
+        if not isinstance(self.cells, bytearray): state['cells'] = bytearray(self.cells)
+        state['components'] = None  # cheaper to rebuild than to send
+        del state['watchers']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.watchers = weakref.WeakSet()
+
+    def touch(self):
+        # Must be called after every change to self.cells; caches key on it
+        self.version = next(_versions)
+
+    def blank_cells(self):
+        border = bytes([WALL])
+        row = border + bytes(self.size) + border
+        return bytearray(border * self.stride + row * self.size + border * self.stride)
+
+    # --- Cell Index Helpers ---
+    def index(self, r, c):
+        return (r + 1) * self.stride + (c + 1)
+
+    def coord(self, i):
+        r, c = divmod(i, self.stride)
+        return (r - 1, c - 1)
+
+    def open_count(self):
+        # Number of non-wall cells
+        cells = self.cells
+        if isinstance(cells, bytearray): return len(cells) - cells.count(WALL)
+        walls = sum(bytes(cells[i:i + SCAN_CHUNK]).count(WALL) for i in range(0, len(cells), SCAN_CHUNK))
+        return len(cells) - walls
+
+    def in_bounds(self, r, c):
+        return 0 <= r < self.size and 0 <= c < self.size
+
+    def is_wall(self, r, c):
+        return self.cells[self.index(r, c)] == WALL
+
+    def set_wall(self, r, c, wall=True):
+        if self.in_bounds(r, c):
+            self.write_cell(self.index(r, c), WALL if wall else FREE)
+
+    def write_cell(self, i, value):
+        # Single-cell edits update the connectivity index in place; any other
+        # change to self.cells only bumps the version, which makes it rebuild.
+        index = self.components
+        current = index is not None and index.version == self.version
+        was_wall = self.cells[i] == WALL
+        previous = self.version
+        self.cells[i] = value
+        self.touch()
+        if current:
+            if was_wall and value != WALL: index.open_cell(i)
+            elif not was_wall and value == WALL: index.close_cell(i)
+            index.version = self.version
+        for watcher in self.watchers:
+            watcher.cell_written(i, previous)
+
+    def watch(self, watcher):
+        """
+        Calls watcher.cell_written(i, previous_version) after every write_cell(),
+        so caches such as hierarchy.HierarchicalMap can update just the cells
+        edited. The grid only keeps a weak reference to `watcher`.
+        """
+        self.watchers.add(watcher)
+
+    def connectivity(self, offsets):
+        """
+        The ConnectivityIndex of the free cells under `offsets`, built now if it is
+        missing or out of date. Building it floods every free cell, so it is only
+        worth it where many queries follow.
+        """
+        index = self.components
+        if index is None or index.version != self.version or index.offsets != offsets:
+            index = self.components = ConnectivityIndex(self, offsets)
+        return index
+
+    def connected(self, a, b, offsets):
+        """True if free cells `a` and `b` are joined by moves from `offsets` (builds the index if needed)."""
+        return self.connectivity(offsets).connected(self.index(*a), self.index(*b))
+
+    def known_connected(self, a, b, offsets):
+        """connected() if the index is current, else None: never pays for a build."""
+        index = self.components
+        if index is None or index.version != self.version or index.offsets != offsets: return None
+        return index.connected(self.index(*a), self.index(*b))
+
+    @property
+    def static_obstacles(self):
+        # A live view of the buffer; storing a set of tuples next to the grid would
+        # cost far more memory than the grid itself on large maps.
+        return StaticObstacles(self)
 
     def add_static_wall(self, start_row, col, length):
         for i in range(length):
             if start_row + i < self.size:
-                r, c = start_row + i, col
-                self.grid[r][c] = -1
-                self.static_obstacles.add((r, c))
+                self.set_wall(start_row + i, col)
+
+    def set_terrain(self, r, c, value):
+        # Any cell value but WALL; a wall painted over becomes free terrain
+        if self.in_bounds(r, c):
+            self.write_cell(self.index(r, c), value)
+
+    def step_cost(self, r, c):
+        return STEP_COST[self.cells[self.index(r, c)]]
+
+    def path_cost(self, path):
+        """Terrain cost of walking `path` (a list of (r, c)): every cell after the first."""
+        return sum(self.step_cost(r, c) for r, c in path[1:])
 
     def toggle_obstacle(self, r, c):
-        if 0 <= r < self.size and 0 <= c < self.size:
-            if self.grid[r][c] == -1:
-                self.grid[r][c] = 0
-                if (r, c) in self.static_obstacles:
-                    self.static_obstacles.remove((r, c))
+        if self.in_bounds(r, c):
+            i = self.index(r, c)
+            if self.cells[i] == WALL:
+                self.write_cell(i, FREE)
+                self.dynamic_obstacles.discard((r, c))
             else:
-                self.grid[r][c] = -1
-                self.static_obstacles.add((r, c))
+                self.write_cell(i, WALL)
 
-    # NOTE: These methods remain but are unused by main.py
-    def spawn_dynamic_obstacle(self, start, target, current_agent_pos):
+    # --- Dynamic Obstacles ---
+    def spawn_dynamic_obstacle(self, start, target, current_agent_pos, candidates=None, rng=random, offsets=None):
+        """
+        With probability `obstacle_chance`, turns one free cell into a dynamic wall and
+        returns it (else None). Half of the attempts pick from `candidates` (e.g. the
+        agent's remaining route), so spawned walls actually get in the way. With the
+        move `offsets`, a wall that would cut the agent off from the target is taken
+        back and another cell is tried (this builds the connectivity index once).
+        """
+        if rng.random() >= self.obstacle_chance: return None
+        protected = {start, target, current_agent_pos}
+        pool = [cell for cell in candidates or () if cell not in protected]
+        for _ in range(16):
+            if pool and rng.random() < 0.5: cell = rng.choice(pool)
+            else: cell = (rng.randrange(self.size), rng.randrange(self.size))
+            if cell not in protected and not self.is_wall(*cell):
+                i = self.index(*cell)
+                value = self.cells[i]
+                self.write_cell(i, WALL)
+                if offsets and not self.connected(current_agent_pos, target, offsets):
+                    self.write_cell(i, value)
+                    continue
+                self.dynamic_obstacles.add(cell)
+                return cell
         return None
 
     def reset_grid(self):
-        self.grid = [[0 for _ in range(self.size)] for _ in range(self.size)]
-        self.static_obstacles.clear()
+        self.cells = self.blank_cells()
         self.dynamic_obstacles.clear()
+        self.seed = None
+        self.touch()
 
     def clean_dynamic(self):
-        for r, c in self.dynamic_obstacles:
-            if (r, c) not in self.static_obstacles:
-                self.grid[r][c] = 0
+        # Returns the cells that were cleared
+        cleared = list(self.dynamic_obstacles)
+        for r, c in cleared:
+            self.set_wall(r, c, False)
         self.dynamic_obstacles.clear()
+        return cleared
 
-    def generate_maze(self):
+    def generate_trap(self, start):
+        # Walls in every neighbour of `start` except Left, to test algorithm limits
         self.reset_grid()
+        sr, sc = start
+        points = [(sr-1, sc+1), (sr, sc+1), (sr+1, sc+1), (sr-1, sc), (sr-1, sc-1), (sr+1, sc), (sr+1, sc-1)]
+        for r, c in points:
+            self.set_wall(r, c)
+
+    def fill(self, value):
+        # Overwrites every cell (the border stays WALL)
+        if value == FREE: self.cells = self.blank_cells()
+        else: self.cells = bytearray([WALL]) * len(self.cells)
+        self.dynamic_obstacles.clear()
+        self.touch()
+
+    def open_cells(self, cells):
+        for r, c in cells:
+            self.set_wall(r, c, False)
+
+    def generate_random(self, density, seed=None, keep_open=()):
+        # One randbytes() call per row, thresholded with a translate() table, so even
+        # very large maps are generated at C speed and are reproducible from the seed.
+        rng = random.Random(seed)
+        threshold = round(density * 256)
+        table = bytes(WALL if b < threshold else FREE for b in range(256))
+        self.fill(FREE)
         for r in range(self.size):
-            for c in range(self.size):
-                self.grid[r][c] = -1
-                self.static_obstacles.add((r, c))
-        def carve(r, c):
-            self.grid[r][c] = 0
-            if (r, c) in self.static_obstacles:
-                self.static_obstacles.remove((r, c))
-            directions = [(0, 2), (0, -2), (2, 0), (-2, 0)]
-            random.shuffle(directions)
-            for dr, dc in directions:
-                nr, nc = r + dr, c + dc
-                if 0 <= nr < self.size and 0 <= nc < self.size and self.grid[nr][nc] == -1:
-                    wr, wc = r + dr // 2, c + dc // 2
-                    self.grid[wr][wc] = 0
-                    if (wr, wc) in self.static_obstacles:
-                        self.static_obstacles.remove((wr, wc))
-                    carve(nr, nc)
-        carve(0, 0)
-        safe_spots = [(0, 0), (self.size-1, self.size-1), (2, 2), (17, 17)]
-        for r, c in safe_spots:
-            if 0 <= r < self.size and 0 <= c < self.size:
-                self.grid[r][c] = 0
-                if (r, c) in self.static_obstacles: self.static_obstacles.remove((r, c))
\ No newline at end of file
+            start = self.index(r, 0)
+            self.cells[start:start + self.size] = rng.randbytes(self.size).translate(table)
+        self.open_cells(keep_open)
+        self.seed = seed
+        self.touch()
+
+    def scatter_terrain(self, density, seed=None):
+        # Gives about `density` of the free cells a random terrain other than
+        # Plain; walls stay walls (WALL is the largest value, so max() keeps them)
+        rng = random.Random(seed)
+        threshold = round(density * 256)
+        kinds = [value for _, value in TERRAINS if value != FREE]
+        table = bytes(kinds[b % len(kinds)] if b < threshold else FREE for b in range(256))
+        for r in range(self.size):
+            start = self.index(r, 0)
+            row = bytes(self.cells[start:start + self.size])
+            self.cells[start:start + self.size] = bytes(map(max, row, rng.randbytes(self.size).translate(table)))
+        self.touch()
+
+    # --- Maze Generation ---
+    # Perfect mazes are carved on the cells with even (r, c); the odd cells between
+    # them are the walls that get knocked out. Both generators are iterative and
+    # linear in the number of cells, and the same seed always gives the same maze.
+    MAZE_ALGORITHMS = ('backtracker', 'eller')
+
+    def generate_maze(self, seed=None, algorithm='backtracker', keep_open=None):
+        rng = random.Random(seed)
+        self.fill(WALL)
+        if algorithm == 'backtracker': self.carve_backtracker(rng)
+        elif algorithm == 'eller': self.carve_eller(rng)
+        else: raise ValueError(f"Unknown maze algorithm: {algorithm}")
+        # Any cell opened here joins the maze: it is always one of the 6 moves
+        # away from a carved (even, even) cell.
+        if keep_open is None: keep_open = [(0, 0), (self.size-1, self.size-1)]
+        self.open_cells(keep_open)
+        self.seed = seed
+        self.touch()
+
+    def carve_backtracker(self, rng):
+        # Recursive backtracker with an explicit stack (no recursion limit)
+        cells, stride, size = self.cells, self.stride, self.size
+        rand = rng.random
+        first = self.index(0, 0)
+        cells[first] = FREE
+        stack = [first]
+        while stack:
+            i = stack[-1]
+            r, c = divmod(i, stride)  # padded coordinates: real row/col are r-1, c-1
+            options = []
+            if r > 2 and cells[i - 2 * stride] == WALL: options.append(-stride)
+            if r < size - 1 and cells[i + 2 * stride] == WALL: options.append(stride)
+            if c > 2 and cells[i - 2] == WALL: options.append(-1)
+            if c < size - 1 and cells[i + 2] == WALL: options.append(1)
+            if not options:
+                stack.pop()
+                continue
+            step = options[int(rand() * len(options))]
+            cells[i + step] = FREE
+            cells[i + 2 * step] = FREE
+            stack.append(i + 2 * step)
+
+    def carve_eller(self, rng):
+        # Eller's algorithm: streams the maze one row at a time, only keeping the
+        # set label of each column of the current row in memory.
+        cells, stride = self.cells, self.stride
+        rand = rng.random
+        rows = cols = (self.size + 1) // 2
+        labels = list(range(cols))
+        next_label = cols
+        for mr in range(rows):
+            base = self.index(2 * mr, 0)
+            last = mr == rows - 1
+            cells[base:base + 2 * cols - 1:2] = bytes(cols)
+
+            # 1. Randomly join neighbouring cells from different sets (all of them on the last row)
+            parent = {}
+            def find(x):
+                root = x
+                while root in parent: root = parent[root]
+                while x != root: parent[x], x = root, parent[x]
+                return root
+            for mc in range(cols - 1):
+                a, b = labels[mc], labels[mc + 1]
+                if a in parent: a = find(a)
+                if b in parent: b = find(b)
+                if a != b and (last or rand() < 0.5):
+                    parent[b] = a
+                    cells[base + 2 * mc + 1] = FREE
+            if last: break
+            labels = [find(x) if x in parent else x for x in labels]
+
+            # 2. Every set continues downwards through at least one passage
+            members = {}
+            for mc, label in enumerate(labels):
+                members.setdefault(label, []).append(mc)
+            down = [False] * cols
+            for group in members.values():
+                chosen = [mc for mc in group if rand() < 0.5] or [group[int(rand() * len(group))]]
+                for mc in chosen:
+                    down[mc] = True
+                    cells[base + 2 * mc + stride] = FREE
+
+            # 3. Cells without a passage from above start new sets in the next row
+            for mc in range(cols):
+                if not down[mc]:
+                    labels[mc] = next_label
+                    next_label += 1
+
+class ConnectivityIndex:
+    """
+    Connected components of the free cells of a grid, for O(1) "is there any path"
+    tests. Every move has its opposite in this project's move set, so reachability
+    is symmetric and components are plain connected components.
+
+    Each free cell holds a component id; ids are merged with union-find, so opening
+    a cell only joins the ids around it. Walling a cell cannot split anything if its
+    free neighbours are adjacent to one another; otherwise one flood fill per group
+    of neighbours runs in lockstep until all but one group have met or run out, and
+    each group that ran out is a split-off component with a new id. The work is
+    bounded by the size of the parts that split off, not by the whole component.
+    """
+    def __init__(self, grid, offsets):
+        self.grid = grid
+        self.offsets = offsets
+        self.version = grid.version
+        self.parent = []
+        self.label = self.build()
+
+    def build(self):
+        cells, offsets = self.grid.cells, self.offsets
+        label = array('i', [-1]) * len(cells)
+        for i in range(len(cells)):
+            if label[i] >= 0 or cells[i] == WALL: continue
+            new = self.new_id()
+            label[i] = new
+            queue = collections.deque([i])
+            while queue:
+                current = queue.popleft()
+                for off in offsets:
+                    nb = current + off
+                    if label[nb] < 0 and cells[nb] != WALL:
+                        label[nb] = new
+                        queue.append(nb)
+        return label
+
+    def new_id(self):
+        self.parent.append(len(self.parent))
+        return len(self.parent) - 1
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def connected(self, a, b):
+        la, lb = self.label[a], self.label[b]
+        return la >= 0 and lb >= 0 and self.find(la) == self.find(lb)
+
+    def open_cell(self, i):
+        label = self.label
+        root = label[i] = self.new_id()
+        for off in self.offsets:
+            other = label[i + off]
+            if other >= 0:
+                other = self.find(other)
+                if other != root: self.parent[other] = root
+
+    def close_cell(self, i):
+        label, offsets = self.label, self.offsets
+        label[i] = -1
+        # Free neighbours, grouped by being adjacent to each other
+        groups = []
+        for off in offsets:
+            nb = i + off
+            if label[nb] < 0: continue
+            touching = [g for g in groups if any(nb - other in offsets for other in g)]
+            merged = [nb]
+            for g in touching:
+                merged.extend(g)
+                groups.remove(g)
+            groups.append(merged)
+        if len(groups) < 2: return
+
+        # Lockstep flood fills; `joined` tracks which groups have met
+        joined = list(range(len(groups)))
+        def root(g):
+            while joined[g] != g: g = joined[g]
+            return g
+        owner = {cell: g for g, group in enumerate(groups) for cell in group}
+        queues = [collections.deque(group) for group in groups]
+        active = set(range(len(groups)))
+        while len({root(g) for g in active}) > 1:
+            for g in list(active):
+                queue = queues[g]
+                if not queue:
+                    active.discard(g)
+                    r = root(g)
+                    if any(root(h) == r for h in active): continue
+                    # Every fill of this part ran out: it is now a component of its own
+                    new = self.new_id()
+                    for cell, h in owner.items():
+                        if root(h) == r: label[cell] = new
+                    continue
+                current = queue.popleft()
+                for off in offsets:
+                    nb = current + off
+                    if label[nb] < 0: continue
+                    h = owner.get(nb)
+                    if h is None:
+                        owner[nb] = g
+                        queue.append(nb)
+                    elif root(h) != root(g):
+                        joined[root(h)] = root(g)
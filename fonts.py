@@ -0,0 +1,104 @@
+"""
+Fonts and rendered text for the UI.
+
+pygame.font.SysFont() lists every installed font the first time it is called
+(on Linux it runs fc-list, which can take a large part of a second) only to map
+a family name to a font file. FontLoader asks SysFont once per (family, bold,
+italic), keeps the file it chose and the styles it had to fake in
+FONT_CACHE_FILE, and on later starts opens that file directly. Fonts are opened
+the first time they are used, so a font that is never drawn costs nothing.
+
+render_text() keeps the surfaces rendered for (font, text, color) in an LRU,
+so a label that did not change since the last frame is blitted again instead
+of being rendered again.
+"""
+import collections
+import json
+import os
+import pygame
+
+FONT_CACHE_FILE = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache')),
+                               'pathfinder-visualizer', 'fonts.json')
+TEXT_CACHE_SIZE = 512  # rendered text surfaces kept
+
+class FontLoader:
+    """
+    Named fonts, opened on first use: loader['stats'] is the font `specs` gives
+    as (family, size, bold) for 'stats'. load() opens any other font.
+    """
+    def __init__(self, specs=None, cache_file=FONT_CACHE_FILE):
+        self.specs = dict(specs or {})
+        self.cache_file = cache_file
+        self.resolved = None  # "family|bold|italic" -> [font file or None, fake bold, fake italic]
+        self.fonts = {}
+
+    def __getitem__(self, name):
+        return self.load(*self.specs[name])
+
+    def load(self, family, size, bold=False, italic=False):
+        key = (family, size, bold, italic)
+        font = self.fonts.get(key)
+        if font is None:
+            path, fake_bold, fake_italic = self.resolve(family, bold, italic)
+            font = self.fonts[key] = pygame.font.Font(path, size)
+            if fake_bold: font.set_bold(True)
+            if fake_italic: font.set_italic(True)
+        return font
+
+    def resolve(self, family, bold=False, italic=False):
+        """(font file, fake bold, fake italic) SysFont picks for the family; None is pygame's default font."""
+        if self.resolved is None: self.resolved = self.read()
+        name = f"{family}|{int(bold)}|{int(italic)}"
+        entry = self.resolved.get(name)
+        # A cached file that was uninstalled since is looked up again
+        if entry and (entry[0] is None or os.path.exists(entry[0])): return entry
+        found = []
+        pygame.font.SysFont(family, 1, bold, italic, constructor=lambda path, size, b, i: found.append([path, b, i]))
+        entry = self.resolved[name] = found[0]
+        self.write()
+        return entry
+
+    def read(self):
+        try:
+            with open(self.cache_file) as f:
+                resolved = json.load(f)
+            return resolved if isinstance(resolved, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def write(self):
+        # The cache only saves time, so a cache file that cannot be written is skipped
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            temp = f"{self.cache_file}.{os.getpid()}.tmp"
+            with open(temp, 'w') as f:
+                json.dump(self.resolved, f, indent=2, sort_keys=True)
+            os.replace(temp, self.cache_file)
+        except OSError:
+            pass
+
+class TextCache:
+    """LRU of rendered text, keyed on (font, text, color)."""
+    def __init__(self, capacity=TEXT_CACHE_SIZE):
+        self.capacity = capacity
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color):
+        key = (font, text, tuple(color))
+        surface = self.entries.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return surface
+        self.misses += 1
+        surface = self.entries[key] = font.render(text, True, color)
+        if len(self.entries) > self.capacity: self.entries.popitem(last=False)
+        return surface
+
+text_cache = TextCache()
+
+def render_text(font, text, color):
+    """font.render(text, True, color), rendered once while it stays in the shared TextCache; do not draw on it."""
+    return text_cache.render(font, text, color)
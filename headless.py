@@ -0,0 +1,422 @@
+"""
+Headless batch solver / benchmark runner.
+
+Runs any subset of the search algorithms over many start/target pairs without
+opening a pygame window, and reports wall time, nodes expanded and path length.
+
+    python headless.py --map maze --size 101 --pairs 50 --algos bfs,ucs,bidirectional
+    python headless.py --map random --density 0.3 --format json > results.json
+    python headless.py --map maze --size 201 --algos astar,ucs --memory --profile
+    python headless.py --map maze --size 5001 --save-map maze.pfm --pairs 0
+    python headless.py --map-file maze.pfm --algos bfs-bits,astar
+    python headless.py --map random --size 200 --density 0.2 --agents 1000 --goals 10
+    python headless.py --map random --size 2000 --density 0.2 --pairs 5 --algos hpa,astar
+    python headless.py --map random --size 300 --terrain 0.5 --algos ucs,astar --verbose
+    python headless.py --map maze --size 41 --pairs 1 --algos astar --trace traces
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import mapfile
+from environment import GridEnvironment
+from ALGORITHM import SearchAlgorithms
+from cache import PathCache
+from instrument import measure
+from recording import Recording, save_trace
+from hierarchy import CLUSTER_SIZE
+from replanner import DStarLite
+from agents import MultiAgentPlanner, collisions
+
+MAP_TYPES = ['empty', 'maze', 'trap', 'random']
+
+# Options that change an algorithm's result, used in the path cache key
+PARAMS = {
+    'dls': lambda opts: (opts.dls_limit,),
+    'iddfs': lambda opts: (opts.iddfs_depth,),
+    'wastar': lambda opts: (opts.weight,),
+    'anytime': lambda opts: (opts.time_limit,),
+    'hpa': lambda opts: (opts.cluster_size,),
+}
+
+# name -> function(algo, start, target, env, options, callback)
+ALGORITHMS = {
+    'bfs': lambda a, s, t, env, opts, cb: a.bfs(s, t, env, cb),
+    'dfs': lambda a, s, t, env, opts, cb: a.dfs(s, t, env, cb),
+    'ucs': lambda a, s, t, env, opts, cb: a.ucs(s, t, env, cb),
+    'dls': lambda a, s, t, env, opts, cb: a.dls(s, t, env, opts.dls_limit, cb),
+    'iddfs': lambda a, s, t, env, opts, cb: a.iddfs(s, t, env, opts.iddfs_depth, cb),
+    'bidirectional': lambda a, s, t, env, opts, cb: a.bidirectional_search(s, t, env, cb),
+    'bfs-bits': lambda a, s, t, env, opts, cb: a.bfs_bitboard(s, t, env, cb),
+    'bidirectional-bits': lambda a, s, t, env, opts, cb: a.bidirectional_bitboard(s, t, env, cb),
+    'astar': lambda a, s, t, env, opts, cb: a.astar(s, t, env, cb),
+    'wastar': lambda a, s, t, env, opts, cb: a.weighted_astar(s, t, env, opts.weight, cb),
+    'anytime': lambda a, s, t, env, opts, cb: a.anytime_astar(s, t, env, callback=cb, time_limit=opts.time_limit),
+    'hpa': lambda a, s, t, env, opts, cb: a.hpa_star(s, t, env, opts.cluster_size, cb),
+}
+
+def build_map(kind, size, seed=None, density=0.3, start=(0, 0), maze='backtracker'):
+    env = GridEnvironment(size)
+    if kind == 'maze':
+        env.generate_maze(seed, maze)
+    elif kind == 'trap':
+        env.generate_trap(start)
+    elif kind == 'random':
+        env.generate_random(density, seed)
+    elif kind != 'empty':
+        raise ValueError(f"Unknown map type: {kind}")
+    return env
+
+def free_cells(env):
+    return [(r, c) for r in range(env.size) for c in range(env.size) if not env.is_wall(r, c)]
+
+def make_pairs(env, count, seed=None, start=None, target=None):
+    rng = random.Random(seed)
+    # Random cells are tried first, so huge maps are never listed cell by cell;
+    # only a map that is mostly walls falls back to choosing from its free cells.
+    cells = None
+    def pick():
+        nonlocal cells
+        if cells is None:
+            for _ in range(64):
+                cell = (rng.randrange(env.size), rng.randrange(env.size))
+                if not env.is_wall(*cell): return cell
+            cells = free_cells(env)
+        return rng.choice(cells)
+    if env.open_count() < 2: return []
+    pairs = []
+    for _ in range(count):
+        s = start or pick()
+        t = target or pick()
+        while t == s and not target:
+            t = pick()
+        pairs.append((s, t))
+    return pairs
+
+def run_batch(env, pairs, algo_names, opts, cache=None):
+    algo = SearchAlgorithms(env.size)
+    # Built once for the batch, so every search rejects an unreachable target without expanding anything
+    env.connectivity(algo.offsets)
+    # --stats, --memory and --profile run every search through instrument.measure()
+    instrumented = opts.stats or opts.memory or opts.profile
+    runs = []
+    for name in algo_names:
+        solve = ALGORITHMS[name]
+        params = PARAMS.get(name, lambda opts: ())(opts)
+        for i, (s, t) in enumerate(pairs):
+            stats = None
+            # --trace records the events of every search that actually runs
+            recorder = Recording(env, s, t, name) if opts.trace else None
+            callback = recorder.record if recorder else None
+            def search():
+                nonlocal stats
+                if not instrumented: return solve(algo, s, t, env, opts, callback), algo.nodes_expanded
+                path, stats = measure(name, lambda cb: solve(algo, s, t, env, opts, cb), algo, callback,
+                                      memory=opts.memory, profile=opts.profile)
+                return path, stats.expanded
+            t0 = time.perf_counter()
+            if cache is not None:
+                path, expanded, hit = cache.solve(cache.key(name, s, t, env, params), search)
+            else:
+                (path, expanded), hit = search(), False
+            elapsed = time.perf_counter() - t0
+            runs.append({
+                'algorithm': name,
+                'pair': i,
+                'start': list(s),
+                'target': list(t),
+                'time_ms': round(elapsed * 1000, 3),
+                'expanded': expanded,
+                'path_len': len(path) if path else 0,
+                'cost': env.path_cost(path) if path else 0,
+                'found': bool(path),
+                'cached': hit,
+            })
+            if instrumented: runs[-1]['stats'] = stats.as_dict() if stats else None
+            if recorder and not hit:
+                recorder.route(path)
+                save_trace(recorder, os.path.join(opts.trace, f"{name}-{i}.pftr"))
+    return runs
+
+def simulate_dynamic(env, pairs, rate, seed=None):
+    """
+    Walks an agent along each pair's route while `rate` obstacles spawn per step.
+    The route is repaired incrementally with D* Lite and, for comparison, planned
+    again from scratch with A* after every change. Obstacles never cut the agent
+    off from its target, so every walk that starts with a route reaches it.
+    """
+    rng = random.Random(seed)
+    algo = SearchAlgorithms(env.size)
+    saved_chance, env.obstacle_chance = env.obstacle_chance, 1.0
+    results = []
+    for i, (s, t) in enumerate(pairs):
+        t0 = time.perf_counter()
+        planner = DStarLite(env, s, t, algo.directions)
+        path = planner.plan()
+        dstar_time = time.perf_counter() - t0
+        astar_time, astar_expanded = 0.0, 0
+        pos, steps, spawned = s, 0, 0
+        while path and pos != t:
+            pos = path[1]
+            planner.move_to(pos)
+            steps += 1
+            changed = []
+            for _ in range(rate):
+                cell = env.spawn_dynamic_obstacle(s, t, pos, path[2:], rng, algo.offsets)
+                if cell: changed.append(cell)
+            spawned += len(changed)
+
+            t0 = time.perf_counter()
+            planner.update_cells(changed)
+            path = planner.plan()
+            dstar_time += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            algo.astar(pos, t, env)
+            astar_time += time.perf_counter() - t0
+            astar_expanded += algo.nodes_expanded
+        results.append({
+            'pair': i,
+            'start': list(s),
+            'target': list(t),
+            'steps': steps,
+            'spawned': spawned,
+            'reached': pos == t,
+            'dstar_ms': round(dstar_time * 1000, 3),
+            'dstar_expanded': planner.nodes_expanded,
+            'astar_ms': round(astar_time * 1000, 3),
+            'astar_expanded': astar_expanded,
+        })
+        env.clean_dynamic()
+    env.obstacle_chance = saved_chance
+    return results
+
+def simulate_agents(env, count, goals, seed=None):
+    """
+    Plans `count` agents from distinct random cells to `goals` random targets in
+    one shared space-time reservation table. Agents park on their target when
+    every agent has its own, and leave the map there when targets are shared.
+    """
+    rng = random.Random(seed)
+    needed = count + goals
+    free = env.open_count()
+    if goals < 1 or free < needed: return None
+    if 2 * needed > free: cells = rng.sample(free_cells(env), needed)
+    else:
+        # Random draws, so huge maps are never listed cell by cell
+        cells = {}
+        while len(cells) < needed:
+            cell = (rng.randrange(env.size), rng.randrange(env.size))
+            if not env.is_wall(*cell): cells[cell] = None
+        cells = list(cells)
+    starts, targets = cells[:count], cells[count:]
+    tasks = [(s, targets[i % len(targets)]) for i, s in enumerate(starts)]
+    park = len(targets) >= len(starts)
+    planner = MultiAgentPlanner(env, park=park)
+    routes = planner.plan_all(tasks)
+    found = [route for route in routes if route]
+    return {
+        'agents': len(tasks),
+        'goals': len(targets),
+        'park': park,
+        'planned': planner.planned,
+        'failed': planner.failed,
+        'fields_built': planner.fields_built,
+        'expanded': planner.nodes_expanded,
+        'plan_ms': round(planner.elapsed * 1000, 3),
+        'plans_per_sec': round(planner.plans_per_second, 1),
+        'makespan': max((len(route) - 1 for route in found), default=0),
+        'sum_of_costs': sum(len(route) - 1 for route in found),
+        'collisions': collisions([[env.index(*cell) for cell in route] for route in found], park),
+    }
+
+def print_dynamic_table(results, out=sys.stdout):
+    print(f"{'PAIR':>5}{'STEPS':>7}{'SPAWNED':>9}{'REACHED':>9}{'D*LITE(ms)':>12}{'D*EXP':>9}{'A*(ms)':>10}{'A*EXP':>9}", file=out)
+    for r in results:
+        print(f"{r['pair']:>5}{r['steps']:>7}{r['spawned']:>9}{str(r['reached']):>9}{r['dstar_ms']:>12.3f}"
+              f"{r['dstar_expanded']:>9}{r['astar_ms']:>10.3f}{r['astar_expanded']:>9}", file=out)
+
+def summarize(runs, algo_names):
+    summary = {}
+    for name in algo_names:
+        rows = [r for r in runs if r['algorithm'] == name]
+        if not rows: continue
+        total = sum(r['time_ms'] for r in rows)
+        summary[name] = {
+            'runs': len(rows),
+            'cached': sum(r['cached'] for r in rows),
+            'found': sum(r['found'] for r in rows),
+            'total_ms': round(total, 3),
+            'mean_ms': round(total / len(rows), 3),
+            'mean_expanded': round(sum(r['expanded'] for r in rows) / len(rows), 1),
+            'expansions_per_sec': round(sum(r['expanded'] for r in rows) / (total / 1000), 1) if total else 0.0,
+        }
+    return summary
+
+def print_table(runs, summary, out=sys.stdout, verbose=False):
+    if verbose:
+        print(f"{'ALGORITHM':<20}{'PAIR':>5}  {'START':<12}{'TARGET':<12}{'TIME(ms)':>10}{'EXPANDED':>10}{'LENGTH':>8}{'COST':>8}", file=out)
+        for r in runs:
+            print(f"{r['algorithm']:<20}{r['pair']:>5}  {str(tuple(r['start'])):<12}{str(tuple(r['target'])):<12}"
+                  f"{r['time_ms']:>10.3f}{r['expanded']:>10}{r['path_len']:>8}{r['cost']:>8}", file=out)
+        print(file=out)
+    print(f"{'ALGORITHM':<20}{'RUNS':>6}{'FOUND':>7}{'TOTAL(ms)':>12}{'MEAN(ms)':>10}{'EXPANDED':>11}{'EXP/SEC':>12}", file=out)
+    for name, s in summary.items():
+        print(f"{name:<20}{s['runs']:>6}{s['found']:>7}{s['total_ms']:>12.3f}{s['mean_ms']:>10.3f}"
+              f"{s['mean_expanded']:>11.1f}{s['expansions_per_sec']:>12.0f}", file=out)
+
+def print_stats_table(runs, algo_names, out=sys.stdout):
+    # Means over the measured (not cached) runs of each algorithm
+    print(f"{'ALGORITHM':<20}{'PUSHES':>10}{'STALE':>8}{'PEAK Q':>9}{'SEARCH(ms)':>12}{'CB(ms)':>9}{'PEAK(KB)':>10}", file=out)
+    for name in algo_names:
+        rows = [r['stats'] for r in runs if r['algorithm'] == name and r.get('stats')]
+        if not rows: continue
+        def mean(key): return sum(row[key] for row in rows) / len(rows)
+        # Frontier counts are None for searches that do not report them (see SearchStats)
+        def counted(key, width):
+            if any(row[key] is None for row in rows): return f"{'n/a':>{width}}"
+            return f"{mean(key):>{width}.1f}"
+        peak = f"{mean('peak_bytes') / 1024:.1f}" if rows[0]['peak_bytes'] is not None else '-'
+        print(f"{name:<20}{counted('pushes', 10)}{counted('stale_pops', 8)}{counted('peak_frontier', 9)}"
+              f"{mean('search_ms'):>12.3f}{mean('callback_ms'):>9.3f}{peak:>10}", file=out)
+
+def print_profile(runs, algo_names, out=sys.stdout, limit=10):
+    # Profiles of all runs of an algorithm, added up per function
+    for name in algo_names:
+        totals = {}
+        for r in runs:
+            if r['algorithm'] != name or not r.get('stats') or not r['stats']['profile']: continue
+            for row in r['stats']['profile']:
+                total = totals.setdefault(row['function'], [0, 0.0, 0.0])
+                total[0] += row['calls']
+                total[1] += row['self_ms']
+                total[2] += row['cumulative_ms']
+        if not totals: continue
+        print(f"\nProfile: {name}", file=out)
+        print(f"{'CALLS':>10}{'SELF(ms)':>12}{'CUM(ms)':>12}  FUNCTION", file=out)
+        for func, (calls, self_ms, cum_ms) in sorted(totals.items(), key=lambda item: -item[1][2])[:limit]:
+            print(f"{calls:>10}{self_ms:>12.3f}{cum_ms:>12.3f}  {func}", file=out)
+
+def parse_point(text):
+    r, c = text.split(',')
+    return (int(r), int(c))
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Run the search algorithms without a display.")
+    p.add_argument('--map', choices=MAP_TYPES, default='empty', help="map generator to use")
+    p.add_argument('--map-file', help="load the map (and its start/target, if stored) from a file written by "
+                   "--save-map or a text map instead of generating one")
+    p.add_argument('--save-map', metavar='PATH', help="write the map to PATH before running")
+    p.add_argument('--map-encoding', choices=mapfile.ENCODINGS + ('text',), default='bits',
+                   help="encoding for --save-map (raw maps are memory-mapped when loaded)")
+    p.add_argument('--size', type=int, default=20, help="grid side length")
+    p.add_argument('--density', type=float, default=0.3, help="wall density for --map random")
+    p.add_argument('--maze', choices=GridEnvironment.MAZE_ALGORITHMS, default='backtracker', help="generator for --map maze")
+    p.add_argument('--terrain', type=float, default=0.0, metavar='DENSITY',
+                   help="give this fraction of the free cells random terrain (grass, mud, water), which costs more "
+                        "to cross in ucs and the A* searches")
+    p.add_argument('--seed', type=int, default=0, help="seed for the map and the start/target pairs")
+    p.add_argument('--pairs', type=int, default=10, help="number of start/target pairs")
+    p.add_argument('--start', type=parse_point, help="fixed start as r,c")
+    p.add_argument('--target', type=parse_point, help="fixed target as r,c")
+    p.add_argument('--algos', default=','.join(ALGORITHMS), help="comma separated subset of: " + ', '.join(ALGORITHMS))
+    p.add_argument('--dls-limit', type=int, default=20, help="depth limit for dls")
+    p.add_argument('--iddfs-depth', type=int, help="maximum depth for iddfs (default: derived from the grid)")
+    p.add_argument('--weight', type=float, default=2.0, help="heuristic weight for wastar")
+    p.add_argument('--time-limit', type=float, help="seconds before anytime stops improving its path")
+    p.add_argument('--cluster-size', type=int, default=CLUSTER_SIZE, help="cluster side length for hpa")
+    p.add_argument('--repeat', type=int, default=1, help="run the whole batch this many times")
+    p.add_argument('--cache', type=int, default=0, metavar='N', help="cache up to N results keyed on the grid version (0 = off)")
+    p.add_argument('--dynamic', type=int, metavar='RATE', help="instead of the batch, walk each route while RATE obstacles "
+                   "spawn per step, comparing D* Lite repairs with A* replanning")
+    p.add_argument('--stats', action='store_true', help="count pushes, stale pops and the peak frontier of every run "
+                   "(the searches then take their event path)")
+    p.add_argument('--memory', action='store_true', help="also record the tracemalloc peak of every run (slows the searches)")
+    p.add_argument('--profile', action='store_true', help="also run every search under cProfile and report the top functions")
+    p.add_argument('--agents', type=int, metavar='N', help="instead of the batch, plan N agents at once with a "
+                   "shared reservation table and report plans per second")
+    p.add_argument('--goals', type=int, help="number of distinct targets for --agents (default: one per agent)")
+    p.add_argument('--trace', metavar='DIR', help="record every search to DIR/<algorithm>-<pair>.pftr for replay "
+                   "in the UI (F10) or frames.py (slows the searches like --stats)")
+    p.add_argument('--format', choices=['table', 'json'], default='table')
+    p.add_argument('--verbose', action='store_true', help="print one table row per run")
+    opts = p.parse_args(argv)
+    opts.algos = [a.strip() for a in opts.algos.split(',') if a.strip()]
+    for name in opts.algos:
+        if name not in ALGORITHMS:
+            p.error(f"unknown algorithm '{name}'")
+    return opts
+
+def main(argv=None):
+    opts = parse_args(argv)
+    if opts.map_file:
+        env, info = mapfile.open_map(opts.map_file)
+        opts.map, opts.size = 'file', env.size
+        opts.start = opts.start or info['start']
+        opts.target = opts.target or info['target']
+    else:
+        # The trap layout is built around the start node, so it needs a fixed start.
+        if opts.map == 'trap' and not opts.start:
+            opts.start = (min(2, opts.size - 1),) * 2
+        env = build_map(opts.map, opts.size, opts.seed, opts.density, opts.start, opts.maze)
+    if opts.terrain: env.scatter_terrain(opts.terrain, opts.seed)
+    if opts.save_map:
+        if opts.map_encoding == 'text': mapfile.save_text(env, opts.save_map, opts.start, opts.target)
+        else: mapfile.save_map(env, opts.save_map, opts.map_encoding, opts.start, opts.target)
+    pairs = make_pairs(env, opts.pairs, opts.seed, opts.start, opts.target)
+    if opts.trace: os.makedirs(opts.trace, exist_ok=True)
+    if opts.dynamic is not None:
+        results = simulate_dynamic(env, pairs, opts.dynamic, opts.seed)
+        if opts.format == 'json':
+            json.dump({'map': {'type': opts.map, 'size': opts.size, 'seed': opts.seed}, 'rate': opts.dynamic,
+                       'dynamic': results}, sys.stdout, indent=2)
+            print()
+        else:
+            print(f"Map: {opts.map} {opts.size}x{opts.size} (seed {opts.seed}), {opts.dynamic} obstacles per step")
+            print_dynamic_table(results)
+        return 0
+    if opts.agents is not None:
+        result = simulate_agents(env, opts.agents, opts.goals or opts.agents, opts.seed)
+        if opts.format == 'json':
+            json.dump({'map': {'type': opts.map, 'size': opts.size, 'seed': opts.seed}, 'agents': result}, sys.stdout, indent=2)
+            print()
+        elif result is None:
+            print("Not enough free cells for the agents")
+        else:
+            print(f"Map: {opts.map} {opts.size}x{opts.size} (seed {opts.seed}), {result['agents']} agents, "
+                  f"{result['goals']} goals ({'agents park' if result['park'] else 'agents leave on arrival'})")
+            print(f"Planned {result['planned']}, failed {result['failed']}, {result['fields_built']} distance fields, "
+                  f"{result['expanded']} expansions")
+            print(f"Planning: {result['plan_ms']:.1f} ms, {result['plans_per_sec']:.0f} agent-plans/sec")
+            print(f"Makespan {result['makespan']}, sum of costs {result['sum_of_costs']}, collisions {result['collisions']}")
+        return 0
+    cache = PathCache(opts.cache) if opts.cache > 0 else None
+    runs = []
+    for _ in range(opts.repeat):
+        runs.extend(run_batch(env, pairs, opts.algos, opts, cache))
+    summary = summarize(runs, opts.algos)
+    if opts.format == 'json':
+        json.dump({
+            'map': {'type': opts.map, 'size': opts.size, 'seed': opts.seed, 'density': opts.density, 'terrain': opts.terrain},
+            'runs': runs,
+            'summary': summary,
+            'cache': cache.stats() if cache else None,
+        }, sys.stdout, indent=2)
+        print()
+    else:
+        print(f"Map: {opts.map} {opts.size}x{opts.size} (seed {opts.seed}), {len(pairs)} pairs")
+        print_table(runs, summary, verbose=opts.verbose)
+        if opts.stats or opts.memory or opts.profile:
+            print()
+            print_stats_table(runs, opts.algos)
+        if opts.profile: print_profile(runs, opts.algos)
+        if cache:
+            stats = cache.stats()
+            print(f"\nCache: {stats['hits']} hits, {stats['misses']} misses, "
+                  f"{stats['evictions']} evictions, hit rate {stats['hit_rate']:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+"""
+Hierarchical pathfinding (HPA*).
+
+The grid is cut into square clusters of CLUSTER_SIZE cells a side. Where a move
+joins a free cell of one cluster to a free cell of the next, the two clusters
+share an entrance; a few of its crossings are picked as transitions, and their
+two cells become nodes of an abstract graph. Nodes of one cluster are joined by
+edges weighted with their distance inside the cluster, and the two cells of a
+transition by an edge of weight 1. Only a handful of nodes stand for a cluster
+of CLUSTER_SIZE**2 cells, so A* on the abstract graph crosses a large map in a
+few thousand expansions however long the route is.
+
+A query joins the start and the target to the nodes of their clusters, searches
+the abstract graph and then refines each abstract edge into cells with a BFS
+that never leaves one cluster. refine() yields the cells segment by segment, so
+an agent can set off before the rest of the route has been expanded.
+
+Clusters are prepared the first time a search reaches them (or all at once by
+build()), and the grid reports single-cell edits (toggle_obstacle, set_wall)
+through GridEnvironment.watch(): the edited cluster is cut out of the grid
+again, and a neighbour is redone only when the transitions on the border they
+share have changed. Any other change to the grid (a new maze, a reset) drops
+everything.
+
+Routes go through transitions, so they are near-shortest rather than shortest.
+"""
+import collections
+import heapq
+from array import array
+from environment import WALL
+
+CLUSTER_SIZE = 16
+# Neighbouring clusters a move can reach: right, down and, through the Bottom-Right
+# diagonal, the one below-right. Moves are symmetric, so these cover every border.
+NEIGHBOURS = ((0, 1), (1, 0), (1, 1))
+
+class Cluster:
+    """One square of the grid copied into its own padded buffer, with its free cells labelled by component."""
+    def __init__(self, grid, key, size, directions):
+        self.key = key
+        self.r0, self.c0 = key[0] * size, key[1] * size
+        self.height = min(size, grid.size - self.r0)
+        self.width = min(size, grid.size - self.c0)
+        self.grid_stride = grid.stride
+        self.stride = stride = self.width + 2
+        self.offsets = tuple(dr * stride + dc for dr, dc in directions)
+        wall = bytes([WALL])
+        cells = bytearray(wall * stride)
+        for r in range(self.r0, self.r0 + self.height):
+            first = grid.index(r, self.c0)
+            cells += wall + bytes(grid.cells[first:first + self.width]) + wall
+        cells += wall * stride
+        self.cells = cells
+        self.label = self.components()
+        # Abstract nodes of the cluster (cell indices of the grid) and, per node,
+        # the (node, distance) pairs it reaches inside the cluster
+        self.nodes = None
+        self.edges = None
+
+    def local(self, i):
+        # Grid cell index -> index in self.cells
+        r, c = divmod(i, self.grid_stride)
+        return (r - self.r0) * self.stride + c - self.c0
+
+    def to_grid(self, j):
+        r, c = divmod(j, self.stride)
+        return (r + self.r0) * self.grid_stride + c + self.c0
+
+    def components(self):
+        cells, offsets = self.cells, self.offsets
+        label = array('i', [-1]) * len(cells)
+        count = 0
+        for i in range(len(cells)):
+            if label[i] >= 0 or cells[i] == WALL: continue
+            label[i] = count
+            stack = [i]
+            while stack:
+                current = stack.pop()
+                for off in offsets:
+                    nb = current + off
+                    if label[nb] < 0 and cells[nb] != WALL:
+                        label[nb] = count
+                        stack.append(nb)
+            count += 1
+        return label
+
+    def distances(self, source, goals):
+        """{goal: distance} for the grid cells in `goals` that `source` reaches inside the cluster."""
+        s = self.local(source)
+        wanted = {self.local(g): g for g in goals if self.label[self.local(g)] == self.label[s]}
+        found = {}
+        if s in wanted: found[wanted.pop(s)] = 0
+        cells, offsets = self.cells, self.offsets
+        dist = [-1] * len(cells)
+        dist[s] = 0
+        frontier, d = [s], 0
+        while frontier and wanted:
+            d += 1
+            layer = []
+            for current in frontier:
+                for off in offsets:
+                    nb = current + off
+                    if dist[nb] >= 0 or cells[nb] == WALL: continue
+                    dist[nb] = d
+                    if nb in wanted: found[wanted.pop(nb)] = d
+                    layer.append(nb)
+            frontier = layer
+        return found
+
+    def path(self, source, goal):
+        """Grid cell indices of a shortest path from `source` to `goal` inside the cluster (None if there is none)."""
+        s, g = self.local(source), self.local(goal)
+        if self.label[s] < 0 or self.label[s] != self.label[g]: return None
+        parent = {s: -1}
+        queue = collections.deque([s])
+        cells, offsets = self.cells, self.offsets
+        while g not in parent:
+            current = queue.popleft()
+            for off in offsets:
+                nb = current + off
+                if nb in parent or cells[nb] == WALL: continue
+                parent[nb] = current
+                queue.append(nb)
+        route = []
+        while g != -1:
+            route.append(self.to_grid(g))
+            g = parent[g]
+        return route[::-1]
+
+class HierarchicalMap:
+    """
+    The abstract graph of `grid` for the move set of `algo` (a SearchAlgorithms).
+    find_path() answers queries; abstract_path() and refine() are its two halves.
+    """
+    def __init__(self, grid, algo, cluster_size=CLUSTER_SIZE):
+        self.grid = grid
+        self.algo = algo
+        self.size = cluster_size
+        self.span = -(-grid.size // cluster_size)  # clusters per side
+        self.nodes_expanded = 0
+        self.clusters_built = 0
+        self.clear()
+        grid.watch(self)
+
+    def clear(self):
+        self.version = self.grid.version
+        self.clusters = {}   # (cluster row, cluster column) -> Cluster
+        self.borders = {}    # (key, neighbour key) -> tuple of transitions (a, b), a in key
+        self.links = collections.defaultdict(set)   # node -> its transition partners
+        self.dirty = set()
+
+    def cell_written(self, i, previous):
+        # GridEnvironment.watch() callback. Edits are only tracked while every
+        # earlier change was seen; after any other change refresh() starts over.
+        if self.version != previous: return
+        self.version = self.grid.version
+        self.dirty.add(self.key_of(i))
+
+    def refresh(self):
+        if self.version != self.grid.version:
+            self.clear()
+            return
+        dirty, self.dirty = self.dirty, set()
+        for key in dirty:
+            self.clusters.pop(key, None)
+        for key in dirty:
+            for border in self.incident(key):
+                old = self.borders.get(border)
+                if old is None: continue
+                new = self.transitions(*border)
+                if new == old: continue
+                self.set_border(border, new)
+                neighbour = self.clusters.get(border[1] if border[0] == key else border[0])
+                if neighbour is not None: neighbour.edges = neighbour.nodes = None
+
+    # --- Clusters and Transitions ---
+    def key_of(self, i):
+        r, c = self.grid.coord(i)
+        return (r // self.size, c // self.size)
+
+    def cluster(self, key):
+        cluster = self.clusters.get(key)
+        if cluster is None:
+            cluster = self.clusters[key] = Cluster(self.grid, key, self.size, self.algo.directions)
+            self.clusters_built += 1
+        return cluster
+
+    def incident(self, key):
+        # Every (cluster, neighbour) border `key` is on, as keyed in self.borders
+        cr, cc = key
+        for dr, dc in NEIGHBOURS:
+            for border in ((key, (cr + dr, cc + dc)), ((cr - dr, cc - dc), key)):
+                r, c = border[1] if border[0] == key else border[0]
+                if 0 <= r < self.span and 0 <= c < self.span: yield border
+
+    def prepared(self, key):
+        """The cluster at `key` with its nodes and intra-cluster edges."""
+        cluster = self.cluster(key)
+        if cluster.edges is None:
+            nodes = set()
+            for border in self.incident(key):
+                if border not in self.borders: self.set_border(border, self.transitions(*border))
+                side = 0 if border[0] == key else 1
+                nodes.update(pair[side] for pair in self.borders[border])
+            cluster.nodes = nodes
+            # Distances are symmetric: each BFS only looks for the nodes after its own
+            edges = cluster.edges = {u: [] for u in nodes}
+            order = list(nodes)
+            for k, u in enumerate(order):
+                for v, d in cluster.distances(u, order[k + 1:]).items():
+                    edges[u].append((v, d))
+                    edges[v].append((u, d))
+        return cluster
+
+    def set_border(self, border, transitions):
+        for a, b in self.borders.get(border, ()):
+            self.links[a].discard(b)
+            self.links[b].discard(a)
+        for a, b in transitions:
+            self.links[a].add(b)
+            self.links[b].add(a)
+        self.borders[border] = transitions
+
+    def crossings(self, key, other):
+        # (position along the border, a, b) for every move from a free cell a of
+        # `key` to a free cell b of `other`, in border order: straight moves at even
+        # positions, diagonal ones at odd positions in between
+        grid, cells, size = self.grid, self.grid.cells, self.size
+        r0, c0 = key[0] * size, key[1] * size
+        r1, c1 = min(r0 + size, grid.size) - 1, min(c0 + size, grid.size) - 1
+        if other == (key[0], key[1] + 1):
+            moves = [(2 * (r - r0), (r, c1), (r, c1 + 1)) for r in range(r0, r1 + 1)]
+            moves += [(2 * (r - r0) + 1, (r, c1), (r + 1, c1 + 1)) for r in range(r0, r1)]
+        elif other == (key[0] + 1, key[1]):
+            moves = [(2 * (c - c0), (r1, c), (r1 + 1, c)) for c in range(c0, c1 + 1)]
+            moves += [(2 * (c - c0) + 1, (r1, c), (r1 + 1, c + 1)) for c in range(c0, c1)]
+        else:
+            moves = [(0, (r1, c1), (r1 + 1, c1 + 1))]
+        found = []
+        for position, a, b in sorted(moves):
+            a, b = grid.index(*a), grid.index(*b)
+            if cells[a] != WALL and cells[b] != WALL: found.append((position, a, b))
+        return found
+
+    def transitions(self, key, other):
+        """
+        The transitions picked on the border of two clusters: the middle crossing
+        of every entrance (a run of adjacent crossings), or both its ends if it
+        is half a cluster long. Of the transitions that join the same two
+        components only those at least half a cluster apart are kept; the others
+        would add nodes without making routes much shorter.
+        """
+        entrances, run = [], []
+        for crossing in self.crossings(key, other):
+            if run and crossing[0] > run[-1][0] + 1:
+                entrances.append(run)
+                run = []
+            run.append(crossing)
+        if run: entrances.append(run)
+        here, there = self.cluster(key), self.cluster(other)
+        last = {}   # (component here, component there) -> position of the last transition kept
+        picked = []
+        for entrance in entrances:
+            # Positions count two per cell, so half a cluster is self.size positions
+            if entrance[-1][0] - entrance[0][0] < self.size: candidates = [entrance[len(entrance) // 2]]
+            else: candidates = [entrance[0], entrance[-1]]
+            for position, a, b in candidates:
+                pair = (here.label[here.local(a)], there.label[there.local(b)])
+                if pair in last and position - last[pair] < self.size: continue
+                last[pair] = position
+                picked.append((a, b))
+        return tuple(picked)
+
+    def build(self):
+        """Prepares every cluster up front, so no query pays for the ones it reaches first."""
+        self.refresh()
+        for r in range(self.span):
+            for c in range(self.span):
+                self.prepared((r, c))
+
+    # --- Queries ---
+    def find_path(self, start, target):
+        """The path from `start` to `target` as a list of (r, c), or None if there is none."""
+        route = self.abstract_path(start, target)
+        if route is None: return None
+        return list(self.refine(route))
+
+    def abstract_path(self, start, target):
+        """
+        The route as a list of cell indices: start, the transition cells it passes
+        through, target. Consecutive cells are either one move apart or in the same
+        cluster. None if there is no path.
+        """
+        self.refresh()
+        self.nodes_expanded = 0
+        grid = self.grid
+        s, t = grid.index(*start), grid.index(*target)
+        if grid.cells[s] == WALL or grid.cells[t] == WALL: return None
+        # A current connectivity index rules out a hopeless query at once; without
+        # one the abstract search finds out by running dry
+        if grid.known_connected(start, target, self.algo.offsets) is False: return None
+        if s == t: return [s]
+        source, goal = self.prepared(self.key_of(s)), self.prepared(self.key_of(t))
+        # Start and target are joined to the nodes of their clusters for this query only
+        if source is goal and goal.distances(s, (t,)): return [s, t]
+        out = list(source.distances(s, source.nodes).items())
+        into = goal.distances(t, goal.nodes)
+        h = self.algo.index_heuristic(grid, t)
+        cost = {s: 0}
+        parent = {s: None}
+        pq = [(h(s), 0, s)]
+        while pq:
+            _, negative_g, u = heapq.heappop(pq)
+            g = -negative_g
+            if g > cost[u]: continue
+            if u == t:
+                route = []
+                while u is not None:
+                    route.append(u)
+                    u = parent[u]
+                return route[::-1]
+            self.nodes_expanded += 1
+            if u == s: edges = out
+            else:
+                edges = self.prepared(self.key_of(u)).edges.get(u, [])
+                if u in into: edges = edges + [(t, into[u])]
+            for v, d in edges + [(v, 1) for v in self.links.get(u, ())]:
+                new = g + d
+                if new < cost.get(v, new + 1):
+                    cost[v] = new
+                    parent[v] = u
+                    # Ties go to the deeper node
+                    heapq.heappush(pq, (new + h(v), -new, v))
+        return None
+
+    def refine(self, route):
+        """
+        Yields the cells (r, c) of an abstract route, expanding one abstract edge
+        at a time against the current grid. Stops early if an edit has cut a
+        segment since the route was found.
+        """
+        grid = self.grid
+        yield grid.coord(route[0])
+        for u, v in zip(route, route[1:]):
+            self.refresh()
+            key = self.key_of(u)
+            if key != self.key_of(v):
+                if grid.cells[v] == WALL: return
+                yield grid.coord(v)
+                continue
+            steps = self.cluster(key).path(u, v)
+            if steps is None: return
+            for i in steps[1:]:
+                yield grid.coord(i)
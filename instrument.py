@@ -0,0 +1,158 @@
+"""
+Search instrumentation.
+
+Every SearchAlgorithms method already reports its work through the callback
+events of ALGORITHM.py, so the instrumentation wraps the callback instead of
+adding counters to the search loops: a Probe counts the events and times the
+callback it wraps, and measure() adds the wall time, the tracemalloc peak and,
+when asked, a cProfile of the run. Searches called without a callback keep
+their fast path; only measured runs pay for the counting.
+"""
+import cProfile
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from ALGORITHM import PUSHED, POPPED, SETTLED
+
+PROFILE_TOP = 15  # functions kept per profiled run, by cumulative time
+
+class Probe:
+    """Search callback that counts the events and times the callback it wraps."""
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.pushes = 0
+        self.pops = 0
+        self.settles = 0
+        self.frontier = 0
+        self.peak_frontier = 0
+        self.callback_time = 0.0
+
+    def __call__(self, event, data):
+        if event == PUSHED:
+            self.pushes += 1
+            self.frontier += 1
+            if self.frontier > self.peak_frontier: self.peak_frontier = self.frontier
+        elif event == POPPED:
+            self.pops += 1
+            self.frontier -= 1
+        elif event == SETTLED:
+            self.settles += 1
+        if self.callback:
+            t0 = time.perf_counter()
+            self.callback(event, data)
+            self.callback_time += time.perf_counter() - t0
+
+class SearchStats:
+    """Measurements of one search run; as_dict() is its JSON export."""
+    def __init__(self, algorithm, path, expanded, probe, elapsed, peak_bytes=None, profile=None):
+        self.algorithm = algorithm
+        self.found = bool(path)
+        self.path_len = len(path) if path else 0
+        self.expanded = expanded
+        # A search that expanded cells without reporting them (the bitboard and
+        # HPA* searches only report FOUND) has no frontier counts: these are None
+        counted = probe.pushes or probe.settles or not expanded
+        self.pushes = probe.pushes if counted else None
+        # Entries popped but not expanded: lazy-deletion duplicates in the priority
+        # queues, or cells an earlier pop already settled
+        self.stale_pops = probe.pops - probe.settles if counted else None
+        # High-water mark of pushes - pops; for searches that restart (IDDFS,
+        # Anytime A*) it also counts what earlier passes left on their frontier
+        self.peak_frontier = probe.peak_frontier if counted else None
+        self.total_ms = elapsed * 1000
+        self.callback_ms = probe.callback_time * 1000
+        self.search_ms = self.total_ms - self.callback_ms
+        self.peak_bytes = peak_bytes
+        self.profile = profile
+
+    def as_dict(self):
+        return {
+            'algorithm': self.algorithm,
+            'found': self.found,
+            'path_len': self.path_len,
+            'expanded': self.expanded,
+            'pushes': self.pushes,
+            'stale_pops': self.stale_pops,
+            'peak_frontier': self.peak_frontier,
+            'search_ms': round(self.search_ms, 3),
+            'callback_ms': round(self.callback_ms, 3),
+            'total_ms': round(self.total_ms, 3),
+            'peak_bytes': self.peak_bytes,
+            'profile': self.profile,
+        }
+
+# tracemalloc is process-wide; it runs while any measured search wants it and is
+# left alone if something else started it
+_memory_lock = threading.Lock()
+_memory_users = 0
+_memory_owned = False
+
+def _start_memory():
+    global _memory_users, _memory_owned
+    with _memory_lock:
+        if _memory_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _memory_owned = True
+        _memory_users += 1
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+
+def _stop_memory(base):
+    global _memory_users, _memory_owned
+    with _memory_lock:
+        peak = max(0, tracemalloc.get_traced_memory()[1] - base)
+        _memory_users -= 1
+        if _memory_users == 0 and _memory_owned:
+            tracemalloc.stop()
+            _memory_owned = False
+        return peak
+
+def traced_peak(func):
+    """Calls func() under tracemalloc; returns (its result, the peak bytes allocated during the call)."""
+    base = _start_memory()
+    try:
+        result = func()
+    finally:
+        peak = _stop_memory(base)
+    return result, peak
+
+def top_functions(profiler, limit=PROFILE_TOP):
+    """The `limit` functions with the most cumulative time, as JSON-ready dicts."""
+    rows = []
+    for (filename, line, func), (_, calls, self_time, total, _) in pstats.Stats(profiler).stats.items():
+        name = func if filename == '~' else f"{os.path.basename(filename)}:{line}({func})"
+        rows.append({
+            'function': name,
+            'calls': calls,
+            'self_ms': round(self_time * 1000, 3),
+            'cumulative_ms': round(total * 1000, 3),
+        })
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:limit]
+
+def measure(name, search, algo, callback=None, memory=True, profile=False):
+    """
+    Runs `search(callback)` with a Probe around `callback` and returns
+    (result, SearchStats). `algo` is the SearchAlgorithms doing the search; its
+    nodes_expanded is read afterwards.
+
+    memory: record the tracemalloc peak. Tracing slows every allocation, so
+        search_ms is only comparable between runs measured the same way.
+    profile: run under cProfile (which covers the calling thread only) and keep
+        the top PROFILE_TOP functions.
+    """
+    probe = Probe(callback)
+    profiler = cProfile.Profile() if profile else None
+    base = _start_memory() if memory else None
+    peak = None
+    t0 = time.perf_counter()
+    try:
+        path = profiler.runcall(search, probe) if profiler else search(probe)
+    finally:
+        elapsed = time.perf_counter() - t0
+        if memory: peak = _stop_memory(base)
+    stats = SearchStats(name, path, algo.nodes_expanded, probe, elapsed, peak,
+                        top_functions(profiler) if profiler else None)
+    return path, stats
@@ -1,16 +1,66 @@
+import argparse
+import json
+import math
+import random
+from operator import itemgetter
 import pygame
-import time
-from environment import GridEnvironment
-from ALGORITHM import SearchAlgorithms
+import mapfile
+import race
+from fonts import FontLoader, render_text
+from agents import MultiAgentPlanner, position
+from environment import GridEnvironment, TERRAINS, STEP_COST, WALL, GRASS, MUD, WATER
+from ALGORITHM import SearchAlgorithms, PUSHED, POPPED, SETTLED, FOUND
+from scheduler import SearchRunner
+from cache import PathCache
+from replanner import DStarLite
+from instrument import measure
+from recording import Recording, Replay, save_trace, load_trace, FRONTIER, EXPLORED, ON_PATH, TRACED
 
 # --- Configuration ---
 WINDOW_TITLE = "Pathfinding Visualizer Pro"
-GRID_SIZE = 20
-CELL_SIZE = 35  
+GRID_SIZE = 20   # map size at startup (python main.py --size N for another)
+CELL_SIZE = 35   # starting zoom in pixels per cell; the view fits GRID_SIZE cells at this zoom
 GRID_PIXEL_SIZE = GRID_SIZE * CELL_SIZE
 PANEL_WIDTH = 350 
 SCREEN_WIDTH = GRID_PIXEL_SIZE + PANEL_WIDTH
 SCREEN_HEIGHT = GRID_PIXEL_SIZE
+FPS = 60
+
+# Animation speeds in expansions per second; the scheduler turns these into a
+# per-frame budget, so drawing cost depends on the frame rate, not the node count.
+SPEEDS = [("Fast", 50), ("Slow", 10), ("Turbo", 2000)]
+PATH_PREVIEW_MS = 500   # pause between showing the planned path and moving
+AGENT_STEP_MS = 150     # time per agent step
+DYNAMIC_CHANCE = 0.35   # chance per agent step of a new obstacle when "Dynamic" is on
+STATS_FILE = "search_stats.json"  # where E exports the stats of this session's runs
+MAP_FILE = "map.pfm"              # F5 saves the map (with start and target) here, F9 loads it
+FLEET_SIZE = 16                   # agents started by the M key, all heading to the Target
+TRACE_FILE = "search.pftr"        # F6 saves the recording of the last run here, F10 replays it
+RACE_MAX_SIZE = 190               # largest map the race tiles can show at one pixel per cell
+
+# Viewport: the grid is drawn from cached CHUNK x CHUNK tiles (see GridRenderer)
+CHUNK = 32
+MAX_ZOOM = 64          # largest cell size in pixels
+ZOOM_STEP = 1.25       # zoom factor per mouse wheel notch or +/- key
+GRID_LINE_ZOOM = 6     # cells at least this many pixels wide get grid lines
+GLYPH_ZOOM = 12        # ... and their "S"/"T" glyphs
+MARKER_SIZE = 5        # cells with a glyph are drawn this large when cells are smaller
+MINIMAP_SIZE = 160     # minimap side in pixels, shown while the map does not fit the view
+MINIMAP_MS = 250       # least time between minimap rebuilds while the map changes
+
+# Fonts of the UI as (family, size, bold); opened on first use through fonts.FontLoader
+FONTS = {
+    'title': ('Segoe UI', 26, True),
+    'header': ('Segoe UI', 16, True),
+    'button': ('Segoe UI', 14, False),
+    'stats': ('Consolas', 13, False),
+    'cell': ('Arial', 18, True),
+}
+
+ALGO_NAMES = [
+    "BFS", "DFS", "UCS", "DLS", "IDDFS",
+    "Bidirectional", "A* Search", "Weighted A*", "Anytime A*"
+]
 
 # --- Modern Color Palette ---
 WHITE = (255, 255, 255)
@@ -26,6 +76,19 @@ ORANGE = (243, 156, 18)
 LIGHT_BLUE = (100, 200, 240) 
 YELLOW = (241, 196, 15)  
 CYAN = (26, 188, 156)    
+PURPLE = (155, 89, 182)
+
+# Terrain (free cells that cost more to cross), drawn under the search colors
+TERRAIN_COLORS = {GRASS: (205, 235, 190), MUD: (215, 190, 160), WATER: (175, 210, 240)}
+# What the B key cycles the editor's brush through
+BRUSHES = (('Wall', WALL),) + TERRAINS
+
+# Minimap pixel of each cell value
+MINIMAP_COLORS = [bytes(DARK_GRAY if v == WALL else TERRAIN_COLORS.get(v, WHITE)) for v in range(256)]
+
+# Heatmap overlay: free cells shade from HEAT_NEAR (next to the target) to HEAT_FAR
+HEAT_NEAR = (250, 215, 160)
+HEAT_FAR = (190, 170, 230)
 
 # UI Panel Colors
 PANEL_BG = (44, 62, 80)  
@@ -42,6 +105,7 @@ class Button:
         self.text = text
         self.action_code = action_code
         self.is_hovered = False
+        self.faces = {}  # (text, font, body color) -> the button drawn on the panel background
 
     def draw(self, screen, font, is_active=False):
         if is_active:
@@ -54,47 +118,554 @@ class Button:
             color = BTN_NORMAL
             border_c = (40, 55, 70)
 
-        # Shadow & Body
-        pygame.draw.rect(screen, (30, 40, 50), (self.rect.x + 2, self.rect.y + 4, self.rect.w, self.rect.h), border_radius=8)
-        pygame.draw.rect(screen, color, self.rect, border_radius=8)
-        pygame.draw.rect(screen, border_c, self.rect, 2, border_radius=8)
-        
-        text_surf = font.render(self.text, True, TEXT_WHITE)
-        text_rect = text_surf.get_rect(center=self.rect.center)
-        screen.blit(text_surf, text_rect)
+        key = (self.text, font, color)
+        face = self.faces.get(key)
+        if face is None:
+            # Shadow & Body, drawn once per label and state
+            face = pygame.Surface((self.rect.w + 2, self.rect.h + 4))
+            face.fill(PANEL_BG)
+            body = face.get_rect(size=self.rect.size)
+            pygame.draw.rect(face, (30, 40, 50), body.move(2, 4), border_radius=8)
+            pygame.draw.rect(face, color, body, border_radius=8)
+            pygame.draw.rect(face, border_c, body, 2, border_radius=8)
+            text_surf = render_text(font, self.text, TEXT_WHITE)
+            face.blit(text_surf, text_surf.get_rect(center=body.center))
+            self.faces[key] = face
+        screen.blit(face, self.rect)
 
     def check_click(self, pos):
         return self.rect.collidepoint(pos)
 
+class Camera:
+    """
+    The part of the grid shown in the `view` rect. `zoom` is the cell size in
+    pixels, below 1 when a large map is zoomed out, and (x, y) is the world pixel
+    at the view's top-left corner, the world being the whole grid drawn at that
+    zoom. Zooms of 1 and above are whole pixels, so cells tile without seams.
+    `version` changes whenever the view moves.
+    """
+    def __init__(self, view, size, zoom=None):
+        self.view = pygame.Rect(view)
+        self.size = size
+        fit = min(self.view.w, self.view.h) / size
+        self.min_zoom = math.floor(fit) if fit >= 1 else fit
+        self.max_zoom = max(MAX_ZOOM, self.min_zoom)
+        self.zoom = self.min_zoom
+        self.x = self.y = 0
+        self.version = 0
+        self.set_zoom(zoom or self.min_zoom)
+
+    @property
+    def world(self):
+        # Side of the whole grid in pixels
+        return math.floor(self.size * self.zoom)
+
+    @property
+    def fits(self):
+        return self.world <= min(self.view.w, self.view.h)
+
+    def set_zoom(self, zoom, anchor=None):
+        """Zooms so that the grid point under view pixel `anchor` (default: the center) stays in place."""
+        zoom = max(self.min_zoom, min(self.max_zoom, zoom))
+        if zoom >= 1: zoom = round(zoom)
+        ax, ay = anchor or self.view.center
+        ax, ay = ax - self.view.x, ay - self.view.y
+        u, v = (self.x + ax) / self.zoom, (self.y + ay) / self.zoom
+        if zoom != self.zoom: self.version += 1
+        self.zoom = zoom
+        self.move_to(u * zoom - ax, v * zoom - ay)
+
+    def zoom_by(self, steps, anchor=None):
+        zoom = self.zoom * ZOOM_STEP ** steps
+        # Whole-pixel zooms change by at least one pixel per step
+        if zoom >= 1 and round(zoom) == self.zoom: zoom = self.zoom + (1 if steps > 0 else -1)
+        self.set_zoom(zoom, anchor)
+
+    def move_to(self, x, y):
+        # Clamped so the grid covers the view, or centered when it is smaller than the view
+        def clamp(p, side):
+            if self.world <= side: return -((side - self.world) // 2)
+            return max(0, min(round(p), self.world - side))
+        x, y = clamp(x, self.view.w), clamp(y, self.view.h)
+        if (x, y) != (self.x, self.y): self.version += 1
+        self.x, self.y = x, y
+
+    def pan(self, dx, dy):
+        self.move_to(self.x + dx, self.y + dy)
+
+    def center_on(self, r, c):
+        self.move_to((c + 0.5) * self.zoom - self.view.w / 2, (r + 0.5) * self.zoom - self.view.h / 2)
+
+    def cell_at(self, pos):
+        """The cell (r, c) under screen pixel `pos`, or None if there is no cell there."""
+        if not self.view.collidepoint(pos): return None
+        r = math.floor((pos[1] - self.view.y + self.y) / self.zoom)
+        c = math.floor((pos[0] - self.view.x + self.x) / self.zoom)
+        return (r, c) if 0 <= r < self.size and 0 <= c < self.size else None
+
+    def edge(self, k):
+        # World pixel where row or column k starts
+        return math.floor(k * self.zoom)
+
+    def to_screen(self, x, y):
+        return self.view.x + x - self.x, self.view.y + y - self.y
+
+    def visible(self):
+        """(first row, first column, end row, end column) of the cells in view."""
+        z = self.zoom
+        r0, c0 = max(0, math.floor(self.y / z)), max(0, math.floor(self.x / z))
+        r1 = min(self.size, math.ceil((self.y + self.view.h) / z))
+        c1 = min(self.size, math.ceil((self.x + self.view.w) / z))
+        return r0, c0, r1, c1
+
+class GridRenderer:
+    """
+    Chunked grid painter behind a Camera. The grid is cut into CHUNK x CHUNK
+    chunks, each with an image of one pixel per cell and the state last painted
+    for each of its cells; the chunks in view also have a tile, that image scaled
+    to the zoom with grid lines and glyphs. Chunks are built the first time they
+    come into view, so a map of millions of cells costs only what was on screen,
+    and a marked cell is repainted only if its chunk exists and its state
+    changed. A camera move redraws the view from the tiles. render() returns the
+    screen rects that need to be pushed with pygame.display.update().
+    """
+    def __init__(self, screen, size, cell_size, glyph_font, view=None):
+        self.screen = screen
+        self.size = size
+        # Starts at `cell_size` pixels per cell; the view defaults to the whole grid at that size
+        self.camera = Camera(view or (0, 0, size * cell_size, size * cell_size), size, cell_size)
+        self.rect = self.camera.view
+
+        # "S"/"T" are rendered once, for cells of `cell_size` pixels, and scaled for other zooms
+        self.glyph_size = cell_size
+        self.glyph_images = {g: render_text(glyph_font, g, WHITE) for g in ("S", "T")}
+        self.glyphs = {}
+        self.chunks = {}        # (chunk row, chunk col) -> (image, painted states)
+        self.tiles = {}         # chunk -> (zoom, tile) for the chunks in view
+        self.glyph_cells = {}   # (r, c) -> painted state of the cells with a glyph
+        self.rgb = {}           # color -> its RGB bytes
+        self.dirty = set()
+        self.full_redraw = True
+        self.drawn = None       # camera version on screen
+
+    def mark(self, cell):
+        self.dirty.add(cell)
+
+    def mark_all(self, cells):
+        self.dirty.update(cells)
+
+    def invalidate(self):
+        self.full_redraw = True
+
+    def bounds(self, key):
+        # First row and column of a chunk, and its height and width (smaller at the grid's edge)
+        r0, c0 = key[0] * CHUNK, key[1] * CHUNK
+        return r0, c0, min(CHUNK, self.size - r0), min(CHUNK, self.size - c0)
+
+    def build(self, key, cell_state):
+        r0, c0, h, w = self.bounds(key)
+        states = [cell_state(r, c) for r in range(r0, r0 + h) for c in range(c0, c0 + w)]
+        # One RGB string for the whole image is ~10x faster than setting its pixels one by one
+        rgb = self.rgb
+        pixels = b''.join([rgb.get(color) or rgb.setdefault(color, bytes(color)) for color, _ in states])
+        for k, state in enumerate(states):
+            if state[1]: self.glyph_cells[(r0 + k // w, c0 + k % w)] = state
+        # Kept in the screen's pixel format, so tiles scaled from it blit without conversion
+        image = pygame.Surface((w, h), 0, self.screen)
+        image.blit(pygame.image.frombytes(pixels, (w, h), 'RGB'), (0, 0))
+        self.chunks[key] = (image, states)
+
+    def glyph(self, glyph):
+        zoom = self.camera.zoom
+        image = self.glyphs.get((glyph, zoom))
+        if image is None:
+            image = self.glyph_images[glyph]
+            if zoom != self.glyph_size:
+                scale = zoom / self.glyph_size
+                image = pygame.transform.smoothscale(image, (max(1, round(image.get_width() * scale)),
+                                                             max(1, round(image.get_height() * scale))))
+            self.glyphs = {k: v for k, v in self.glyphs.items() if k[1] == zoom}
+            self.glyphs[(glyph, zoom)] = image
+        return image
+
+    def cell_in_tile(self, key, r, c):
+        # Rect of cell (r, c) inside the tile of its chunk (whole-pixel zooms)
+        r0, c0, _, _ = self.bounds(key)
+        cam = self.camera
+        return pygame.Rect(cam.edge(c) - cam.edge(c0), cam.edge(r) - cam.edge(r0), cam.zoom, cam.zoom)
+
+    def tile_rect(self, key):
+        # Screen rect of a chunk's tile
+        r0, c0, h, w = self.bounds(key)
+        cam = self.camera
+        x, y = cam.edge(c0), cam.edge(r0)
+        return pygame.Rect(*cam.to_screen(x, y), cam.edge(c0 + w) - x, cam.edge(r0 + h) - y)
+
+    def paint_cell(self, tile, rect, color, glyph):
+        zoom = self.camera.zoom
+        tile.fill(color, rect.inflate(-2, -2) if zoom >= GRID_LINE_ZOOM else rect)
+        if glyph and zoom >= GLYPH_ZOOM:
+            text = self.glyph(glyph)
+            tile.blit(text, text.get_rect(center=rect.center))
+
+    def tile(self, key):
+        zoom = self.camera.zoom
+        entry = self.tiles.get(key)
+        if entry and entry[0] == zoom: return entry[1]
+        image, _ = self.chunks[key]
+        rect = self.tile_rect(key)
+        tile = pygame.transform.scale(image, rect.size)
+        if zoom >= GRID_LINE_ZOOM:
+            # A 2-pixel line between cells, as the cells of the old fixed grid had
+            r0, c0, h, w = self.bounds(key)
+            for k in range(w + 1): tile.fill(GRID_LINES, (max(0, k * zoom - 1), 0, 2 if k else 1, rect.h))
+            for k in range(h + 1): tile.fill(GRID_LINES, (0, max(0, k * zoom - 1), rect.w, 2 if k else 1))
+        if zoom >= GLYPH_ZOOM:
+            for (r, c), (color, glyph) in self.glyph_cells.items():
+                if (r // CHUNK, c // CHUNK) == key: self.paint_cell(tile, self.cell_in_tile(key, r, c), color, glyph)
+        self.tiles[key] = (zoom, tile)
+        return tile
+
+    def marker_rect(self, cell):
+        # Cells too small to see are drawn as a MARKER_SIZE square if they have a glyph
+        cam = self.camera
+        x, y = cam.to_screen(cam.edge(cell[1]) + cam.zoom / 2, cam.edge(cell[0]) + cam.zoom / 2)
+        return pygame.Rect(x - MARKER_SIZE // 2, y - MARKER_SIZE // 2, MARKER_SIZE, MARKER_SIZE)
+
+    def draw_markers(self, area):
+        if self.camera.zoom >= MARKER_SIZE: return []
+        rects = []
+        for cell, (color, _) in self.glyph_cells.items():
+            rect = self.marker_rect(cell)
+            if rect.colliderect(area):
+                self.screen.fill(color, rect)
+                rects.append(rect)
+        return rects
+
+    def restore(self, area):
+        # Redraws the tiles under `area`, e.g. where a marker was
+        self.screen.set_clip(area.clip(self.rect))
+        for key, (_, tile) in self.tiles.items():
+            self.screen.blit(tile, self.tile_rect(key))
+        self.screen.set_clip(None)
+
+    def render(self, cell_state):
+        """`cell_state(r, c)` returns the (color, glyph) a cell should have right now."""
+        cam = self.camera
+        if self.full_redraw:
+            self.full_redraw = False
+            self.chunks.clear()
+            self.tiles.clear()
+            self.glyph_cells.clear()
+            self.drawn = None
+        if self.drawn != cam.version:
+            self.drawn = cam.version
+            self.dirty.clear()
+            r0, c0, r1, c1 = cam.visible()
+            keys = {(cr, cc) for cr in range(r0 // CHUNK, (r1 - 1) // CHUNK + 1)
+                    for cc in range(c0 // CHUNK, (c1 - 1) // CHUNK + 1)}
+            # Tiles out of view are dropped (their chunks are kept)
+            for key in list(self.tiles):
+                if key not in keys: del self.tiles[key]
+            self.screen.set_clip(self.rect)
+            self.screen.fill(PANEL_BG, self.rect)  # around a grid smaller than the view
+            for key in keys:
+                if key not in self.chunks: self.build(key, cell_state)
+            for key in keys:
+                self.screen.blit(self.tile(key), self.tile_rect(key))
+            self.draw_markers(self.rect)
+            self.screen.set_clip(None)
+            return [self.rect]
+
+        rects, retiled = [], set()
+        whole_pixels = cam.zoom >= 1
+        for r, c in self.dirty:
+            key = (r // CHUNK, c // CHUNK)
+            chunk = self.chunks.get(key)
+            if chunk is None: continue
+            image, states = chunk
+            cr0, cc0, _, w = self.bounds(key)
+            j = (r - cr0) * w + (c - cc0)
+            state = cell_state(r, c)
+            if states[j] == state: continue
+            old, states[j] = states[j], state
+            image.set_at((c - cc0, r - cr0), state[0])
+            if state[1]: self.glyph_cells[(r, c)] = state
+            elif old[1]:
+                del self.glyph_cells[(r, c)]
+                if key in self.tiles and cam.zoom < MARKER_SIZE:
+                    rect = self.marker_rect((r, c))
+                    self.restore(rect)
+                    rects.append(rect)
+            if key not in self.tiles: continue
+            if whole_pixels:
+                rect = self.cell_in_tile(key, r, c)
+                tile = self.tiles[key][1]
+                self.paint_cell(tile, rect, *state)
+                x, y = self.tile_rect(key).topleft
+                screen_rect = rect.move(x, y).clip(self.rect)
+                self.screen.blit(tile, screen_rect, screen_rect.move(-x, -y))
+                rects.append(screen_rect)
+            else:
+                retiled.add(key)
+        self.dirty.clear()
+        # Below one pixel per cell a tile is rescaled from its chunk image instead
+        for key in retiled:
+            del self.tiles[key]
+            rect = self.tile_rect(key)
+            self.screen.set_clip(self.rect)
+            self.screen.blit(self.tile(key), rect)
+            self.screen.set_clip(None)
+            rects.append(rect.clip(self.rect))
+        for rect in list(rects):
+            rects.extend(self.draw_markers(rect))
+        return rects
+
+class Minimap:
+    """
+    Overview of the whole map in the bottom-right corner of the view, with the
+    camera's view framed in it; shown while the grid does not fit the view. It
+    samples the walls and terrain at one cell per pixel, so its cost does not
+    grow with the map, and is rebuilt at most every MINIMAP_MS while the map changes.
+    """
+    def __init__(self, camera):
+        self.camera = camera
+        view = camera.view
+        self.rect = pygame.Rect(view.right - MINIMAP_SIZE - 10, view.bottom - MINIMAP_SIZE - 10, MINIMAP_SIZE, MINIMAP_SIZE)
+        self.image = None
+        self.version = None   # grid version the image shows
+        self.built_at = 0
+
+    @property
+    def visible(self):
+        return not self.camera.fits
+
+    def refresh(self, env, now):
+        """Rebuilds the image if the map changed; returns True if it did."""
+        if env.version == self.version or (self.image and now - self.built_at < MINIMAP_MS): return False
+        n = min(MINIMAP_SIZE, env.size)
+        picks = [k * env.size // n for k in range(n)]
+        sample = itemgetter(*picks)
+        rows = []
+        for r in picks:
+            first = env.index(r, 0)
+            rows.append(b''.join(MINIMAP_COLORS[v] for v in sample(env.cells[first:first + env.size])))
+        self.image = pygame.transform.scale(pygame.image.frombytes(b''.join(rows), (n, n), 'RGB'), self.rect.size)
+        self.version, self.built_at = env.version, now
+        return True
+
+    def point(self, r, c):
+        scale = MINIMAP_SIZE / self.camera.size
+        return self.rect.x + int((c + 0.5) * scale), self.rect.y + int((r + 0.5) * scale)
+
+    def draw(self, screen, markers):
+        """Draws the map, the view's frame and a dot per (cell, color) in `markers`; returns its rect."""
+        cam = self.camera
+        screen.blit(self.image, self.rect)
+        scale = MINIMAP_SIZE / cam.world
+        frame = pygame.Rect(self.rect.x + cam.x * scale, self.rect.y + cam.y * scale,
+                            max(2, cam.view.w * scale), max(2, cam.view.h * scale))
+        screen.set_clip(self.rect)
+        pygame.draw.rect(screen, RED, frame, 1)
+        for cell, color in markers:
+            pygame.draw.circle(screen, color, self.point(*cell), 2)
+        screen.set_clip(None)
+        pygame.draw.rect(screen, PANEL_BG, self.rect, 1)
+        return self.rect
+
+    def cell_at(self, pos):
+        n = self.camera.size
+        return (min(n - 1, (pos[1] - self.rect.y) * n // MINIMAP_SIZE),
+                min(n - 1, (pos[0] - self.rect.x) * n // MINIMAP_SIZE))
+
+def replay_cell_state(replay, r, c):
+    """PathfinderApp.cell_state() of a recorded run, at the position of `replay`."""
+    i = replay.index(r, c)
+    value, flags = replay.map[i], replay.flags[i]
+    if value == WALL: color = DARK_GRAY
+    elif flags & TRACED: color = CYAN
+    elif flags & ON_PATH: color = YELLOW
+    elif flags & EXPLORED: color = LIGHT_BLUE
+    elif flags & FRONTIER: color = ORANGE
+    else: color = TERRAIN_COLORS.get(value, WHITE)
+    if (r, c) == replay.start: color = GREEN
+    if (r, c) == replay.target: color = BLUE
+    if i == replay.agent: color = RED
+
+    glyph = None
+    if (r, c) == replay.start: glyph = "S"
+    elif (r, c) == replay.target: glyph = "T"
+    return color, glyph
+
+class RaceView:
+    """
+    Tiled replay of a race (see race.py): one small grid per algorithm, all advanced
+    by the same number of expansions per frame, so the algorithms that expand fewer
+    nodes finish first. Tiles are painted straight onto the screen as their traces
+    advance, and render() returns only the rects that changed.
+    """
+    HEADER = 34
+
+    def __init__(self, screen, env, start, target, names, name_font, stats_font):
+        self.screen = screen
+        self.env = env
+        self.start, self.target = start, target
+        self.name_font, self.stats_font = name_font, stats_font
+        cols = math.ceil(math.sqrt(len(names)))
+        rows = math.ceil(len(names) / cols)
+        tile_w, tile_h = GRID_PIXEL_SIZE // cols, GRID_PIXEL_SIZE // rows
+        self.cell = max(1, min(tile_w - 8, tile_h - self.HEADER - 8) // env.size)
+        self.tiles = {}
+        for i, name in enumerate(names):
+            rect = pygame.Rect((i % cols) * tile_w, (i // cols) * tile_h, tile_w, tile_h)
+            self.tiles[name] = {'rect': rect, 'result': None, 'pos': 0, 'done': False}
+        self.dirty = [pygame.Rect(0, 0, GRID_PIXEL_SIZE, GRID_PIXEL_SIZE)]
+        self.screen.fill(PANEL_BG, self.dirty[0])
+        for name, tile in self.tiles.items():
+            self.draw_header(name, tile, "running...")
+
+    def origin(self, tile):
+        rect = tile['rect']
+        side = self.cell * self.env.size
+        return rect.x + (rect.w - side) // 2, rect.y + self.HEADER
+
+    def cell_rect(self, tile, i):
+        r, c = self.env.coord(i)
+        x, y = self.origin(tile)
+        rect = pygame.Rect(x + c * self.cell, y + r * self.cell, self.cell, self.cell)
+        return rect.inflate(-1, -1) if self.cell > 3 else rect
+
+    def draw_header(self, name, tile, stats):
+        rect = tile['rect']
+        header = pygame.Rect(rect.x, rect.y, rect.w, self.HEADER)
+        self.screen.fill(PANEL_BG, header)
+        self.screen.blit(render_text(self.name_font, name, TEXT_WHITE), (rect.x + 6, rect.y + 2))
+        self.screen.blit(render_text(self.stats_font, stats, TEXT_GRAY), (rect.x + 6, rect.y + 18))
+        self.dirty.append(header)
+
+    def draw_grid(self, tile):
+        x, y = self.origin(tile)
+        side = self.cell * self.env.size
+        board = pygame.Rect(x, y, side, side)
+        self.screen.fill(GRID_LINES, board)
+        for r in range(self.env.size):
+            for c in range(self.env.size):
+                value = self.env.cells[self.env.index(r, c)]
+                color = DARK_GRAY if value == WALL else TERRAIN_COLORS.get(value, WHITE)
+                if (r, c) == self.start: color = GREEN
+                elif (r, c) == self.target: color = BLUE
+                self.screen.fill(color, self.cell_rect(tile, self.env.index(r, c)))
+        self.dirty.append(board)
+
+    def paint(self, tile, i, color):
+        if self.env.coord(i) in (self.start, self.target): return
+        rect = self.cell_rect(tile, i)
+        self.screen.fill(color, rect)
+        self.dirty.append(rect)
+
+    def add_result(self, result):
+        tile = self.tiles[result['name']]
+        tile['result'] = result
+        self.draw_grid(tile)
+        self.draw_header(result['name'], tile, "searching...")
+
+    @property
+    def done(self):
+        return all(tile['done'] for tile in self.tiles.values())
+
+    def advance(self, budget=None):
+        """Replays up to `budget` SETTLED events (None = all) on every tile that has its result."""
+        for name, tile in self.tiles.items():
+            result = tile['result']
+            if result is None or tile['done']: continue
+            kinds, cells = result['trace'].kinds, result['trace'].cells
+            pos, left = tile['pos'], budget
+            while pos < len(kinds) and (left is None or left > 0):
+                kind = kinds[pos]
+                if kind == PUSHED: self.paint(tile, cells[pos], ORANGE)
+                elif kind == SETTLED:
+                    self.paint(tile, cells[pos], LIGHT_BLUE)
+                    if left is not None: left -= 1
+                pos += 1
+            tile['pos'] = pos
+            if pos == len(kinds):
+                tile['done'] = True
+                path = result['path']
+                for cell in path or ():
+                    self.paint(tile, self.env.index(*cell), YELLOW)
+                length = f"len {len(path)}" if path else "no path"
+                self.draw_header(name, tile, f"exp {result['expanded']}  {length}  {result['time_ms']:.1f} ms")
+
+    def render(self):
+        rects, self.dirty = self.dirty, []
+        return rects
+
 class PathfinderApp:
-    def __init__(self):
+    def __init__(self, size=GRID_SIZE, map_path=None, trace_memory=False):
         pygame.init()
         self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
         pygame.display.set_caption(WINDOW_TITLE)
         
-        self.title_font = pygame.font.SysFont('Segoe UI', 26, bold=True) 
-        self.header_font = pygame.font.SysFont('Segoe UI', 16, bold=True)
-        self.btn_font = pygame.font.SysFont('Segoe UI', 14)
-        self.stats_font = pygame.font.SysFont('Consolas', 13) 
-        self.cell_font = pygame.font.SysFont('Arial', 18, bold=True)
-
-        self.env = GridEnvironment(GRID_SIZE)
-        self.algo = SearchAlgorithms(GRID_SIZE)
+        self.fonts = FontLoader(FONTS)
+
+        self.env = GridEnvironment(size)
+        self.algo = SearchAlgorithms(size)
         
-        self.start = (2, 2)
-        self.target = (17, 17)
+        self.start = (min(2, size - 1),) * 2
+        self.target = (max(0, size - 3),) * 2
         self.current_pos = self.start
         
         self.status_msg = "Ready"
         self.nodes_visited = 0
         self.path_len = 0
-        self.is_dragging = False 
-        self.animation_speed = 0.02 
-        self.speed_label = "Fast"
+        self.dragging = None      # 'edit', 'pan' or 'minimap' while a mouse button is held
+        self.last_edit = None     # cell edited last in this drag, so each cell is edited once
+        self.speed_label, self.speed = SPEEDS[0]
+        self.step_budget = 0.0
+        self.runner = None        # active SearchRunner, if a search is in progress
+        self.runner_key = None    # cache key of the running search
+        self.cache = PathCache()
+        self.agent_path = None    # remaining walk of the agent, if it is moving
+        self.fleet = None         # routes of the multi-agent mode, one cell per time step
+        self.fleet_time = 0
+        self.fleet_cells = set()  # cells the fleet occupies at fleet_time
+        self.replanner = None     # D* Lite state, kept while the agent walks one route
+        self.heatmap = None       # DistanceField to the target while the overlay is on
+        self.show_heatmap = False
+        self.race = None          # RaceView while the race mode is shown
+        self.race_futures = {}    # race results still being computed, by algorithm name
+        self.pool = None          # process pool for races, started on first use
+        self.run_stats = None     # instrument.SearchStats of the last finished search
+        self.stats_log = []       # every measured run of this session, for the JSON export
+        self.profiling = False    # run the searches under cProfile (P key)
+        self.tracing_memory = trace_memory  # record the tracemalloc peak of the searches (T key); slows them
+        self.recording = None     # recording.Recording of the last search and its agent walk
+        self.replay = None        # recording.Replay while a recorded run is replayed
+        self.replay_speed = 0     # events per second, negative when playing backward
+        self.next_move_at = 0
+        self.paused = False
         self.current_mode = 'WALL' 
+        self.brush = 0            # index into BRUSHES painted in 'WALL' mode
         
+        self.frontier_set, self.explored_set, self.path_set, self.traced_set = set(), set(), set(), set()
+        self.clock = pygame.time.Clock()
+        self.setup_view()
+        self.panel_state = None
+        self.stats_state = None
+
         self.setup_ui()
-        self.env.add_static_wall(5, 5, 10)
+        self.setup_panel()
+        if map_path: self.load_map(map_path)
+        else: self.env.add_static_wall(5, 5, 10)
+        self.index_map()
+
+    def setup_view(self):
+        # Camera, tiles and minimap for the size of the current map
+        self.renderer = GridRenderer(self.screen, self.env.size, CELL_SIZE, self.fonts['cell'],
+                                     view=pygame.Rect(0, 0, GRID_PIXEL_SIZE, SCREEN_HEIGHT))
+        self.camera = self.renderer.camera
+        self.minimap = Minimap(self.camera)
+        self.minimap_state = None
 
     def setup_ui(self):
         # --- FIXED SPACING TO PREVENT OVERLAP ---
@@ -111,28 +682,29 @@ class PathfinderApp:
         self.header_y_positions["ALGORITHMS"] = current_y
         current_y += 30 # Space after header
 
-        algo_names = [
-            "BFS (Breadth-First)", "DFS (Depth-First)", "UCS (Uniform-Cost)", 
-            "DLS (Depth-Limited)", "IDDFS (Iterative Deep)", "Bidirectional Search"
-        ]
-        
-        for i, name in enumerate(algo_names):
-            self.buttons.append(Button(center_x, current_y, btn_w, btn_h, f"{i+1}. {name}", i+1))
-            current_y += btn_h + gap
+        # Two columns, so the informed searches fit next to the uninformed ones
+        half_w = (btn_w - gap) // 2
+        for i, name in enumerate(ALGO_NAMES):
+            x = center_x + (i % 2) * (half_w + gap)
+            self.buttons.append(Button(x, current_y, half_w, btn_h, f"{i+1}. {name}", i+1))
+            if i % 2 == 1: current_y += btn_h + gap
+        # The free slot next to the last algorithm runs all of them side by side
+        self.buttons.append(Button(center_x + half_w + gap, current_y, half_w, btn_h, "Race All", 'RACE'))
+        current_y += btn_h + gap
 
         # 2. Map Controls Section
         current_y += 15 # Section Spacer
         self.header_y_positions["MAP EDITOR"] = current_y
         current_y += 30
 
-        half_w = (btn_w - gap) // 2
         self.btn_set_start = Button(center_x, current_y, half_w, btn_h, "Set Start (S)", 'SET_S')
         self.btn_set_target = Button(center_x + half_w + gap, current_y, half_w, btn_h, "Set Target (T)", 'SET_T')
         self.buttons.extend([self.btn_set_start, self.btn_set_target])
         
         current_y += btn_h + gap
-        self.btn_map_mode = Button(center_x, current_y, btn_w, btn_h, "Map: Custom Wall", 'TOGGLE_MAP')
-        self.buttons.append(self.btn_map_mode)
+        self.btn_map_mode = Button(center_x, current_y, half_w, btn_h, "Map: Custom Wall", 'TOGGLE_MAP')
+        self.heatmap_btn = Button(center_x + half_w + gap, current_y, half_w, btn_h, "Heatmap: Off", 'HEAT')
+        self.buttons.extend([self.btn_map_mode, self.heatmap_btn])
 
         # 3. Simulation Controls
         current_y += 15 # Section Spacer (More breathing room)
@@ -145,202 +717,722 @@ class PathfinderApp:
         self.speed_btn = Button(center_x + half_w + gap, current_y, half_w, btn_h, f"Speed: {self.speed_label}", 'S')
         self.buttons.append(self.speed_btn)
 
-    def draw_grid_cell(self, r, c, color):
-        rect = pygame.Rect(c*CELL_SIZE, r*CELL_SIZE, CELL_SIZE, CELL_SIZE)
-        pygame.draw.rect(self.screen, color, rect)
-        pygame.draw.rect(self.screen, GRID_LINES, rect, 1) 
-        
-        if (r, c) == self.start: 
-            text = self.cell_font.render("S", True, WHITE)
-            self.screen.blit(text, text.get_rect(center=rect.center))
-        if (r, c) == self.target:
-            text = self.cell_font.render("T", True, WHITE)
-            self.screen.blit(text, text.get_rect(center=rect.center))
+        # Run controls: pause/resume, single step, cancel, finish instantly
+        current_y += btn_h + gap
+        quarter_w = (btn_w - 3 * gap) // 4
+        self.pause_btn = Button(center_x, current_y, quarter_w, btn_h, "Pause", 'PAUSE')
+        self.buttons.append(self.pause_btn)
+        for i, (label, code) in enumerate([("Step", 'STEP'), ("Stop", 'CANCEL'), ("Finish", 'FINISH')], start=1):
+            self.buttons.append(Button(center_x + i * (quarter_w + gap), current_y, quarter_w, btn_h, label, code))
 
-    def draw_ui(self):
-        # 1. Backgrounds
-        self.screen.fill(GRID_BG)
-        panel_rect = pygame.Rect(GRID_PIXEL_SIZE, 0, PANEL_WIDTH, SCREEN_HEIGHT)
-        pygame.draw.rect(self.screen, PANEL_BG, panel_rect)
-
-        # 2. Draw Grid Cells
-        for r in range(GRID_SIZE):
-            for c in range(GRID_SIZE):
-                color = WHITE 
-                if self.env.grid[r][c] == -1: color = DARK_GRAY
-                elif (r, c) in self.traced_set: color = CYAN 
-                elif (r, c) in self.path_set: color = YELLOW
-                elif (r, c) in self.explored_set: color = LIGHT_BLUE
-                elif (r, c) in self.frontier_set: color = ORANGE
-                if (r, c) == self.start: color = GREEN
-                if (r, c) == self.target: color = BLUE
-                if (r, c) == self.current_pos: color = RED
-                self.draw_grid_cell(r, c, color)
+        # Dynamic obstacles spawned while the agent walks
+        current_y += btn_h + gap
+        self.dynamic_btn = Button(center_x, current_y, half_w, btn_h, "Dynamic: Off", 'DYN')
+        self.buttons.append(self.dynamic_btn)
+        self.buttons.append(Button(center_x + half_w + gap, current_y, half_w, btn_h, "Clear Dynamic", 'C'))
 
-        # 3. Panel Title & Headers
-        title_surf = self.title_font.render("SEARCHING VISUALIZER", True, TEXT_WHITE)
-        self.screen.blit(title_surf, (GRID_PIXEL_SIZE + 20, 15))
-        
-        # Dynamic Section Headers
+    def setup_panel(self):
+        # Static part of the side panel (background, title, headers), rendered once
+        self.panel_bg = pygame.Surface((PANEL_WIDTH, SCREEN_HEIGHT))
+        self.panel_bg.fill(PANEL_BG)
+        self.panel_bg.blit(render_text(self.fonts['title'], "SEARCHING VISUALIZER", TEXT_WHITE), (20, 15))
         for text, y_pos in self.header_y_positions.items():
-            self.screen.blit(self.header_font.render(text, True, TEXT_GRAY), (GRID_PIXEL_SIZE + 35, y_pos))
+            self.panel_bg.blit(render_text(self.fonts['header'], text, TEXT_GRAY), (35, y_pos))
 
-        # 4. Buttons
+        self.dash_y = SCREEN_HEIGHT - 110
+        self.controls_rect = pygame.Rect(GRID_PIXEL_SIZE, 0, PANEL_WIDTH, self.dash_y - 5)
+        self.dash_area = pygame.Rect(GRID_PIXEL_SIZE, self.dash_y - 5, PANEL_WIDTH, SCREEN_HEIGHT - self.dash_y + 5)
+
+    def restore_panel(self, rect):
+        self.screen.blit(self.panel_bg, rect.topleft, rect.move(-GRID_PIXEL_SIZE, 0))
+
+    def cell_state(self, r, c):
+        # Called for every cell of a chunk the renderer builds, so the cell value is read once
+        cell = (r, c)
+        value = self.env.cells[self.env.index(r, c)]
+        if value == WALL: color = DARK_GRAY
+        elif cell in self.fleet_cells: color = PURPLE
+        elif cell in self.traced_set: color = CYAN
+        elif cell in self.path_set: color = YELLOW
+        elif cell in self.explored_set: color = LIGHT_BLUE
+        elif cell in self.frontier_set: color = ORANGE
+        elif self.heatmap: color = self.heat_color(r, c)
+        else: color = TERRAIN_COLORS.get(value, WHITE)
+        if cell == self.start: color = GREEN
+        if cell == self.target: color = BLUE
+        if cell == self.current_pos: color = RED
+
+        glyph = None
+        if cell == self.start: glyph = "S"
+        elif cell == self.target: glyph = "T"
+        return color, glyph
+
+    def heat_color(self, r, c):
+        d = self.heatmap.distance((r, c))
+        if d is None: return WHITE
+        t = d / max(1, self.heatmap.max_distance)
+        return tuple(round(n + (f - n) * t) for n, f in zip(HEAT_NEAR, HEAT_FAR))
+
+    def refresh_heatmap(self):
+        # One distance field from the target colors every cell; it is rebuilt only
+        # when the grid or the target changed since it was computed.
+        field = self.heatmap
+        if field and not field.stale and field.target == self.target: return
+        self.heatmap = self.algo.distance_field(self.target, self.env)
+        self.renderer.invalidate()
+
+    def is_active(self, btn):
+        if btn.action_code == 'SET_S' and self.current_mode == 'START': return True
+        if btn.action_code == 'SET_T' and self.current_mode == 'TARGET': return True
+        return False
+
+    def draw_ui(self):
+        # Only changed cells and changed panel regions are repainted; the rects
+        # collected here are the only parts of the window pushed to the display.
+        # 1. Grid Cells
+        if self.race:
+            dirty_rects = self.race.render()
+        elif self.replay:
+            dirty_rects = self.renderer.render(lambda r, c: replay_cell_state(self.replay, r, c))
+        else:
+            if self.show_heatmap: self.refresh_heatmap()
+            dirty_rects = self.renderer.render(self.cell_state)
+
+        # Minimap, over a corner of the grid while the map does not fit the view
+        if not self.race and self.minimap.visible:
+            markers = ((self.start, GREEN), (self.target, BLUE), (self.current_pos, RED))
+            state = (self.camera.version, markers)
+            rebuilt = self.minimap.refresh(self.env, pygame.time.get_ticks())
+            if rebuilt or state != self.minimap_state or self.minimap.rect.collidelist(dirty_rects) >= 0:
+                self.minimap_state = state
+                dirty_rects.append(self.minimap.draw(self.screen, markers))
+
+        # 2. Buttons (redrawn only when a label, hover or active state changes)
         mouse_pos = pygame.mouse.get_pos()
         for btn in self.buttons:
             btn.is_hovered = btn.rect.collidepoint(mouse_pos)
-            is_active = False
-            if btn.action_code == 'SET_S' and self.current_mode == 'START': is_active = True
-            if btn.action_code == 'SET_T' and self.current_mode == 'TARGET': is_active = True
-            btn.draw(self.screen, self.btn_font, is_active)
-            
-        # 5. Status Dashboard (Fixed Bottom)
+        panel_state = [(btn.text, btn.is_hovered, self.is_active(btn)) for btn in self.buttons]
+        if panel_state != self.panel_state:
+            self.panel_state = panel_state
+            self.restore_panel(self.controls_rect)
+            for btn, (_, _, is_active) in zip(self.buttons, panel_state):
+                btn.draw(self.screen, self.fonts['button'], is_active)
+            dirty_rects.append(self.controls_rect)
+
+        # 3. Status Dashboard (Fixed Bottom)
         # Positioned securely at the bottom to avoid overlap
-        dash_y = SCREEN_HEIGHT - 110
-        dash_rect = pygame.Rect(GRID_PIXEL_SIZE + 20, dash_y, PANEL_WIDTH - 40, 90)
-        pygame.draw.rect(self.screen, STATUS_BG, dash_rect, border_radius=12)
-        pygame.draw.rect(self.screen, (60, 80, 100), dash_rect, 2, border_radius=12)
-        
         stats = [
-            f"STATUS:  {self.status_msg}",
-            f"VISITED: {self.nodes_visited}",
-            f"LENGTH:  {self.path_len}",
-            f"MODE:    {self.current_mode}"
+            f"STATUS:  {self.status_msg}{' (Paused)' if self.paused else ''}{' (Profiling)' if self.profiling else ''}"
+            f"{' (Tracing memory)' if self.tracing_memory else ''}",
+            f"VISITED: {self.nodes_visited}  LENGTH: {self.path_len}  MODE: {self.mode_label}",
         ]
-        
-        for i, line in enumerate(stats):
-            col = CYAN if i == 0 else TEXT_WHITE
-            text = self.stats_font.render(line, True, col)
-            self.screen.blit(text, (GRID_PIXEL_SIZE + 35, dash_y + 12 + (i * 19)))
+        run = self.run_stats
+        if run:
+            memory = f"{run.peak_bytes / 1024:.0f}KB" if run.peak_bytes is not None else "-"
+            if run.pushes is None: stats.append("PUSHED: n/a  STALE: n/a  PEAK Q: n/a")
+            else: stats.append(f"PUSHED: {run.pushes}  STALE: {run.stale_pops}  PEAK Q: {run.peak_frontier}")
+            stats.append(f"SEARCH: {run.search_ms:.1f}ms  CB: {run.callback_ms:.0f}ms  MEM: {memory}")
+        else:
+            stats.extend(["PUSHED: -  STALE: -  PEAK Q: -", "SEARCH: -  CB: -  MEM: -"])
+        if stats != self.stats_state:
+            self.stats_state = stats
+            self.restore_panel(self.dash_area)
+            dash_rect = pygame.Rect(GRID_PIXEL_SIZE + 20, self.dash_y, PANEL_WIDTH - 40, 90)
+            pygame.draw.rect(self.screen, STATUS_BG, dash_rect, border_radius=12)
+            pygame.draw.rect(self.screen, (60, 80, 100), dash_rect, 2, border_radius=12)
+            for i, line in enumerate(stats):
+                col = CYAN if i == 0 else TEXT_WHITE
+                text = render_text(self.fonts['stats'], line, col)
+                self.screen.blit(text, (GRID_PIXEL_SIZE + 35, self.dash_y + 12 + (i * 19)))
+            dirty_rects.append(self.dash_area)
+
+        if dirty_rects: pygame.display.update(dirty_rects)
+
+    def clear_search(self):
+        # Repaint whatever the previous search left on the grid
+        for cells in (self.frontier_set, self.explored_set, self.path_set, self.traced_set):
+            self.renderer.mark_all(cells)
+            cells.clear()
 
-        pygame.display.flip()
+    def move_to(self, pos):
+        self.renderer.mark(self.current_pos)
+        self.current_pos = pos
+        self.renderer.mark(pos)
+
+    def edit_at(self, pos):
+        # Mouse edits go through the camera; a drag edits each cell it crosses once
+        cell = self.camera.cell_at(pos)
+        if cell is None or cell == self.last_edit: return
+        self.last_edit = cell
+        self.handle_grid_click(*cell)
 
     def handle_grid_click(self, r, c):
         if self.current_mode == 'START':
-            if (r, c) != self.target and self.env.grid[r][c] != -1:
+            if (r, c) != self.target and not self.env.is_wall(r, c):
+                self.renderer.mark(self.start)
                 self.start = (r, c)
-                self.current_pos = (r, c)
+                self.move_to((r, c))
         elif self.current_mode == 'TARGET':
-            if (r, c) != self.start and self.env.grid[r][c] != -1:
+            if (r, c) != self.start and not self.env.is_wall(r, c):
+                self.renderer.mark_all((self.target, (r, c)))
                 self.target = (r, c)
         elif self.current_mode == 'WALL':
-            if (r, c) != self.start and (r, c) != self.target:
-                self.env.toggle_obstacle(r, c)
+            if (r, c) != self.start and (r, c) != self.target and (r, c) != self.current_pos:
+                value = BRUSHES[self.brush][1]
+                was_wall = self.env.is_wall(r, c)
+                if value == WALL: self.env.toggle_obstacle(r, c)
+                elif self.env.cells[self.env.index(r, c)] != value: self.env.set_terrain(r, c, value)
+                else: return
+                self.renderer.mark((r, c))
+                self.record_cells([(r, c)])
+                # The walking agent's route only breaks where walls come or go
+                if value == WALL or was_wall: self.replan([(r, c)])
+
+    @property
+    def mode_label(self):
+        if self.current_mode != 'WALL': return self.current_mode
+        return BRUSHES[self.brush][0].upper()
+
+    def cycle_brush(self):
+        self.brush = (self.brush + 1) % len(BRUSHES)
+        name, value = BRUSHES[self.brush]
+        self.current_mode = 'WALL'
+        self.status_msg = f"Brush: {name}" if value == WALL else f"Brush: {name} (cost {STEP_COST[value]})"
 
-    def viz_callback(self, node, frontier, explored):
-        self.nodes_visited = len(explored)
-        self.frontier_set = set(frontier)
-        self.explored_set = set(explored)
-        self.draw_ui()
-        time.sleep(self.animation_speed)
-        pygame.event.pump()
+    def viz_callback(self, event, data):
+        # Maintain the frontier/explored sets from the search deltas (see ALGORITHM.py)
+        if event == FOUND: return
+        if self.recording: self.recording.record(event, data)
+        cell = self.env.coord(data)
+        self.renderer.mark(cell)
+        if event == PUSHED:
+            self.frontier_set.add(cell)
+        elif event == POPPED:
+            self.frontier_set.discard(cell)
+        elif event == SETTLED:
+            self.explored_set.add(cell)
+            self.nodes_visited += 1
 
     def move_agent(self, path):
+        # Non-blocking: update() walks the agent one step per AGENT_STEP_MS
         if not path: return
         self.path_set, self.path_len = set(path), len(path)
-        self.draw_ui()
-        time.sleep(0.5)
-        self.status_msg = "Moving Agent..."
-        self.traced_set = set() 
-        for i in range(1, len(path)):
-            self.traced_set.add(self.current_pos)
-            self.current_pos = path[i]
-            self.traced_set.add(self.current_pos)
-            self.draw_ui()
-            time.sleep(0.15) 
-        self.status_msg = "Target Reached!"
+        self.renderer.mark_all(path)
+        if self.recording: self.recording.route(path)
+        self.traced_set = set()
+        self.agent_path = list(path[1:])
+        self.replanner = None
+        self.next_move_at = pygame.time.get_ticks() + PATH_PREVIEW_MS
+
+    def replan(self, changed):
+        # Cells flipped while the agent walks: D* Lite repairs only the affected part
+        # of its search tree. The first change builds it with one full backward search.
+        if not self.agent_path or not changed: return
+        if self.replanner is None:
+            self.replanner = DStarLite(self.env, self.current_pos, self.target, self.algo.directions)
+        else:
+            self.replanner.move_to(self.current_pos)
+            self.replanner.update_cells(changed)
+        path = self.replanner.plan()
+        self.renderer.mark_all(self.path_set)
+        if self.recording: self.recording.route(path)
+        if not path:
+            self.path_set, self.agent_path = set(), None
+            self.status_msg = "Path Blocked!"
+            return
+        self.path_set, self.path_len = set(path), len(path)
+        self.renderer.mark_all(path)
+        self.agent_path = path[1:]
+
+    def index_map(self):
+        # Builds the connectivity index after every change of the whole layout
+        # (single-cell edits keep it current), so searches reject an unreachable
+        # target at once and spawned obstacles never cut the agent off
+        self.env.connectivity(self.algo.offsets)
+
+    def step_agent(self):
+        if self.status_msg != "Moving Agent...": self.status_msg = "Moving Agent..."
+        spawned = self.env.spawn_dynamic_obstacle(self.start, self.target, self.current_pos, self.agent_path,
+                                                  offsets=self.algo.offsets)
+        if spawned:
+            self.renderer.mark(spawned)
+            self.record_cells([spawned])
+            self.replan([spawned])
+            if not self.agent_path: return
+        self.mark_traced(self.current_pos)
+        self.move_to(self.agent_path.pop(0))
+        self.mark_traced(self.current_pos)
+        if not self.agent_path:
+            self.agent_path = None
+            self.status_msg = "Target Reached!"
+
+    def mark_traced(self, cell):
+        self.traced_set.add(cell)
+        if self.recording: self.recording.moved(cell)
+
+    def record_cells(self, cells):
+        # Map edits while the last run is still on screen become part of its recording
+        if self.recording:
+            for cell in cells: self.recording.edit(cell, self.env.cells[self.env.index(*cell)])
+
+    def advance_search(self, budget):
+        # Apply up to `budget` expansions (None = all) from the running search
+        try:
+            for event, data in self.runner.poll(budget, timeout=1 / FPS):
+                self.viz_callback(event, data)
+        except Exception as e:
+            # A search that failed on the worker ends there; the UI keeps running
+            self.runner = None
+            self.status_msg = f"Search Failed: {type(e).__name__}: {e}"
+            return
+        if self.runner.done:
+            (path, self.run_stats), self.runner = self.runner.result, None
+            self.stats_log.append(self.run_stats.as_dict())
+            self.cache.store(self.runner_key, path, self.run_stats.expanded)
+            if path: self.move_agent(path)
+            else: self.status_msg = "No Path Found!"
+
+    def update(self):
+        # Called once per frame by the main loop
+        if self.race: self.collect_race()
+        if self.paused: return
+        if self.replay:
+            self.step_budget += self.replay_speed / FPS
+            steps = int(self.step_budget)
+            if steps:
+                self.step_budget -= steps
+                self.advance_replay(steps)
+        elif self.race:
+            self.step_budget += self.speed / FPS
+            budget = int(self.step_budget)
+            if budget:
+                self.step_budget -= budget
+                self.advance_race(budget)
+        elif self.runner:
+            self.step_budget += self.speed / FPS
+            budget = int(self.step_budget)
+            if budget:
+                self.step_budget -= budget
+                self.advance_search(budget)
+        elif self.agent_path and pygame.time.get_ticks() >= self.next_move_at:
+            self.step_agent()
+            self.next_move_at += AGENT_STEP_MS
+        elif self.fleet and pygame.time.get_ticks() >= self.next_move_at:
+            self.step_fleet()
+            self.next_move_at += AGENT_STEP_MS
+
+    def toggle_pause(self):
+        self.paused = not self.paused
+        self.pause_btn.text = "Resume" if self.paused else "Pause"
+
+    def single_step(self):
+        if not self.paused: self.toggle_pause()
+        if self.replay: self.advance_replay(-1 if self.replay_speed < 0 else 1)
+        elif self.race: self.advance_race(1)
+        elif self.runner: self.advance_search(1)
+        elif self.agent_path: self.step_agent()
+        elif self.fleet: self.step_fleet()
+
+    def cancel(self):
+        if self.replay:
+            self.end_replay()
+        elif self.race:
+            # Jobs already running finish in the background; their results are dropped
+            for future in self.race_futures.values(): future.cancel()
+            self.race, self.race_futures = None, {}
+            self.renderer.invalidate()
+            self.status_msg = "Race Closed"
+        elif self.runner:
+            self.runner.cancel()
+            self.runner = None
+            self.status_msg = "Search Cancelled"
+        elif self.agent_path:
+            self.agent_path = None
+            self.status_msg = "Agent Stopped"
+        elif self.fleet:
+            self.end_fleet()
+            self.status_msg = "Agents Stopped"
+        self.replanner = None
+        if self.paused: self.toggle_pause()
+
+    def finish(self):
+        if self.replay: self.advance_replay(len(self.replay))
+        if self.race:
+            for future in self.race_futures.values(): future.result()
+            self.collect_race()
+            self.advance_race(None)
+        if self.runner: self.advance_search(None)
+        while self.agent_path: self.step_agent()
+        while self.fleet: self.step_fleet()
 
     def run_algo(self, code):
+        self.cancel()
         self.last_algo_code = code
         self.nodes_visited = 0
-        self.frontier_set, self.explored_set, self.path_set, self.traced_set = set(), set(), set(), set()
+        self.run_stats = None
+        self.clear_search()
         self.status_msg = "Searching..."
-        if self.current_pos == self.target: self.current_pos = self.start
+        if self.current_pos == self.target: self.move_to(self.start)
             
+        start, target = self.current_pos, self.target
+        # The worker gets its own SearchAlgorithms: the heatmap and the fleet use
+        # self.algo on this thread meanwhile, and would mix up its counters
+        algo = SearchAlgorithms(self.env.size)
         methods = {
-            1: lambda: self.algo.bfs(self.current_pos, self.target, self.env.grid, self.viz_callback),
-            2: lambda: self.algo.dfs(self.current_pos, self.target, self.env.grid, self.viz_callback),
-            3: lambda: self.algo.ucs(self.current_pos, self.target, self.env.grid, self.viz_callback),
-            4: lambda: self.algo.dls(self.current_pos, self.target, self.env.grid, 20, self.viz_callback),
-            5: lambda: self.algo.iddfs(self.current_pos, self.target, self.env.grid, 30, self.viz_callback),
-            6: lambda: self.algo.bidirectional_search(self.current_pos, self.target, self.env.grid, self.viz_callback)
+            1: lambda cb: algo.bfs(start, target, self.env, cb),
+            2: lambda cb: algo.dfs(start, target, self.env, cb),
+            3: lambda cb: algo.ucs(start, target, self.env, cb),
+            4: lambda cb: algo.dls(start, target, self.env, 20, cb),
+            5: lambda cb: algo.iddfs(start, target, self.env, callback=cb),
+            6: lambda cb: algo.bidirectional_search(start, target, self.env, cb),
+            7: lambda cb: algo.astar(start, target, self.env, cb),
+            8: lambda cb: algo.weighted_astar(start, target, self.env, 2.0, cb),
+            9: lambda cb: algo.anytime_astar(start, target, self.env, callback=cb)
         }
         
         if code in methods:
-            path = methods[code]()
-            if path: self.move_agent(path)
-            else: self.status_msg = "No Path Found!"
+            self.recording = Recording(self.env, start, self.target, ALGO_NAMES[code - 1])
+            # Same algorithm, endpoints and grid version as an earlier run: replay its path
+            key = self.cache.key(code, start, self.target, self.env)
+            entry = self.cache.fetch(key)
+            if entry is not None:
+                path, self.nodes_visited = entry
+                self.status_msg = f"Cached Path ({self.cache.hits} hits)"
+                if path: self.move_agent(path)
+                else: self.status_msg = "No Path Found! (cached)"
+                return
+
+            # The search runs on a worker thread; update() feeds its events to the grid.
+            # Its callback time includes waiting for the animation to catch up.
+            self.step_budget = 0.0
+            self.runner_key = key
+            name, search, profile, memory = ALGO_NAMES[code - 1], methods[code], self.profiling, self.tracing_memory
+            self.runner = SearchRunner(lambda cb: measure(name, search, algo, cb, memory=memory, profile=profile)).start()
+
+    # --- Recording and Replay ---
+    def start_replay(self, recording):
+        self.cancel()
+        self.replay = Replay(recording)
+        self.replay_speed = self.speed
+        self.step_budget = 0.0
+        self.renderer.invalidate()
+        self.advance_replay(0)
+
+    def end_replay(self):
+        self.replay = None
+        self.renderer.invalidate()
+        self.status_msg = "Replay Closed"
+
+    def advance_replay(self, steps):
+        # Moves by `steps` events (negative = backward) and repaints what changed
+        replay = self.replay
+        agent = replay.agent
+        changed = replay.seek(replay.position + steps)
+        if changed is None: self.renderer.invalidate()
+        else:
+            changed.update((agent, replay.agent))
+            self.renderer.mark_all(replay.coord(i) for i in changed)
+        self.status_msg = f"Replay {replay.position}/{len(replay)} ({self.replay_speed:+d}/s)"
+
+    def scrub(self, direction):
+        # Left/Right play backward/forward; another press the same way doubles the speed
+        if (self.replay_speed > 0) == (direction > 0): self.replay_speed *= 2
+        else: self.replay_speed = direction * self.speed
+        if self.paused: self.toggle_pause()
+        self.advance_replay(0)
+
+    def toggle_replay(self):
+        if self.replay: self.end_replay()
+        elif self.recording: self.start_replay(self.recording)
+        else: self.status_msg = "Nothing recorded yet"
+
+    def save_trace(self):
+        if not self.recording:
+            self.status_msg = "Nothing recorded yet"
+            return
+        save_trace(self.recording, TRACE_FILE)
+        self.status_msg = f"Trace saved to {TRACE_FILE}"
+
+    def load_trace(self):
+        try:
+            recording = load_trace(TRACE_FILE)
+        except (OSError, ValueError) as e:
+            self.status_msg = f"Load failed: {e}"
+            return
+        if recording.size != self.env.size:
+            self.status_msg = f"Trace is {recording.size}x{recording.size}, need {self.env.size}x{self.env.size}"
+            return
+        self.start_replay(recording)
+
+    def start_race(self):
+        # Every algorithm runs on the current map in its own process; the tiles
+        # replay each trace as soon as its result comes back.
+        if self.env.size > RACE_MAX_SIZE:
+            self.status_msg = f"Race needs a map of at most {RACE_MAX_SIZE}x{RACE_MAX_SIZE}"
+            return
+        self.cancel()
+        self.clear_search()
+        if self.current_pos == self.target: self.move_to(self.start)
+        self.pool = self.pool or race.new_pool()
+        self.race_started = pygame.time.get_ticks()
+        self.race_futures = race.start_race(self.pool, self.env, self.current_pos, self.target)
+        self.race = RaceView(self.screen, self.env, self.current_pos, self.target, list(self.race_futures),
+                             self.fonts['button'], self.fonts['stats'])
+        self.step_budget = 0.0
+        self.status_msg = "Racing..."
+
+    def collect_race(self):
+        for name, future in list(self.race_futures.items()):
+            if future.done():
+                del self.race_futures[name]
+                self.race.add_result(future.result())
+                if not self.race_futures:
+                    self.status_msg = f"Race computed in {pygame.time.get_ticks() - self.race_started} ms"
+
+    def advance_race(self, budget):
+        self.race.advance(budget)
+        if self.race.done and not self.race_futures:
+            results = [tile['result'] for tile in self.race.tiles.values() if tile['result']['path']]
+            if results:
+                best = min(results, key=lambda r: r['expanded'])
+                self.status_msg = f"Race: {best['name']} wins"
+            else:
+                self.status_msg = "Race: No Path Found!"
+
+    def start_fleet(self):
+        # FLEET_SIZE agents from random free cells to the Target, planned together
+        # so that no two of them ever share a cell; they leave the map on arrival.
+        self.cancel()
+        self.clear_search()
+        free = [(r, c) for r in range(self.env.size) for c in range(self.env.size)
+                if not self.env.is_wall(r, c) and (r, c) != self.target]
+        starts = random.sample(free, min(FLEET_SIZE, len(free)))
+        planner = MultiAgentPlanner(self.env, self.algo, park=False)
+        routes = [route for route in planner.plan_all([(s, self.target) for s in starts]) if route]
+        self.fleet, self.fleet_time = routes, 0
+        self.fleet_cells = set(route[0] for route in routes)
+        self.renderer.mark_all(self.fleet_cells)
+        self.status_msg = f"{planner.planned} agents, {planner.plans_per_second:.0f} plans/s"
+        if not routes: self.end_fleet()
+        self.next_move_at = pygame.time.get_ticks() + PATH_PREVIEW_MS
+
+    def step_fleet(self):
+        # All agents move at once; old and new cells are repainted in one render
+        self.fleet_time += 1
+        cells = set()
+        for route in self.fleet:
+            cell = position(route, self.fleet_time, park=False)
+            if cell is not None and cell != self.target: cells.add(cell)
+        self.renderer.mark_all(self.fleet_cells | cells)
+        self.fleet_cells = cells
+        if self.fleet_time >= max(len(route) for route in self.fleet): self.end_fleet()
+
+    def end_fleet(self):
+        self.renderer.mark_all(self.fleet_cells)
+        self.fleet, self.fleet_cells = None, set()
 
     def toggle_speed(self):
-        self.animation_speed = 0.1 if self.speed_label == "Fast" else 0.02
-        self.speed_label = "Slow" if self.speed_label == "Fast" else "Fast"
+        labels = [label for label, _ in SPEEDS]
+        self.speed_label, self.speed = SPEEDS[(labels.index(self.speed_label) + 1) % len(SPEEDS)]
         self.speed_btn.text = f"Speed: {self.speed_label}"
 
+    def toggle_dynamic(self):
+        self.env.obstacle_chance = 0.0 if self.env.obstacle_chance else DYNAMIC_CHANCE
+        self.dynamic_btn.text = "Dynamic: On" if self.env.obstacle_chance else "Dynamic: Off"
+
+    def toggle_heatmap(self):
+        self.show_heatmap = not self.show_heatmap
+        self.heatmap_btn.text = "Heatmap: On" if self.show_heatmap else "Heatmap: Off"
+        if self.show_heatmap:
+            self.refresh_heatmap()
+            self.status_msg = f"Heatmap: max distance {self.heatmap.max_distance}"
+        else:
+            self.heatmap = None
+            self.renderer.invalidate()
+
+    def zoom(self, steps, anchor=None):
+        # `steps` wheel notches in (negative: out) about `anchor`; None fits the whole map
+        if steps is None: self.camera.set_zoom(self.camera.min_zoom)
+        else: self.camera.zoom_by(steps, anchor)
+        zoom = self.camera.zoom
+        self.status_msg = f"Zoom: {zoom} px/cell" if zoom >= 1 else f"Zoom: {1 / zoom:.1f} cells/px"
+
+    def toggle_profiling(self):
+        # Applies from the next search on
+        self.profiling = not self.profiling
+        self.status_msg = f"Profiling {'On' if self.profiling else 'Off'}"
+
+    def toggle_memory_tracing(self):
+        # Applies from the next search on; tracemalloc slows every allocation
+        self.tracing_memory = not self.tracing_memory
+        self.status_msg = f"Memory Tracing {'On' if self.tracing_memory else 'Off'}"
+
+    def export_stats(self):
+        with open(STATS_FILE, 'w') as f:
+            json.dump({'runs': self.stats_log}, f, indent=2)
+        self.status_msg = f"Saved {len(self.stats_log)} runs to {STATS_FILE}"
+
     def toggle_map_mode(self):
+        self.cancel()
+        self.recording = None
         if self.btn_map_mode.text == "Map: Custom Wall":
             self.btn_map_mode.text = "Map: Auto Maze"
-            self.env.generate_maze()
+            self.env.generate_maze(keep_open=[self.start, self.target])
             self.status_msg = "Maze Generated"
         elif self.btn_map_mode.text == "Map: Auto Maze":
             self.btn_map_mode.text = "Map: Trap Case"
-            self.env.reset_grid()
-            sr, sc = self.start
-            points = [(sr-1, sc+1), (sr, sc+1), (sr+1, sc+1), (sr-1, sc), (sr-1, sc-1), (sr+1, sc), (sr+1, sc-1)]
-            for r, c in points:
-                if 0 <= r < GRID_SIZE and 0 <= c < GRID_SIZE:
-                    self.env.grid[r][c] = -1
-                    self.env.static_obstacles.add((r, c))
+            self.env.generate_trap(self.start)
             self.status_msg = "Trap Generated"
         else:
             self.btn_map_mode.text = "Map: Custom Wall"
             self.env.reset_grid()
             self.status_msg = "Map Cleared"
+        self.index_map()
         self.current_pos = self.start
-        self.frontier_set, self.explored_set, self.path_set, self.traced_set = set(), set(), set(), set()
+        self.clear_search()
+        self.renderer.invalidate()
+
+    def save_map(self):
+        # raw keeps the terrain, which the bit-packed encodings drop
+        mapfile.save_map(self.env, MAP_FILE, 'raw', start=self.start, target=self.target)
+        self.status_msg = f"Map saved to {MAP_FILE}"
+
+    def load_map(self, path=MAP_FILE):
+        # Copied, not memory-mapped: F5 may overwrite the file while the map is in use
+        try:
+            env, info = mapfile.open_map(path, copy=True)
+        except (OSError, ValueError) as e:
+            self.status_msg = f"Load failed: {e}"
+            return
+        self.cancel()
+        env.obstacle_chance = self.env.obstacle_chance
+        resized = env.size != self.env.size
+        self.env = env
+        self.recording = None
+        self.heatmap = None
+        n = env.size
+        self.start = info['start'] or (self.start if env.in_bounds(*self.start) else (min(2, n - 1),) * 2)
+        self.target = info['target'] or (self.target if env.in_bounds(*self.target) else (max(0, n - 3),) * 2)
+        self.current_pos = self.start
+        self.clear_search()
+        # A map of another size needs its own search tables and view
+        if resized:
+            self.algo = SearchAlgorithms(n)
+            self.setup_view()
+        else: self.renderer.invalidate()
+        self.index_map()
+        self.status_msg = f"Map loaded from {path}"
+
+    def handle_action(self, code):
+        if isinstance(code, int): self.run_algo(code)
+        elif code == 'RACE': self.start_race()
+        elif code == 'FLEET': self.start_fleet()
+        elif code == 'R':
+            self.cancel()
+            self.recording = None
+            self.env.reset_grid()
+            self.index_map()
+            self.current_pos = self.start
+            self.clear_search()
+            self.renderer.invalidate()
+        elif code == 'C' and not self.runner:
+            cleared = self.env.clean_dynamic()
+            self.renderer.mark_all(cleared)
+            self.record_cells(cleared)
+            self.replan(cleared)
+        elif code == 'DYN': self.toggle_dynamic()
+        elif code == 'HEAT': self.toggle_heatmap()
+        elif code == 'BRUSH': self.cycle_brush()
+        elif code == 'REPLAY': self.toggle_replay()
+        elif code == 'SAVE_TRACE': self.save_trace()
+        elif code == 'LOAD_TRACE': self.load_trace()
+        elif code in ('REWIND', 'FORWARD') and self.replay: self.scrub(-1 if code == 'REWIND' else 1)
+        elif code == 'FIRST' and self.replay: self.advance_replay(-self.replay.position)
+        elif code == 'LAST' and self.replay: self.advance_replay(len(self.replay))
+        elif code in ('ZOOM_IN', 'ZOOM_OUT') and not self.race: self.zoom(1 if code == 'ZOOM_IN' else -1)
+        elif code == 'FIT' and not self.race: self.zoom(None)
+        elif code == 'PROFILE': self.toggle_profiling()
+        elif code == 'MEMORY': self.toggle_memory_tracing()
+        elif code == 'EXPORT': self.export_stats()
+        elif code == 'SAVE_MAP': self.save_map()
+        elif code == 'LOAD_MAP': self.load_map()
+        elif code == 'S': self.toggle_speed()
+        elif code == 'TOGGLE_MAP': self.toggle_map_mode()
+        elif code == 'PAUSE': self.toggle_pause()
+        elif code == 'STEP': self.single_step()
+        elif code == 'CANCEL': self.cancel()
+        elif code == 'FINISH': self.finish()
+        elif code == 'SET_S':
+            if self.current_mode == 'START':
+                self.current_mode = 'WALL'
+                self.status_msg = "Mode: Draw Walls"
+            else:
+                self.current_mode = 'START'
+                self.status_msg = "Mode: Set Start"
+        elif code == 'SET_T':
+            if self.current_mode == 'TARGET':
+                self.current_mode = 'WALL'
+                self.status_msg = "Mode: Draw Walls"
+            else:
+                self.current_mode = 'TARGET'
+                self.status_msg = "Mode: Set Target"
 
     def run(self):
         running = True
-        self.frontier_set, self.explored_set, self.path_set, self.traced_set = set(), set(), set(), set()
+        keys = {pygame.K_SPACE: 'PAUSE', pygame.K_n: 'STEP', pygame.K_ESCAPE: 'CANCEL', pygame.K_f: 'FINISH', pygame.K_h: 'HEAT',
+                pygame.K_p: 'PROFILE', pygame.K_t: 'MEMORY', pygame.K_e: 'EXPORT', pygame.K_F5: 'SAVE_MAP', pygame.K_F9: 'LOAD_MAP',
+                pygame.K_m: 'FLEET', pygame.K_b: 'BRUSH', pygame.K_v: 'REPLAY', pygame.K_F6: 'SAVE_TRACE',
+                pygame.K_F10: 'LOAD_TRACE', pygame.K_LEFT: 'REWIND', pygame.K_RIGHT: 'FORWARD', pygame.K_HOME: 'FIRST',
+                pygame.K_END: 'LAST', pygame.K_EQUALS: 'ZOOM_IN', pygame.K_PLUS: 'ZOOM_IN', pygame.K_KP_PLUS: 'ZOOM_IN',
+                pygame.K_MINUS: 'ZOOM_OUT', pygame.K_KP_MINUS: 'ZOOM_OUT', pygame.K_0: 'FIT'}
         while running:
+            self.update()
             self.draw_ui()
+            self.clock.tick(FPS)
             for event in pygame.event.get():
                 if event.type == pygame.QUIT: running = False
+                if event.type == pygame.KEYDOWN and event.key in keys: self.handle_action(keys[event.key])
                 if event.type == pygame.MOUSEBUTTONDOWN:
-                    mx, my = pygame.mouse.get_pos()
-                    if mx < GRID_PIXEL_SIZE: 
-                        self.is_dragging = True
-                        self.handle_grid_click(my // CELL_SIZE, mx // CELL_SIZE)
-                    else: 
+                    if self.camera.view.collidepoint(event.pos):
+                        if self.race: continue
+                        # Right or middle button drags the view; the minimap moves it to where it is clicked
+                        if event.button in (2, 3): self.dragging = 'pan'
+                        elif event.button != 1: continue
+                        elif self.minimap.visible and self.minimap.rect.collidepoint(event.pos):
+                            self.dragging = 'minimap'
+                            self.camera.center_on(*self.minimap.cell_at(event.pos))
+                        # The grid is read by the search thread, so edits wait until it ends
+                        elif not (self.runner or self.fleet or self.replay):
+                            self.dragging, self.last_edit = 'edit', None
+                            self.edit_at(event.pos)
+                    elif event.button == 1:
                         for btn in self.buttons:
-                            if btn.check_click((mx, my)):
-                                if isinstance(btn.action_code, int): self.run_algo(btn.action_code)
-                                elif btn.action_code == 'R': 
-                                    self.env.reset_grid()
-                                    self.current_pos = self.start
-                                    self.frontier_set, self.explored_set, self.path_set, self.traced_set = set(), set(), set(), set()
-                                elif btn.action_code == 'C': self.env.clean_dynamic()
-                                elif btn.action_code == 'S': self.toggle_speed()
-                                elif btn.action_code == 'TOGGLE_MAP': self.toggle_map_mode()
-                                elif btn.action_code == 'SET_S': 
-                                    if self.current_mode == 'START':
-                                        self.current_mode = 'WALL' 
-                                        self.status_msg = "Mode: Draw Walls"
-                                    else:
-                                        self.current_mode = 'START'
-                                        self.status_msg = "Mode: Set Start"
-                                elif btn.action_code == 'SET_T': 
-                                    if self.current_mode == 'TARGET':
-                                        self.current_mode = 'WALL' 
-                                        self.status_msg = "Mode: Draw Walls"
-                                    else:
-                                        self.current_mode = 'TARGET'
-                                        self.status_msg = "Mode: Set Target"
-                                        
-                elif event.type == pygame.MOUSEBUTTONUP: self.is_dragging = False
-                elif event.type == pygame.MOUSEMOTION and self.is_dragging:
-                    mx, my = pygame.mouse.get_pos()
-                    if mx < GRID_PIXEL_SIZE: self.handle_grid_click(my // CELL_SIZE, mx // CELL_SIZE)
+                            if btn.check_click(event.pos): self.handle_action(btn.action_code)
+
+                elif event.type == pygame.MOUSEBUTTONUP: self.dragging = None
+                elif event.type == pygame.MOUSEMOTION and self.dragging == 'pan':
+                    self.camera.pan(-event.rel[0], -event.rel[1])
+                elif event.type == pygame.MOUSEMOTION and self.dragging == 'minimap':
+                    x, y = event.pos
+                    rect = self.minimap.rect
+                    self.camera.center_on(*self.minimap.cell_at((min(max(x, rect.left), rect.right - 1),
+                                                                  min(max(y, rect.top), rect.bottom - 1))))
+                elif event.type == pygame.MOUSEMOTION and self.dragging == 'edit':
+                    if not (self.runner or self.race or self.fleet or self.replay): self.edit_at(event.pos)
+                elif event.type == pygame.MOUSEWHEEL and not self.race:
+                    pos = pygame.mouse.get_pos()
+                    if self.camera.view.collidepoint(pos): self.zoom(event.y, pos)
+        if self.pool: self.pool.shutdown(cancel_futures=True)
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=WINDOW_TITLE)
+    p.add_argument('--size', type=int, default=GRID_SIZE, help="side of the empty map to start with")
+    p.add_argument('--map', help="start with this map (a map file written by F5 or headless.py, or a text map)")
+    p.add_argument('--trace-memory', action='store_true', help="record the tracemalloc peak of every search "
+                   "(slows the searches; T toggles it)")
+    return p.parse_args(argv)
 
 if __name__ == "__main__":
-    app = PathfinderApp()
-    app.run()
\ No newline at end of file
+    opts = parse_args()
+    app = PathfinderApp(opts.size, opts.map, opts.trace_memory)
+    app.run()
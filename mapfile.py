@@ -0,0 +1,242 @@
+"""
+Saving and loading maps.
+
+A map file is a fixed 64-byte header (size, start, target, generator seed) and
+a payload in one of three encodings:
+
+    bits  the wall mask, 1 bit per cell, each row padded to whole bytes
+    rle   the wall mask as alternating free/wall run lengths (LEB128 varints),
+          row-major and starting with a free run; small for open or blocky maps
+    raw   GridEnvironment.cells as is, border included, 1 byte per cell
+
+bits and rle store walls only, so terrain is lost. raw keeps every cell value and is the format for
+very large maps: load_map() memory-maps it copy-on-write and hands the mapping
+to GridEnvironment as its cell buffer, so a multi-gigabyte grid is paged in from
+disk as the search touches it instead of being read into memory first. Edits
+to such a grid stay private to the process and never reach the file.
+
+Small maps can also be shared as text, one line per row: '#' is a wall, '.' a
+free cell, a digit 1-9 free terrain of that cell value (see environment.py), 'S'
+and 'T' the start and the target.
+"""
+import mmap
+import re
+import struct
+from environment import GridEnvironment, FREE, WALL
+
+try:
+    import numpy as np
+except ImportError:  # NumPy only speeds up packing and unpacking rows
+    np = None
+
+MAGIC = b'PFMP'
+FORMAT_VERSION = 1
+ENCODINGS = ('raw', 'bits', 'rle')
+# magic, version, encoding, flags, size, start r/c, target r/c, seed, payload bytes
+HEADER = struct.Struct('<4sBBHI4iqQ20x')
+HAS_START, HAS_TARGET, HAS_SEED = 1, 2, 4
+
+# Rows per block when (un)packing, so no temporary is larger than about this many bytes
+BLOCK_BYTES = 1 << 22
+
+# Cell value -> '1' for walls, '0' otherwise, and back
+_MASK_CHARS = bytes(ord('1') if b == WALL else ord('0') for b in range(256))
+_CELL_VALUES = bytes(WALL if b == ord('1') else FREE for b in range(256))
+# Cell value -> 1 for walls, 0 otherwise (for the run scan)
+_MASK_BITS = bytes(1 if b == WALL else 0 for b in range(256))
+_RUNS = re.compile(rb'\x00+|\x01+')
+
+# --- Binary Files ---
+def save_map(env, path, encoding='bits', start=None, target=None, seed=None):
+    """Writes `env` to `path`. `seed` defaults to the seed the map was generated from."""
+    if encoding not in ENCODINGS: raise ValueError(f"Unknown map encoding: {encoding}")
+    if seed is None: seed = env.seed
+    if not isinstance(seed, int): seed = None  # only integer seeds fit the header
+    flags = (HAS_START if start else 0) | (HAS_TARGET if target else 0) | (HAS_SEED if seed is not None else 0)
+    start, target = start or (-1, -1), target or (-1, -1)
+    if encoding == 'raw': chunks, length = [env.cells], len(env.cells)
+    elif encoding == 'bits': chunks, length = pack_rows(env), ((env.size + 7) // 8) * env.size
+    else:
+        payload = encode_runs(env)
+        chunks, length = [payload], len(payload)
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, ENCODINGS.index(encoding), flags, env.size,
+                            *start, *target, seed if seed is not None else 0, length))
+        for chunk in chunks:
+            f.write(chunk)
+
+def load_map(path, copy=False):
+    """
+    Reads a map written by save_map(). Returns (env, info) where info holds the
+    'start', 'target', 'seed' (None when not stored) and 'encoding'. A raw map is
+    memory-mapped unless `copy` is set.
+    """
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    if len(data) < HEADER.size: raise ValueError(f"{path}: not a map file")
+    magic, version, encoding, flags, size, sr, sc, tr, tc, seed, length = HEADER.unpack_from(data)
+    if magic != MAGIC: raise ValueError(f"{path}: not a map file")
+    if version != FORMAT_VERSION: raise ValueError(f"{path}: unsupported map format version {version}")
+    if encoding >= len(ENCODINGS): raise ValueError(f"{path}: unknown map encoding {encoding}")
+    if len(data) < HEADER.size + length: raise ValueError(f"{path}: truncated map file")
+    payload = memoryview(data)[HEADER.size:HEADER.size + length]
+    encoding = ENCODINGS[encoding]
+    if encoding == 'raw':
+        env = GridEnvironment(size, bytearray(payload) if copy else payload)
+    else:
+        env = GridEnvironment(size)
+        if encoding == 'bits': unpack_rows(env, payload)
+        else: decode_runs(env, payload)
+        env.touch()
+        payload.release()
+        data.close()
+    env.seed = seed if flags & HAS_SEED else None
+    info = {
+        'start': (sr, sc) if flags & HAS_START else None,
+        'target': (tr, tc) if flags & HAS_TARGET else None,
+        'seed': env.seed,
+        'encoding': encoding,
+    }
+    return env, info
+
+def block_rows(env):
+    # (first row, row count) blocks of about BLOCK_BYTES cells each
+    rows = max(1, BLOCK_BYTES // env.stride)
+    for r in range(0, env.size, rows):
+        yield r, min(rows, env.size - r)
+
+def pack_rows(env):
+    """Yields the 'bits' payload of `env` block by block."""
+    size, row_bytes = env.size, (env.size + 7) // 8
+    if np is not None:
+        grid = np.frombuffer(env.cells, dtype=np.uint8).reshape(env.stride, env.stride)
+        for r, n in block_rows(env):
+            yield np.packbits(grid[r + 1:r + 1 + n, 1:-1] == WALL, axis=1, bitorder='little').tobytes()
+        return
+    for r, n in block_rows(env):
+        out = bytearray()
+        for row in range(r, r + n):
+            first = env.index(row, 0)
+            mask = bytes(env.cells[first:first + size]).translate(_MASK_CHARS)
+            out += int(mask[::-1], 2).to_bytes(row_bytes, 'little')
+        yield bytes(out)
+
+def unpack_rows(env, payload):
+    size, row_bytes = env.size, (env.size + 7) // 8
+    if np is not None:
+        grid = np.frombuffer(env.cells, dtype=np.uint8).reshape(env.stride, env.stride)
+        packed = np.frombuffer(payload, dtype=np.uint8).reshape(size, row_bytes)
+        for r, n in block_rows(env):
+            walls = np.unpackbits(packed[r:r + n], axis=1, count=size, bitorder='little')
+            grid[r + 1:r + 1 + n, 1:-1] = walls * WALL
+        return
+    for row in range(size):
+        bits = int.from_bytes(payload[row * row_bytes:(row + 1) * row_bytes], 'little')
+        first = env.index(row, 0)
+        env.cells[first:first + size] = format(bits, f'0{row_bytes * 8}b')[::-1][:size].encode().translate(_CELL_VALUES)
+
+def encode_runs(env):
+    """The 'rle' payload of `env`."""
+    out = bytearray()
+    wall = False  # runs alternate, starting with a free one
+    pending = 0   # length of the run still open at the end of a row
+    size = env.size
+    for row in range(size):
+        first = env.index(row, 0)
+        mask = bytes(env.cells[first:first + size]).translate(_MASK_BITS)
+        for run in _RUNS.finditer(mask):
+            if (mask[run.start()] == 1) == wall:
+                pending += run.end() - run.start()
+                continue
+            put_varint(out, pending)
+            wall, pending = not wall, run.end() - run.start()
+    put_varint(out, pending)
+    return bytes(out)
+
+def decode_runs(env, payload):
+    size, cells = env.size, env.cells
+    walls = bytes([WALL]) * size
+    pos, total, wall = 0, size * size, False
+    for run in read_varints(payload):
+        if pos + run > total: raise ValueError("Run-length data is longer than the map")
+        if wall:
+            # A run may span several rows
+            end = pos + run
+            while pos < end:
+                r, c = divmod(pos, size)
+                n = min(end - pos, size - c)
+                first = env.index(r, c)
+                cells[first:first + n] = walls[:n]
+                pos += n
+        else:
+            pos += run
+        wall = not wall
+
+def put_varint(out, n):
+    while n >= 0x80:
+        out.append(n & 0x7F | 0x80)
+        n >>= 7
+    out.append(n)
+
+def read_varints(data):
+    n = shift = 0
+    for byte in data:
+        n |= (byte & 0x7F) << shift
+        if byte & 0x80: shift += 7
+        else:
+            yield n
+            n = shift = 0
+
+# --- Text Maps ---
+TEXT_WALL, TEXT_FREE, TEXT_START, TEXT_TARGET = '#', '.', 'S', 'T'
+TEXT_TERRAIN = '123456789'
+
+def parse_text(text):
+    """
+    Builds a map from its text form; returns (env, info) like load_map(). A map
+    that is not square is padded to a square with walls.
+    """
+    rows = text.strip('\n').splitlines()
+    if not rows: raise ValueError("Empty map")
+    env = GridEnvironment(max(len(rows), max(len(row) for row in rows)))
+    env.fill(WALL)
+    start = target = None
+    for r, row in enumerate(rows):
+        for c, ch in enumerate(row):
+            if ch == TEXT_WALL: continue
+            value = FREE
+            if ch == TEXT_START: start = (r, c)
+            elif ch == TEXT_TARGET: target = (r, c)
+            elif ch in TEXT_TERRAIN: value = int(ch)
+            elif ch != TEXT_FREE: raise ValueError(f"Unexpected {ch!r} in map at row {r + 1}, column {c + 1}")
+            env.cells[env.index(r, c)] = value
+    env.touch()
+    return env, {'start': start, 'target': target, 'seed': None, 'encoding': 'text'}
+
+def to_text(env, start=None, target=None):
+    lines = []
+    for r in range(env.size):
+        row = [text_cell(env.cells[env.index(r, c)]) for c in range(env.size)]
+        if start and start[0] == r: row[start[1]] = TEXT_START
+        if target and target[0] == r: row[target[1]] = TEXT_TARGET
+        lines.append(''.join(row))
+    return '\n'.join(lines) + '\n'
+
+def text_cell(value):
+    # Terrain with no digit of its own is written as a plain free cell
+    if value == WALL: return TEXT_WALL
+    return str(value) if 0 < value <= len(TEXT_TERRAIN) else TEXT_FREE
+
+def open_map(path, copy=False):
+    """load_map() for map files, parse_text() for anything else."""
+    with open(path, 'rb') as f:
+        binary = f.read(len(MAGIC)) == MAGIC
+    return load_map(path, copy) if binary else load_text(path)
+
+def load_text(path):
+    with open(path) as f:
+        return parse_text(f.read())
+
+def save_text(env, path, start=None, target=None):
+    with open(path, 'w') as f:
+        f.write(to_text(env, start, target))
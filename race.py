@@ -0,0 +1,75 @@
+"""
+Algorithm race: runs several searches on the same map at once in a process pool.
+
+Every worker gets its own copy of the grid, runs one algorithm and records its
+expansion trace (the PUSHED/POPPED/SETTLED events of ALGORITHM.py) in compact
+arrays, so the UI can replay all of them side by side afterwards. The searches
+run in parallel, so on a multi-core machine a race takes about as long as its
+slowest algorithm instead of the sum of all of them.
+"""
+import concurrent.futures
+import os
+import time
+from array import array
+from ALGORITHM import SearchAlgorithms, FOUND
+
+# name -> function(algo, start, target, env, callback), with the same settings as the UI buttons
+RACERS = {
+    'BFS': lambda a, s, t, env, cb: a.bfs(s, t, env, cb),
+    'DFS': lambda a, s, t, env, cb: a.dfs(s, t, env, cb),
+    'UCS': lambda a, s, t, env, cb: a.ucs(s, t, env, cb),
+    'DLS': lambda a, s, t, env, cb: a.dls(s, t, env, 20, cb),
+    'IDDFS': lambda a, s, t, env, cb: a.iddfs(s, t, env, callback=cb),
+    'Bidirectional': lambda a, s, t, env, cb: a.bidirectional_search(s, t, env, cb),
+    'A* Search': lambda a, s, t, env, cb: a.astar(s, t, env, cb),
+    'Weighted A*': lambda a, s, t, env, cb: a.weighted_astar(s, t, env, 2.0, cb),
+    'Anytime A*': lambda a, s, t, env, cb: a.anytime_astar(s, t, env, callback=cb),
+}
+
+class Trace:
+    """The events of one search in order: kinds[i] happened to cell index cells[i]."""
+    def __init__(self):
+        self.kinds = array('b')
+        self.cells = array('i')
+
+    def record(self, event, data):
+        if event == FOUND: return
+        self.kinds.append(event)
+        self.cells.append(data)
+
+    def __len__(self):
+        return len(self.kinds)
+
+def run_racer(name, start, target, env):
+    """Runs in a worker process; the result is a plain dict so it pickles cheaply."""
+    algo = SearchAlgorithms(env.size)
+    trace = Trace()
+    t0 = time.perf_counter()
+    path = RACERS[name](algo, start, target, env, trace.record)
+    elapsed = time.perf_counter() - t0
+    return {
+        'name': name,
+        'path': path,
+        'expanded': algo.nodes_expanded,
+        'time_ms': round(elapsed * 1000, 3),
+        'trace': trace,
+    }
+
+def new_pool(workers=None):
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers or min(len(RACERS), os.cpu_count() or 1))
+
+def start_race(pool, env, start, target, names=tuple(RACERS)):
+    """Submits one job per algorithm and returns {name: future}, in `names` order."""
+    return {name: pool.submit(run_racer, name, start, target, env) for name in names}
+
+def race(env, start, target, names=tuple(RACERS), pool=None):
+    """Blocking race. Returns (results in `names` order, wall time in ms)."""
+    owned = pool is None
+    pool = pool or new_pool()
+    try:
+        t0 = time.perf_counter()
+        futures = start_race(pool, env, start, target, names)
+        results = [futures[name].result() for name in names]
+        return results, round((time.perf_counter() - t0) * 1000, 3)
+    finally:
+        if owned: pool.shutdown()
@@ -0,0 +1,217 @@
+"""
+Search recordings and their replay.
+
+A Recording is everything one run showed on the grid: the map it started from,
+the search events (PUSHED/POPPED/SETTLED, see ALGORITHM.py), the route found
+and every later re-route, the agent's steps and the cells edited while it
+walked. Each of these is one (kind, cell index) event, so a recording is two
+flat arrays plus the new cell values of the edits, and a trace file is a
+64-byte header and those arrays, deflated.
+
+A Replay rebuilds the grid at any event position without running the search
+again. Every event changes one byte (a cell's display flags or its map value),
+so the byte it overwrote is all that is needed to undo it: one pass at load time
+stores those, and from then on a step costs O(1) in either direction. Snapshots
+every KEYFRAME events bound a jump to any position to one snapshot copy plus
+KEYFRAME steps.
+"""
+import bisect
+import struct
+import sys
+import zlib
+from array import array
+from ALGORITHM import PUSHED, POPPED, SETTLED, FOUND
+
+# Event kinds besides the search events
+PATH, UNPATH, MOVED, EDIT = range(4, 8)
+KIND_NAMES = ('pushed', 'popped', 'settled', 'found', 'path', 'unpath', 'moved', 'edit')
+
+# Display flags of a cell during replay
+FRONTIER, EXPLORED, ON_PATH, TRACED = 1, 2, 4, 8
+# kind -> (flags set, flags cleared)
+FLAG_CHANGES = {
+    PUSHED: (FRONTIER, 0),
+    POPPED: (0, FRONTIER),
+    SETTLED: (EXPLORED, 0),
+    PATH: (ON_PATH, 0),
+    UNPATH: (0, ON_PATH),
+    MOVED: (TRACED, 0),
+}
+
+MAGIC = b'PFTR'
+FORMAT_VERSION = 1
+# magic, version, name bytes, size, start r/c, target r/c, events, edits, payload bytes
+HEADER = struct.Struct('<4sBxHI4iIIQ24x')
+KEYFRAME = 4096  # events between replay snapshots (at least one grid's worth)
+
+class Recording:
+    """
+    Events of one run on `grid`, from `start` to `target`. Its methods take what
+    the UI has at hand: record() is a search callback, route() a path of (r, c).
+    """
+    def __init__(self, grid, start, target, name=''):
+        self.size = grid.size
+        self.stride = grid.stride
+        self.cells = bytes(grid.cells)
+        self.start = tuple(start)
+        self.target = tuple(target)
+        self.name = name
+        self.kinds = bytearray()
+        self.data = array('i')
+        self.values = bytearray()   # new value of every EDIT event, in order
+        self.route_cells = []
+
+    def index(self, r, c):
+        return (r + 1) * self.stride + (c + 1)
+
+    def add(self, kind, i):
+        self.kinds.append(kind)
+        self.data.append(i)
+
+    def record(self, event, data):
+        # Search callback; the path of FOUND arrives through route()
+        if event != FOUND: self.add(event, data)
+
+    def route(self, path):
+        """The planned route is now `path` (a list of (r, c); empty if there is none)."""
+        cells = [self.index(*cell) for cell in path or ()]
+        new = set(cells)
+        for i in self.route_cells:
+            if i not in new: self.add(UNPATH, i)
+        old = set(self.route_cells)
+        for i in cells:
+            if i not in old: self.add(PATH, i)
+        self.route_cells = cells
+
+    def moved(self, cell):
+        self.add(MOVED, self.index(*cell))
+
+    def edit(self, cell, value):
+        """The map value of `cell` (r, c) changed to `value` (a wall, terrain, FREE)."""
+        self.add(EDIT, self.index(*cell))
+        self.values.append(value)
+
+# --- Trace Files ---
+def save_trace(recording, path):
+    name = recording.name.encode()
+    data = recording.data
+    if sys.byteorder == 'big':
+        data = array('i', data)
+        data.byteswap()
+    payload = zlib.compress(recording.cells + bytes(recording.kinds) + data.tobytes() + bytes(recording.values))
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(name), recording.size, *recording.start, *recording.target,
+                            len(recording.kinds), len(recording.values), len(payload)))
+        f.write(name)
+        f.write(payload)
+
+def load_trace(path):
+    with open(path, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size: raise ValueError(f"{path}: not a trace file")
+        magic, version, name_len, size, sr, sc, tr, tc, events, edits, length = HEADER.unpack(header)
+        if magic != MAGIC: raise ValueError(f"{path}: not a trace file")
+        if version != FORMAT_VERSION: raise ValueError(f"{path}: unsupported trace format version {version}")
+        name = f.read(name_len).decode()
+        payload = f.read(length)
+    try:
+        payload = zlib.decompress(payload)
+    except zlib.error as e:
+        raise ValueError(f"{path}: corrupt trace file ({e})") from None
+    n = (size + 2) ** 2
+    if len(payload) != n + 5 * events + edits: raise ValueError(f"{path}: truncated trace file")
+    recording = Recording.__new__(Recording)
+    recording.size, recording.stride = size, size + 2
+    recording.cells = payload[:n]
+    recording.start, recording.target, recording.name = (sr, sc), (tr, tc), name
+    recording.kinds = bytearray(payload[n:n + events])
+    recording.data = array('i')
+    recording.data.frombytes(payload[n + events:n + 5 * events])
+    if sys.byteorder == 'big': recording.data.byteswap()
+    recording.values = bytearray(payload[n + 5 * events:])
+    recording.route_cells = []
+    return recording
+
+# --- Replay ---
+class Replay:
+    """The grid of a Recording after its first `position` events; seek() moves in either direction."""
+    def __init__(self, recording):
+        self.recording = recording
+        self.size = recording.size
+        self.start, self.target = recording.start, recording.target
+        self.map = bytearray(recording.cells)
+        self.flags = bytearray(len(self.map))
+        self.position = 0
+        self.keyframe = max(KEYFRAME, len(self.map))
+        self.snapshots = []
+        # Event positions of the agent's steps, for agent()
+        self.steps = [k for k, kind in enumerate(recording.kinds) if kind == MOVED]
+        # New values of the EDIT events, by event position
+        edits = [k for k, kind in enumerate(recording.kinds) if kind == EDIT]
+        self.edits = dict(zip(edits, recording.values))
+        # The byte every event overwrites, filled in by one pass over the events
+        self.before = bytearray(len(recording.kinds))
+        for k in range(len(recording.kinds)):
+            if k % self.keyframe == 0: self.snapshots.append((bytes(self.flags), bytes(self.map)))
+            self.apply(k)
+        self.restore(0)
+
+    def __len__(self):
+        return len(self.recording.kinds)
+
+    def index(self, r, c):
+        return self.recording.index(r, c)
+
+    def coord(self, i):
+        r, c = divmod(i, self.recording.stride)
+        return (r - 1, c - 1)
+
+    @property
+    def agent(self):
+        """Cell index where the agent stands (the start until its first step)."""
+        n = bisect.bisect_left(self.steps, self.position)
+        return self.recording.data[self.steps[n - 1]] if n else self.index(*self.start)
+
+    def apply(self, k):
+        kind, i = self.recording.kinds[k], self.recording.data[k]
+        if kind == EDIT:
+            self.before[k] = self.map[i]
+            self.map[i] = self.edits[k]
+        else:
+            self.before[k] = flags = self.flags[i]
+            set_flags, cleared = FLAG_CHANGES[kind]
+            self.flags[i] = (flags | set_flags) & ~cleared
+
+    def undo(self, k):
+        kind, i = self.recording.kinds[k], self.recording.data[k]
+        if kind == EDIT: self.map[i] = self.before[k]
+        else: self.flags[i] = self.before[k]
+
+    def restore(self, n):
+        # Jump to snapshot n (an empty recording has none; its only state is the start)
+        flags, cells = self.snapshots[n] if self.snapshots else (bytes(len(self.flags)), self.recording.cells)
+        self.flags[:] = flags
+        self.map[:] = cells
+        self.position = n * self.keyframe
+
+    def seek(self, position):
+        """
+        Moves to `position` (clamped to the recording) and returns the cell indices
+        that changed, or None if the whole grid may have.
+        """
+        position = max(0, min(position, len(self)))
+        changed = None
+        if abs(position - self.position) > self.keyframe:
+            self.restore(min(position // self.keyframe, len(self.snapshots) - 1))
+        else:
+            changed = set()
+        data = self.recording.data
+        while self.position < position:
+            self.apply(self.position)
+            if changed is not None: changed.add(data[self.position])
+            self.position += 1
+        while self.position > position:
+            self.position -= 1
+            self.undo(self.position)
+            if changed is not None: changed.add(data[self.position])
+        return changed
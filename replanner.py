@@ -0,0 +1,166 @@
+"""
+Incremental replanning with D* Lite.
+
+D* Lite searches backwards from the target and keeps its g/rhs values between
+plans. When cells change while the agent walks, only the vertices whose costs
+actually changed are re-queued, and compute_shortest_path() repairs just the part
+of the search tree they affect, instead of searching again from scratch. Edges
+cost what the weighted searches charge, STEP_COST of the cell entered, so plans
+are as cheap as UCS's.
+"""
+import heapq
+from array import array
+from environment import WALL, STEP_COST
+from ALGORITHM import SearchAlgorithms
+
+INF = float('inf')
+
+class DStarLite:
+    def __init__(self, grid, start, target, directions=None):
+        self.grid = grid
+        stride = self.stride = grid.stride
+        directions = directions or SearchAlgorithms(grid.size).directions
+        self.offsets = tuple(dr * stride + dc for dr, dc in directions)
+        self.goal = grid.index(*target)
+        self.set_start(grid.index(*start))
+        self.last = self.start
+        self.km = 0
+        self.g = array('d', [INF]) * len(grid.cells)
+        self.rhs = array('d', [INF]) * len(grid.cells)
+        self.queue = []
+        self.queued = {}   # vertex -> key it is currently queued with (older heap entries are stale)
+        self.nodes_expanded = 0
+
+        self.rhs[self.goal] = 0
+        self.push(self.goal, 0)
+
+    # --- Helpers ---
+    # The loops below run once per neighbour of every repaired vertex, so the
+    # heuristic, the keys and the edge costs are written out inline there.
+    def set_start(self, s):
+        # The start's row and column are kept, since every key measures h from it
+        self.start = s
+        self.start_r, self.start_c = divmod(s, self.stride)
+
+    def h(self, a, b):
+        # Same exact 6-direction distance as SearchAlgorithms.heuristic, on cell indices
+        ar, ac = divmod(a, self.stride)
+        br, bc = divmod(b, self.stride)
+        dr, dc = br - ar, bc - ac
+        if dr * dc > 0: return max(abs(dr), abs(dc))
+        return abs(dr) + abs(dc)
+
+    def cost(self, u, v):
+        cells = self.grid.cells
+        return INF if cells[u] == WALL or cells[v] == WALL else STEP_COST[cells[v]]
+
+    def key(self, u):
+        m = min(self.g[u], self.rhs[u])
+        return (m + self.h(self.start, u) + self.km, m)
+
+    def push(self, u, m):
+        # Queues u with key(u), given m = min(g[u], rhs[u])
+        r, c = divmod(u, self.stride)
+        dr, dc = r - self.start_r, c - self.start_c
+        if dr * dc > 0:
+            if dr < 0: dr, dc = -dr, -dc
+            h = dr if dr > dc else dc
+        else: h = (dr if dr > 0 else -dr) + (dc if dc > 0 else -dc)
+        k = (m + h + self.km, m)
+        self.queued[u] = k
+        heapq.heappush(self.queue, (k, u))
+
+    def top_key(self):
+        queue, queued = self.queue, self.queued
+        while queue:
+            k, u = queue[0]
+            if queued.get(u) == k: return k
+            heapq.heappop(queue)
+        return (INF, INF)
+
+    # --- D* Lite ---
+    def update_vertex(self, u):
+        cells, g, rhs = self.grid.cells, self.g, self.rhs
+        if u != self.goal:
+            best = INF
+            if cells[u] != WALL:
+                for off in self.offsets:
+                    v = u + off
+                    value = cells[v]
+                    if value != WALL:
+                        c = g[v] + STEP_COST[value]
+                        if c < best: best = c
+            rhs[u] = best
+        self.queued.pop(u, None)
+        g_u, rhs_u = g[u], rhs[u]
+        if g_u != rhs_u: self.push(u, g_u if g_u < rhs_u else rhs_u)
+
+    def compute_shortest_path(self):
+        # Expansions follow the optimized D* Lite of Koenig & Likhachev: when g[u]
+        # drops, a predecessor's rhs can only drop to the cost through u, so its
+        # other successors are not rescanned; when g[u] rises, only predecessors
+        # whose rhs came through u are. Every edge into u costs STEP_COST[cells[u]].
+        cells, g, rhs, s, goal = self.grid.cells, self.g, self.rhs, self.start, self.goal
+        queue, queued, offsets = self.queue, self.queued, self.offsets
+        push, update_vertex = self.push, self.update_vertex
+        while True:
+            m = min(g[s], rhs[s])
+            if not (self.top_key() < (m + self.km, m) or rhs[s] != g[s]): break
+            k_old, u = heapq.heappop(queue)
+            del queued[u]
+            self.nodes_expanded += 1
+            g_u, rhs_u = g[u], rhs[u]
+            if k_old < self.key(u):
+                push(u, g_u if g_u < rhs_u else rhs_u)
+            elif g_u > rhs_u:
+                g[u] = rhs_u
+                c = rhs_u + STEP_COST[cells[u]]
+                for off in offsets:
+                    p = u - off
+                    if c < rhs[p] and p != goal and cells[p] != WALL:
+                        rhs[p] = c
+                        g_p = g[p]
+                        if g_p != c: push(p, g_p if g_p < c else c)
+                        else: queued.pop(p, None)
+            else:
+                g[u] = INF
+                update_vertex(u)
+                c = g_u + STEP_COST[cells[u]]
+                for off in offsets:
+                    p = u - off
+                    if rhs[p] == c: update_vertex(p)
+
+    # --- Public API ---
+    def move_to(self, pos):
+        """The agent moved: later keys are corrected by km instead of re-keying the queue."""
+        self.set_start(self.grid.index(*pos))
+        self.km += self.h(self.last, self.start)
+        self.last = self.start
+
+    def update_cells(self, cells):
+        """`cells` are (r, c) that changed (walls or terrain); only their edges are repaired."""
+        for r, c in cells:
+            u = self.grid.index(r, c)
+            self.update_vertex(u)
+            for off in self.offsets:
+                self.update_vertex(u - off)
+
+    def plan(self):
+        """Returns the current shortest path from the agent to the target, or None."""
+        self.compute_shortest_path()
+        if self.g[self.start] == INF: return None
+        cells, offsets = self.grid.cells, self.offsets
+        path, u, g = [self.grid.coord(self.start)], self.start, self.g
+        for _ in range(len(g)):
+            if u == self.goal: return path
+            best, nxt = INF, None
+            for off in offsets:
+                v = u + off
+                value = cells[v]
+                if value != WALL:
+                    c = g[v] + STEP_COST[value]
+                    if c < best: best, nxt = c, v
+            if nxt is None: return None
+            u = nxt
+            path.append(self.grid.coord(u))
+        return None
@@ -0,0 +1,100 @@
+"""
+Stepped execution of the search algorithms.
+
+A SearchRunner runs one search on a worker thread and turns its callback events
+(see ALGORITHM.py) into a bounded queue. The UI pulls a budget of expansions per
+frame with poll(), so the window stays responsive and a search can be paused,
+single-stepped, cancelled or finished instantly without the algorithms knowing
+anything about rendering.
+"""
+import collections
+import queue
+import threading
+from ALGORITHM import SETTLED
+
+_DONE = object()
+
+class SearchCancelled(Exception):
+    pass
+
+class SearchRunner:
+    def __init__(self, search, batch_size=64, max_batches=32):
+        # `search(callback)` must run the algorithm and return its result (e.g. the path)
+        self.search = search
+        self.batch_size = batch_size
+        # The worker blocks once this many batches are waiting, so it never runs
+        # more than max_batches * batch_size events ahead of the display.
+        self.queue = queue.Queue(max_batches)
+        self.pending = collections.deque()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+        self.finished = False
+        self.thread = threading.Thread(target=self._work, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    @property
+    def done(self):
+        # True once the search returned and every event has been handed out
+        return self.finished and not self.pending
+
+    def _put(self, item):
+        while True:
+            if self.cancelled: raise SearchCancelled()
+            try:
+                self.queue.put(item, timeout=0.05)
+                return
+            except queue.Full:
+                pass
+
+    def _work(self):
+        batch = []
+        def emit(event, data):
+            batch.append((event, data))
+            if len(batch) >= self.batch_size:
+                self._put(batch[:])
+                batch.clear()
+        try:
+            self.result = self.search(emit)
+            if batch: self._put(batch)
+        except SearchCancelled:
+            return
+        except Exception as e:
+            self.error = e
+        try:
+            self._put(_DONE)
+        except SearchCancelled:
+            pass
+
+    def poll(self, budget=None, timeout=None):
+        """
+        Returns the next events, stopping after `budget` SETTLED (expansion) events.
+        budget=None drains everything until the search finishes ("finish instantly").
+        With a timeout, returns early if the worker has nothing ready yet.
+        """
+        events = []
+        while not self.done:
+            if not self.pending:
+                if self.finished: break
+                try:
+                    batch = self.queue.get(timeout=timeout if budget is not None else None)
+                except queue.Empty:
+                    break
+                if batch is _DONE:
+                    self.finished = True
+                    if self.error: raise self.error
+                    continue
+                self.pending.extend(batch)
+            event = self.pending.popleft()
+            events.append(event)
+            if budget is not None and event[0] == SETTLED:
+                budget -= 1
+                if budget <= 0: break
+        return events
+
+    def cancel(self):
+        self.cancelled = True
+        self.pending.clear()
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from environment import GridEnvironment
+
+def test_static_obstacles_write_through():
+    env = GridEnvironment(10)
+    walls = env.static_obstacles
+    walls.add((2, 3))
+    assert env.is_wall(2, 3) and (2, 3) in env.static_obstacles
+    walls.remove((2, 3))
+    assert not env.is_wall(2, 3)
+    with pytest.raises(KeyError):
+        walls.remove((2, 3))
+
+def test_static_obstacles_leave_dynamic_ones():
+    env = GridEnvironment(10)
+    env.generate_random(0.3, 1)
+    env.set_wall(0, 0)
+    env.dynamic_obstacles.add((0, 0))
+    count = len(env.static_obstacles)
+    assert count > 0 and (0, 0) not in env.static_obstacles
+    env.static_obstacles.clear()
+    assert len(env.static_obstacles) == 0
+    assert env.open_count() == 100 - 1
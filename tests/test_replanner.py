@@ -0,0 +1,61 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from environment import GridEnvironment, WALL, MUD, WATER
+from ALGORITHM import SearchAlgorithms
+from replanner import DStarLite
+
+def terrain_map(size, seed):
+    env = GridEnvironment(size)
+    env.generate_random(0.2, seed)
+    env.scatter_terrain(0.6, seed)
+    for cell in ((0, 0), (size - 1, size - 1)):
+        env.set_terrain(*cell, MUD)
+    return env
+
+def ucs_cost(env, start, target):
+    path = SearchAlgorithms(env.size).ucs(start, target, env)
+    return None if path is None else env.path_cost(path)
+
+def plan_cost(env, plan):
+    return None if plan is None else env.path_cost(plan)
+
+def test_plan_matches_ucs_on_terrain():
+    for seed in range(5):
+        env = terrain_map(30, seed)
+        start, target = (0, 0), (29, 29)
+        planner = DStarLite(env, start, target)
+        plan = planner.plan()
+        assert plan_cost(env, plan) == ucs_cost(env, start, target)
+        if plan is not None:
+            assert plan[0] == start and plan[-1] == target
+
+def test_replan_after_edits_matches_ucs():
+    rng = random.Random(7)
+    for seed in range(5):
+        env = terrain_map(30, seed)
+        start, target = (0, 0), (29, 29)
+        planner = DStarLite(env, start, target)
+        plan = planner.plan()
+        pos = start
+        for _ in range(15):
+            if plan is None or len(plan) < 2: break
+            pos = plan[1]
+            planner.move_to(pos)
+            # Walls and terrain change anywhere but under the agent and the target
+            changed = []
+            for _ in range(6):
+                cell = (rng.randrange(30), rng.randrange(30))
+                if cell in (pos, target): continue
+                if rng.random() < 0.5: env.set_wall(*cell, not env.is_wall(*cell))
+                else: env.set_terrain(*cell, rng.choice((0, MUD, WATER)))
+                changed.append(cell)
+            planner.update_cells(changed)
+            plan = planner.plan()
+            assert plan_cost(env, plan) == ucs_cost(env, pos, target)
+            if plan is not None:
+                assert plan[0] == pos and plan[-1] == target
+                assert all(env.cells[env.index(*cell)] != WALL for cell in plan)
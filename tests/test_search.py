@@ -0,0 +1,61 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import headless
+from environment import GridEnvironment
+from ALGORITHM import SearchAlgorithms
+
+# Searches that check the connectivity index before searching
+INDEXED = ('bfs', 'dfs', 'ucs', 'dls', 'iddfs', 'bidirectional', 'astar', 'wastar', 'anytime', 'hpa')
+
+def walled_off(size=30):
+    # The target sits in a closed ring of walls in the far corner
+    env = GridEnvironment(size)
+    env.generate_random(0.2, 3)
+    target = (size - 3, size - 3)
+    for dr in (-1, 0, 1):
+        for dc in (-1, 0, 1):
+            env.set_wall(target[0] + dr, target[1] + dc, (dr, dc) != (0, 0))
+    env.set_wall(0, 0, False)
+    return env, (0, 0), target
+
+@pytest.mark.parametrize('name', INDEXED)
+def test_unreachable_target_rejected_without_expanding(name):
+    env, start, target = walled_off()
+    algo = SearchAlgorithms(env.size)
+    env.connectivity(algo.offsets)
+    opts = headless.parse_args([])
+    assert headless.ALGORITHMS[name](algo, start, target, env, opts, None) is None
+    assert algo.nodes_expanded == 0
+
+def test_index_follows_single_cell_edits():
+    env, start, target = walled_off()
+    algo = SearchAlgorithms(env.size)
+    env.connectivity(algo.offsets)
+    env.set_wall(target[0] - 1, target[1], False)   # open the ring
+    assert env.known_connected(start, target, algo.offsets) is not False
+    path = algo.bfs(start, target, env)
+    assert path is not None and path[-1] == target
+
+@pytest.mark.parametrize('kind, size, density', [('maze', 41, 0), ('random', 80, 0.45), ('empty', 70, 0), ('trap', 130, 0)])
+@pytest.mark.parametrize('name', ('bfs-bits', 'bidirectional-bits'))
+def test_bitboard_finds_shortest_paths(name, kind, size, density):
+    # Sizes past 64 put a row in several words, so moves carry bits between them
+    env = headless.build_map(kind, size, 1, density, (2, 2))
+    opts = headless.parse_args([])
+    for start, target in headless.make_pairs(env, 5, 1) + [((0, 0), (size - 1, size - 1))]:
+        algo = SearchAlgorithms(size)
+        ref = algo.bfs(start, target, env)
+        expanded = algo.nodes_expanded
+        path = headless.ALGORITHMS[name](algo, start, target, env, opts, None)
+        if ref is None:
+            assert path is None
+            continue
+        assert len(path) == len(ref) and path[0] == start and path[-1] == target
+        assert not any(env.is_wall(*cell) for cell in path)
+        assert all((b[0] - a[0], b[1] - a[1]) in algo.directions for a, b in zip(path, path[1:]))
+        if name == 'bfs-bits': assert algo.nodes_expanded <= expanded